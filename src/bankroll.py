@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+
+from race_arrays import pick_candidates
+from vectorized_simulation import VectorizedSimulation, compute_payouts
+
+
+class FlatStake:
+    """每場固定下注 stake 單位，與目前資金無關（原本 Simulation 的算法即 stake=1）"""
+
+    proportional = False
+
+    def __init__(self, stake=1.0):
+        self.stake = stake
+
+    def row_stakes(self, arrays, strategy):
+        return np.full(arrays.n_rows, float(self.stake))
+
+
+class FixedFraction:
+    """每場下注目前資金的固定比例 fraction"""
+
+    proportional = True
+
+    def __init__(self, fraction=0.02):
+        if not 0 <= fraction <= 1:
+            raise ValueError("fraction 必須介於 0 與 1 之間")
+        self.fraction = fraction
+
+    def row_stakes(self, arrays, strategy):
+        return np.full(arrays.n_rows, float(self.fraction))
+
+
+class KellyStake:
+    """凱利公式：下注資金比例 f = (b * p - (1 - p)) / b，b 為賽前賠率的淨賠率（賠率 - 1）
+
+    probability 為每匹馬的勝出機率（欄位名稱、陣列，或接受 RaceArrays 回傳陣列的函式），
+    例如 DataProcessor.raw_win_rates 的未標準化勝率。fraction < 1 即為分數凱利；
+    f 為負（沒有優勢）時不下注，並以 max_fraction 為上限。
+    """
+
+    proportional = True
+
+    def __init__(self, probability, fraction=1.0, max_fraction=1.0):
+        self.probability = probability
+        self.fraction = fraction
+        self.max_fraction = max_fraction
+
+    def row_stakes(self, arrays, strategy):
+        if callable(self.probability):
+            probability = self.probability(arrays)
+        elif isinstance(self.probability, str):
+            probability = arrays[self.probability]
+        else:
+            probability = self.probability
+        probability = np.asarray(probability, dtype=np.float64)
+        net_odds = np.asarray(arrays[strategy.odds_column()], dtype=np.float64) - 1
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            kelly = (net_odds * probability - (1 - probability)) / net_odds
+        kelly = np.where(np.isfinite(kelly), kelly, 0.0)
+        return np.clip(self.fraction * kelly, 0.0, self.max_fraction)
+
+
+def max_drawdown(equity, initial_peak=None):
+    """一次掃過資金曲線 (重複次數, 賽事數)，回傳 (最大回撤比例, 最大回撤金額, 最後的高點)
+
+    initial_peak 為曲線開始前的資金高點（分區塊計算時延續前一區塊）。
+    """
+    peak = np.maximum.accumulate(equity, axis=1)
+    if initial_peak is not None:
+        peak = np.maximum(peak, np.asarray(initial_peak)[:, None])
+    drawdown = peak - equity
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(peak > 0, drawdown / peak, 0.0)
+    return ratio.max(axis=1), drawdown.max(axis=1), peak[:, -1]
+
+
+class BankrollSimulation(VectorizedSimulation):
+    """追蹤資金變化的模擬：每個重複模擬都有一條逐場的資金曲線
+
+    選馬與 VectorizedSimulation 相同（同一個種子選到同一組馬），每場的淨報酬為
+    compute_payouts 的單位損益。下注額由 staking 決定：FlatStake 的資金曲線為累加和，
+    FixedFraction / KellyStake 依目前資金比例下注，資金曲線為 log1p 的累加和再取指數。
+    資金低於 ruin_level 即視為破產，之後不再下注（資金停在破產當下的數字）。
+    賽事依 race_id 順序下注，race_id 須與時間順序一致。
+    """
+
+    # 下注額（staking.row_stakes）依一維欄位計算
+    padded_blocks = False
+
+    def __init__(self, n_simulations: int, betting_strategy, staking=None, initial_bankroll=100.0,
+                 ruin_level=0.0, seed=None, instrumentation=None):
+        super().__init__(n_simulations, betting_strategy, seed=seed, instrumentation=instrumentation)
+        self.staking = staking if staking is not None else FlatStake()
+        self.initial_bankroll = initial_bankroll
+        self.ruin_level = ruin_level
+        self.final_bankrolls = []
+        self.max_drawdowns = []
+        self.max_drawdown_amounts = []
+        self.ruined = []
+
+    def run_simulation(self, races):
+        """執行模擬，races 可為 VectorizedSimulation.run_simulation 接受的任何來源（資金跨區塊延續）"""
+        n = self.n_simulations
+        bankroll = np.full(n, float(self.initial_bankroll))
+        peak = bankroll.copy()
+        drawdown = np.zeros(n)
+        drawdown_amount = np.zeros(n)
+        ruined = bankroll <= self.ruin_level
+        race_count = 0
+
+        for arrays in self._iter_blocks(races):
+            batch = max(1, self.max_batch_elements // max(arrays.n_races, 1))
+            for start in range(0, n, batch):
+                rows = slice(start, min(start + batch, n))
+                equity = self._equity_paths(arrays, bankroll[rows], ruined[rows], np.arange(rows.start, rows.stop))
+                if equity.shape[1] == 0:
+                    continue
+                block_drawdown, block_amount, block_peak = max_drawdown(equity, peak[rows])
+                drawdown[rows] = np.maximum(drawdown[rows], block_drawdown)
+                drawdown_amount[rows] = np.maximum(drawdown_amount[rows], block_amount)
+                peak[rows] = block_peak
+                ruined[rows] |= (equity <= self.ruin_level).any(axis=1)
+                bankroll[rows] = equity[:, -1]
+            race_count += arrays.n_races
+
+        profits = bankroll - self.initial_bankroll
+        self.results.extend(profits.tolist())
+        self.race_counts.extend([race_count] * n)
+        self.final_bankrolls.extend(bankroll.tolist())
+        self.max_drawdowns.extend(drawdown.tolist())
+        self.max_drawdown_amounts.extend(drawdown_amount.tolist())
+        self.ruined.extend(ruined.tolist())
+        print(f"模擬 {n} 次: 每次跑了 {race_count} 場賽事，平均最終資金: {bankroll.mean():.2f}，"
+              f"破產機率: {ruined.mean():.2%}")
+        return self
+
+    def simulate_paths(self, arrays, n_paths=None):
+        """回傳 (n_paths, 賽事數) 的資金曲線，第 j 欄為第 j 場結算後的資金"""
+        n_paths = self.n_simulations if n_paths is None else n_paths
+        bankroll = np.full(n_paths, float(self.initial_bankroll))
+        return self._equity_paths(arrays, bankroll, bankroll <= self.ruin_level, np.arange(n_paths))
+
+    def _selected_rows(self, arrays, replicates):
+        """各重複模擬在每場選中的列 (重複次數, 賽事數)"""
+        strategy = self.betting_strategy
+        if not strategy.has_array_kernel:
+            return np.stack([strategy.select_indices(arrays, rng=self.streams.replicate(r)) for r in replicates])
+        cand_rows, cand_offsets = strategy.candidates(arrays)
+        return pick_candidates(cand_rows, cand_offsets, self.streams.uniforms(replicates, arrays.race_ids))
+
+    def _equity_paths(self, arrays, bankroll, ruined, replicates):
+        selected = self._selected_rows(arrays, replicates)
+        returns = compute_payouts(arrays, self.betting_strategy.betting_type)[selected]
+        stakes = self.staking.row_stakes(arrays, self.betting_strategy)[selected]
+
+        if self.staking.proportional:
+            # 資金 = 起始資金 * Π(1 + f * r)，以 log1p 的累加和計算
+            with np.errstate(divide="ignore"):
+                growth = np.cumsum(np.log1p(stakes * returns), axis=1)
+            equity = bankroll[:, None] * np.exp(growth)
+        else:
+            equity = bankroll[:, None] + np.cumsum(stakes * returns, axis=1)
+
+        # 破產後不再下注：資金停在第一次低於 ruin_level 的那一場
+        broke = np.logical_or.accumulate(equity <= self.ruin_level, axis=1)
+        if broke.any():
+            first = broke.argmax(axis=1)
+            equity = np.where(broke, equity[np.arange(len(equity)), first][:, None], equity)
+        # 區塊開始前就已破產的重複模擬維持原本資金
+        equity[ruined] = bankroll[ruined, None]
+        return equity
+
+    def get_bankroll_results(self):
+        """資金相關的統計：最終資金、最大回撤與破產機率"""
+        final = np.asarray(self.final_bankrolls)
+        drawdown = np.asarray(self.max_drawdowns)
+        return {
+            'final_bankrolls': self.final_bankrolls,
+            'mean_final': final.mean(),
+            'median_final': np.median(final),
+            'max_drawdowns': self.max_drawdowns,
+            'mean_max_drawdown': drawdown.mean(),
+            'worst_max_drawdown': drawdown.max(),
+            'max_drawdown_amounts': self.max_drawdown_amounts,
+            'risk_of_ruin': np.mean(self.ruined),
+        }
+
+    def summary(self):
+        """單列的結果表"""
+        results = self.get_bankroll_results()
+        return pd.DataFrame([{
+            "平均最終資金": results['mean_final'],
+            "最終資金中位數": results['median_final'],
+            "平均最大回撤": results['mean_max_drawdown'],
+            "最大回撤": results['worst_max_drawdown'],
+            "破產機率": results['risk_of_ruin'],
+        }])
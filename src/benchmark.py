@@ -0,0 +1,263 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import betting_strategy
+from cli import COLUMNS
+from data_processor import DataProcessor, join_race_runs
+from grid_runner import STRATEGY_NAMES, expand_grid
+from simulation import Simulation
+from vectorized_simulation import VectorizedSimulation
+
+ENGINES = {"simulation": Simulation, "vectorized": VectorizedSimulation}
+
+
+def scale_dataset(races, runs, factor):
+    """把 races.csv / run.csv 複製 factor 份作為合成資料
+
+    每一份的 race_id、horse_id、jockey_id 各自平移，日期不變，
+    因此每個馬匹、騎師的歷史長度與原始資料相同，只是個體與賽事數變成 factor 倍。
+    """
+    if factor == 1:
+        return races, runs
+    n_race_ids = int(races["race_id"].max()) + 1
+    n_horses = int(runs["horse_id"].max()) + 1
+    n_jockeys = int(runs["jockey_id"].max()) + 1
+
+    race_copies, run_copies = [], []
+    for k in range(factor):
+        race_copy = races.copy()
+        race_copy["race_id"] += k * n_race_ids
+        run_copy = runs.copy()
+        run_copy["race_id"] += k * n_race_ids
+        run_copy["horse_id"] += k * n_horses
+        run_copy["jockey_id"] += k * n_jockeys
+        race_copies.append(race_copy)
+        run_copies.append(run_copy)
+    return pd.concat(race_copies, ignore_index=True), pd.concat(run_copies, ignore_index=True)
+
+
+def write_dataset(directory, races, runs):
+    """寫出 races.csv、run.csv 與合併後的 data.csv（load_data 讀取的單一檔案），回傳路徑"""
+    os.makedirs(directory, exist_ok=True)
+    paths = {name: os.path.join(directory, f"{name}.csv") for name in ("races", "run", "data")}
+    races.to_csv(paths["races"], index=False)
+    runs.to_csv(paths["run"], index=False)
+    merged = join_race_runs(races.assign(date=pd.to_datetime(races["date"])), runs)
+    merged.to_csv(paths["data"], index=False)
+    return paths
+
+
+def _measure(func, repeat=1, memory=True):
+    """執行 func，回傳 (最短秒數, 峰值記憶體 bytes, 最後一次的回傳值)
+
+    計時不開 tracemalloc（它會拖慢純 Python 迴圈），峰值記憶體另外跑一次量測。
+    """
+    seconds = []
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        seconds.append(time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return min(seconds), peak, value
+
+
+def _record(seconds, peak, n_races):
+    return {
+        "seconds": seconds,
+        "races_per_sec": n_races / seconds if seconds > 0 else None,
+        "peak_bytes": peak,
+    }
+
+
+def benchmark_features(paths, n_races_window=10, repeat=1, memory=True):
+    """依序量測載入與特徵計算各階段，回傳 ({階段: 紀錄}, 處理後的 DataProcessor)"""
+    stages = {}
+
+    def loaded():
+        return DataProcessor().load_race_data(paths["races"], paths["run"]).filter_columns(COLUMNS)
+
+    seconds, peak, _ = _measure(lambda: DataProcessor().load_data(paths["data"]), repeat, memory)
+    stages["load_data"] = (seconds, peak)
+    seconds, peak, processor = _measure(loaded, repeat, memory)
+    stages["load_race_data"] = (seconds, peak)
+
+    # 每個階段都從前一階段的結果複製一份開始，重複量測時輸入一致
+    steps = [
+        ("add_place_result", lambda p: p.add_place_result()),
+        ("add_horse_win_rate", lambda p: p.add_horse_win_rate(n_races=n_races_window)),
+        ("add_jockey_win_rate", lambda p: p.add_jockey_win_rate(n_races=n_races_window)),
+    ]
+    for name, step in steps:
+        base = processor.processed_data
+
+        def run(step=step, base=base):
+            fresh = DataProcessor()
+            fresh.processed_data = base.copy()
+            return step(fresh)
+
+        seconds, peak, processor = _measure(run, repeat, memory)
+        stages[name] = (seconds, peak)
+
+    n_races = processor.processed_data["race_id"].nunique()
+    return {name: _record(seconds, peak, n_races) for name, (seconds, peak) in stages.items()}, processor
+
+
+def benchmark_strategies(data, engine="vectorized", n_simulations=100, repeat=1, memory=True, seed=0,
+                         max_races=None):
+    """對每個策略類別的 WIN 與 PLACE 量測 run_simulation，回傳 {策略名稱: {投注類型: 紀錄}}
+
+    max_races 只取前幾場賽事量測（原始引擎逐場呼叫 select_horse，整份資料太慢），
+    races_per_sec 以實際跑的賽事數計算。
+    """
+    simulation_cls = ENGINES[engine]
+    if max_races is not None:
+        race_ids = data["race_id"].drop_duplicates().nsmallest(max_races)
+        data = data[data["race_id"].isin(race_ids)]
+    races = data if engine == "vectorized" else data.groupby("race_id")
+    n_races = data["race_id"].nunique()
+
+    results = {}
+    for name in STRATEGY_NAMES:
+        for strategy in expand_grid(getattr(betting_strategy, name)):
+            def run(strategy=strategy):
+                simulation = simulation_cls(n_simulations, strategy, seed=seed)
+                # Simulation 每次重複模擬都會印一行，量測時不輸出
+                with contextlib.redirect_stdout(io.StringIO()):
+                    return simulation.run_simulation(races)
+
+            seconds, peak, _ = _measure(run, repeat, memory)
+            record = _record(seconds, peak, n_races * n_simulations)
+            record["n_simulations"] = n_simulations
+            record["n_races"] = int(n_races)
+            results.setdefault(name, {})[strategy.betting_type] = record
+    return results
+
+
+def scaling_curves(datasets):
+    """每個階段的 (賽事數, 秒數) 曲線，並以對數迴歸估計複雜度指數（1 為線性）"""
+    curves = {}
+    for dataset in datasets:
+        points = {f"features.{name}": record for name, record in dataset["features"].items()}
+        for engine, strategies in dataset["simulation"].items():
+            for name, by_type in strategies.items():
+                for betting_type, record in by_type.items():
+                    points[f"{engine}.{name}.{betting_type}"] = record
+        for key, record in points.items():
+            n_races = record.get("n_races", dataset["n_races"])
+            curves.setdefault(key, []).append([n_races, record["seconds"]])
+
+    result = {}
+    for key, points in curves.items():
+        points = sorted(points)
+        exponent = None
+        if len({p[0] for p in points}) >= 2:
+            x, y = np.log([p[0] for p in points]), np.log([max(p[1], 1e-9) for p in points])
+            exponent = float(np.polyfit(x, y, 1)[0])
+        result[key] = {"points": points, "exponent": exponent}
+    return result
+
+
+def run_benchmarks(races_path="./data/races.csv", runs_path="./data/run.csv", scales=(1, 10, 100),
+                   engines=("vectorized",), n_simulations=100, repeat=1, memory=True, work_dir=None,
+                   simulation_races=500):
+    """在原始資料與放大 scales 倍的合成資料上執行全部量測，回傳可存成 JSON 的 dict
+
+    simulation_races 為原始 Simulation 引擎量測的賽事數上限（None 表示全部）。
+    """
+    races = pd.read_csv(races_path)
+    runs = pd.read_csv(runs_path)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "n_simulations": n_simulations,
+            "repeat": repeat,
+            "simulation_races": simulation_races,
+        },
+        "datasets": [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            directory = os.path.join(work_dir or tmp, f"scale_{scale}")
+            print(f"產生 {scale} 倍資料...", file=sys.stderr)
+            paths = write_dataset(directory, *scale_dataset(races, runs, scale))
+
+            print(f"量測 {scale} 倍資料的特徵計算...", file=sys.stderr)
+            features, processor = benchmark_features(paths, repeat=repeat, memory=memory)
+            data = processor.processed_data
+
+            simulation = {}
+            for engine in engines:
+                print(f"量測 {scale} 倍資料的 {engine} 模擬...", file=sys.stderr)
+                max_races = simulation_races if engine == "simulation" else None
+                simulation[engine] = benchmark_strategies(data, engine, n_simulations, repeat, memory,
+                                                          max_races=max_races)
+
+            report["datasets"].append({
+                "scale": scale,
+                "n_races": int(data["race_id"].nunique()),
+                "n_rows": len(data),
+                "features": features,
+                "simulation": simulation,
+            })
+
+    report["scaling"] = scaling_curves(report["datasets"])
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="量測資料載入、特徵計算與模擬的效能，輸出 JSON")
+    parser.add_argument("--races", default="./data/races.csv")
+    parser.add_argument("--runs", default="./data/run.csv")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--engine", choices=list(ENGINES), nargs="+", default=["vectorized"],
+                        help="simulation 為逐場 GroupBy 的原始引擎，大資料會很慢")
+    parser.add_argument("--n-simulations", type=int, default=100)
+    parser.add_argument("--simulation-races", type=int, default=500,
+                        help="原始 Simulation 引擎只量測前幾場賽事")
+    parser.add_argument("--repeat", type=int, default=1, help="每個量測重複幾次取最短時間")
+    parser.add_argument("--no-memory", action="store_true", help="不量測峰值記憶體")
+    parser.add_argument("--work-dir", help="保留合成資料的目錄（預設為暫存目錄）")
+    parser.add_argument("--output", help="輸出 JSON 檔案（預設輸出到標準輸出）")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.races, args.runs, args.scales, args.engine,
+                            args.n_simulations, args.repeat, not args.no_memory, args.work_dir,
+                            args.simulation_races)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
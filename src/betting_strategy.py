@@ -2,19 +2,118 @@ from abc import ABC, abstractmethod
 import pandas as pd
 import numpy as np
 
+from race_arrays import RaceArrays, TopKCandidates, pick_candidates, select_candidates
+
 class BettingType:
     WIN = "win"
     PLACE = "place"
+    # 多匹馬的組合投注，由 exotic_bets.ExoticSimulation 結算
+    QUINELLA = "quinella"   # 連贏：前兩名，不分順序
+    TIERCE = "tierce"       # 三重彩：前三名，依順序
+    TRIO = "trio"           # 單 T：前三名，不分順序
+
+
+def _defining_class(cls, name):
+    for klass in cls.__mro__:
+        if name in vars(klass):
+            return klass
+
+
+def _column(arrays, name):
+    return np.asarray(arrays[name], dtype=np.float64)
+
+
+def _in_range(values, low, high):
+    # 與 pandas 比較相同：NaN 一律視為不符合
+    return (values >= low) & (values <= high)
+
 
 class BettingStrategy(ABC):
     def __init__(self, betting_type=BettingType.WIN):
         self.betting_type = betting_type
     
     @abstractmethod
-    def select_horse(self, race_group):
-        """選擇要投注的馬匹"""
+    def select_horse(self, race_group, rng=None):
+        """選擇要投注的馬匹；rng 為 DataFrame.sample 使用的 Generator（None 為全域亂數），由模擬每場傳入"""
         pass
         
+    def odds_column(self):
+        """賽前賠率欄位（win_dividend1 是賽後派彩，不能拿來選馬）"""
+        return "win_odds" if self.betting_type == BettingType.WIN else "place_odds"
+
+    def rate_column(self, entity):
+        """勝率欄位：WIN 用 top1、PLACE 用 top3，entity 為 horse 或 jockey"""
+        suffix = "top1" if self.betting_type == BettingType.WIN else "top3"
+        return f"{entity}_win_rate_{suffix}"
+
+    def score_arrays(self, arrays):
+        """陣列核心：對一批賽事的扁平欄位回傳 (eligible, score)
+
+        eligible 為候選遮罩（None 表示全部），score 為評分（None 表示不評分）；
+        每場在候選中取最高分，並列時隨機選一，沒有候選時整場隨機選一。
+        未實作的策略回傳 NotImplemented，select_indices 會改用 select_horse。
+        """
+        return NotImplemented
+
+    @property
+    def has_array_kernel(self):
+        """score_arrays 是否與 select_horse 一致（子類別只覆寫 select_horse 時不能沿用父類別的核心）"""
+        kernel_cls = _defining_class(type(self), "score_arrays")
+        return kernel_cls is not BettingStrategy and issubclass(kernel_cls, _defining_class(type(self), "select_horse"))
+
+    def candidates(self, arrays, rng=None):
+        """每場的並列候選 (cand_rows, cand_offsets)，沒有陣列核心時由 select_horse 逐場選出一匹"""
+        if self.has_array_kernel:
+            eligible, score = self.score_arrays(arrays)
+            return select_candidates(arrays, eligible, score)
+        rows = self._select_with_dataframe(arrays, rng)
+        return rows, np.arange(len(rows) + 1)
+
+    def ranked_candidates(self, arrays, k):
+        """每場評分最高的 k 匹馬（TopKCandidates），k = 1 時與 candidates 的選法相同"""
+        if not self.has_array_kernel:
+            raise ValueError(f"多匹馬選擇需要策略的陣列核心: {type(self).__name__}")
+        eligible, score = self.score_arrays(arrays)
+        return TopKCandidates(arrays, eligible, score, k)
+
+    def select_top_k(self, columns, k, offsets=None, rng=None):
+        """陣列介面：回傳每場依評分排序的前 k 匹馬 (賽事數, k)，候選不足 k 匹的位置為 -1"""
+        arrays = columns if isinstance(columns, RaceArrays) else RaceArrays.from_columns(columns, offsets)
+        rng = np.random.default_rng() if rng is None else rng
+        ranked = self.ranked_candidates(arrays, k)
+        rows = ranked.fixed_rows.copy()
+        if hasattr(rng, "uniforms"):
+            u = rng.uniforms(arrays.race_ids[ranked.random_races], np.arange(k)[:, None])
+        else:
+            u = rng.random(ranked.random_shape)
+        rows[ranked.random_races] = ranked.pick(u).T
+        return rows
+
+    def select_indices(self, columns, offsets=None, rng=None):
+        """陣列介面：回傳每場賽事選中的列索引
+
+        columns 為 RaceArrays，或 欄位名稱 -> 依賽事排列的一維陣列；
+        offsets 為賽事的列範圍（長度為賽事數 + 1），省略時視為單一場賽事。
+        rng 為 Generator，或 random_streams.ReplicateStream（每場的亂數由 race_id 決定）。
+        """
+        arrays = columns if isinstance(columns, RaceArrays) else RaceArrays.from_columns(columns, offsets)
+        rng = np.random.default_rng() if rng is None else rng
+        cand_rows, cand_offsets = self.candidates(arrays, rng)
+        u = rng.uniforms(arrays.race_ids) if hasattr(rng, "uniforms") else rng.random(arrays.n_races)
+        return pick_candidates(cand_rows, cand_offsets, u)
+
+    def _select_with_dataframe(self, arrays, rng=None):
+        """沒有陣列核心的自訂策略：逐場建立 DataFrame 呼叫 select_horse"""
+        data = pd.DataFrame({name: np.asarray(values) for name, values in arrays.columns.items()})
+        rows = np.empty(arrays.n_races, dtype=np.int64)
+        per_race = hasattr(rng, "race_generator")
+        for i, (start, stop) in enumerate(zip(arrays.offsets[:-1], arrays.offsets[1:])):
+            race_rng = rng.race_generator(arrays.race_ids[i]) if per_race else rng
+            selected = self.select_horse(data.iloc[start:stop], rng=race_rng)
+            # 列索引即為在 arrays 中的位置
+            rows[i] = selected.index[0] if isinstance(selected, pd.DataFrame) else selected.name
+        return rows
+
     def get_result(self, selected):
         """根據賭博類型取得結果"""
         # 確保 selected 是 Series
@@ -27,9 +126,12 @@ class BettingStrategy(ABC):
             return selected["place_result"] == 1
 
 class RandomStrategy(BettingStrategy):
-    def select_horse(self, race_group):
+    def select_horse(self, race_group, rng=None):
         """隨機選擇一匹馬"""
-        return race_group.sample(n=1)
+        return race_group.sample(n=1, random_state=rng)
+
+    def score_arrays(self, arrays):
+        return None, None
 
 class OddsBasedStrategy(BettingStrategy):
     def __init__(self, min_odds=1.0, max_odds=float('inf'), betting_type=BettingType.WIN):
@@ -37,46 +139,56 @@ class OddsBasedStrategy(BettingStrategy):
         self.min_odds = min_odds
         self.max_odds = max_odds
         
-    def select_horse(self, race_group):
+    def select_horse(self, race_group, rng=None):
         """根據賠率範圍選擇馬匹"""
-        odds_column = "win_dividend1" if self.betting_type == BettingType.WIN else "place_odds"
+        odds_column = self.odds_column()
         filtered = race_group[
             (race_group[odds_column] >= self.min_odds) & 
             (race_group[odds_column] <= self.max_odds)
         ]
         if len(filtered) == 0:
-            return race_group.sample(n=1)
-        return filtered.sample(n=1)
+            return race_group.sample(n=1, random_state=rng)
+        return filtered.sample(n=1, random_state=rng)
+
+    def score_arrays(self, arrays):
+        odds = _column(arrays, self.odds_column())
+        return _in_range(odds, self.min_odds, self.max_odds), None
 
 class MinOddsBasedStrategy(BettingStrategy):
-    def select_horse(self, race_group):
+    def select_horse(self, race_group, rng=None):
         """選擇賠率最低（最熱門）的馬"""
-        odds_column = "win_dividend1" if self.betting_type == BettingType.WIN else "place_odds"
+        odds_column = self.odds_column()
         min_odds = race_group[odds_column].min()
         selected = race_group[race_group[odds_column] == min_odds]
         
         # 檢查是否有符合條件的馬匹
         if len(selected) == 0:
-            return race_group.sample(n=1)
+            return race_group.sample(n=1, random_state=rng)
             
-        return selected.sample(n=1)  # 若有多匹賠率一樣，隨機選一
+        return selected.sample(n=1, random_state=rng)  # 若有多匹賠率一樣，隨機選一
+
+    def score_arrays(self, arrays):
+        return None, -_column(arrays, self.odds_column())
 
 class MaxOddsBasedStrategy(BettingStrategy):
-    def select_horse(self, race_group):
+    def select_horse(self, race_group, rng=None):
         """選擇賠率最低（最熱門）的馬"""
-        odds_column = "win_dividend1" if self.betting_type == BettingType.WIN else "place_odds"
+        odds_column = self.odds_column()
         max_odds = race_group[odds_column].max()
         selected = race_group[race_group[odds_column] == max_odds]
         
         # 檢查是否有符合條件的馬匹
         if len(selected) == 0:
-            return race_group.sample(n=1)
+            return race_group.sample(n=1, random_state=rng)
             
-        return selected.sample(n=1)  # 若有多匹賠率一樣，隨機選一
+        return selected.sample(n=1, random_state=rng)  # 若有多匹賠率一樣，隨機選一
+
+    def score_arrays(self, arrays):
+        return None, _column(arrays, self.odds_column())
 
 class MaxJockeyBasedStrategy(BettingStrategy):
         
-    def select_horse(self, race_group):
+    def select_horse(self, race_group, rng=None):
         """根據騎師勝率選擇馬匹"""
         # 根據投注類型選擇對應的勝率欄位
         win_rate_column = "jockey_win_rate_top1" if self.betting_type == BettingType.WIN else "jockey_win_rate_top3"
@@ -87,17 +199,20 @@ class MaxJockeyBasedStrategy(BettingStrategy):
         
         # 檢查是否有符合條件的馬匹
         if len(selected) == 0:
-            return race_group.sample(n=1)
+            return race_group.sample(n=1, random_state=rng)
             
-        return selected.sample(n=1)  # 若有多匹馬的騎師勝率一樣，隨機選一 
-    
+        return selected.sample(n=1, random_state=rng)  # 若有多匹馬的騎師勝率一樣，隨機選一
+
+    def score_arrays(self, arrays):
+        return None, _column(arrays, self.rate_column("jockey"))
+
 class JockeyBasedStrategy(BettingStrategy):
     def __init__(self, min_win_rate=0.0, max_win_rate=1.0, betting_type=BettingType.WIN):
         super().__init__(betting_type)
         self.min_win_rate = min_win_rate
         self.max_win_rate = max_win_rate
         
-    def select_horse(self, race_group):
+    def select_horse(self, race_group, rng=None):
         """根據騎師勝率區間選擇馬匹"""
         # 根據投注類型選擇對應的勝率欄位
         win_rate_column = "jockey_win_rate_top1" if self.betting_type == BettingType.WIN else "jockey_win_rate_top3"
@@ -110,13 +225,17 @@ class JockeyBasedStrategy(BettingStrategy):
         
         # 如果沒有符合條件的馬匹，則從整個賽事組中隨機選擇
         if len(filtered) == 0:
-            return race_group.sample(n=1)
+            return race_group.sample(n=1, random_state=rng)
             
-        return filtered.sample(n=1)  # 若有多匹馬符合條件，隨機選一
-    
+        return filtered.sample(n=1, random_state=rng)  # 若有多匹馬符合條件，隨機選一
+
+    def score_arrays(self, arrays):
+        rate = _column(arrays, self.rate_column("jockey"))
+        return _in_range(rate, self.min_win_rate, self.max_win_rate), None
+
 class MaxHorseBasedStrategy(BettingStrategy):
         
-    def select_horse(self, race_group):
+    def select_horse(self, race_group, rng=None):
         """根據馬匹勝率選擇馬匹"""
         # 根據投注類型選擇對應的勝率欄位
         win_rate_column = "horse_win_rate_top1" if self.betting_type == BettingType.WIN else "horse_win_rate_top3"
@@ -127,9 +246,12 @@ class MaxHorseBasedStrategy(BettingStrategy):
         
         # 檢查是否有符合條件的馬匹
         if len(selected) == 0:
-            return race_group.sample(n=1)
+            return race_group.sample(n=1, random_state=rng)
             
-        return selected.sample(n=1)  # 若有多匹馬勝率一樣，隨機選一 
+        return selected.sample(n=1, random_state=rng)  # 若有多匹馬勝率一樣，隨機選一
+
+    def score_arrays(self, arrays):
+        return None, _column(arrays, self.rate_column("horse"))
 
 class MaxHorseOddsBasedStrategy(BettingStrategy):
     def __init__(self, min_win_rate=0.0, max_win_rate=1.0, min_odds=1.0, max_odds=float('inf'), betting_type=BettingType.WIN):
@@ -139,11 +261,11 @@ class MaxHorseOddsBasedStrategy(BettingStrategy):
         self.min_odds = min_odds
         self.max_odds = max_odds
         
-    def select_horse(self, race_group):
+    def select_horse(self, race_group, rng=None):
         """根據馬匹勝率和賠率選擇馬匹"""
         # 根據投注類型選擇對應的勝率欄位和賠率欄位
         win_rate_column = "horse_win_rate_top1" if self.betting_type == BettingType.WIN else "horse_win_rate_top3"
-        odds_column = "win_dividend1" if self.betting_type == BettingType.WIN else "place_odds"
+        odds_column = self.odds_column()
         
         # 先篩選符合勝率條件的馬匹
         filtered = race_group[
@@ -155,7 +277,7 @@ class MaxHorseOddsBasedStrategy(BettingStrategy):
         
         # 如果沒有符合條件的馬匹，則從整個賽事組中隨機選擇
         if len(filtered) == 0:
-            return race_group.sample(n=1)
+            return race_group.sample(n=1, random_state=rng)
             
         # 計算勝率和賠率的綜合分數
         # 使用勝率和賠率的乘積作為評分標準
@@ -165,8 +287,17 @@ class MaxHorseOddsBasedStrategy(BettingStrategy):
         max_score = filtered['score'].max()
         selected = filtered[filtered['score'] == max_score]
         
-        return selected.sample(n=1)  # 若有多匹馬分數一樣，隨機選一 
-    
+        return selected.sample(n=1, random_state=rng)  # 若有多匹馬分數一樣，隨機選一
+
+    def score_arrays(self, arrays):
+        rate = _column(arrays, self.rate_column("horse"))
+        odds = _column(arrays, self.odds_column())
+        eligible = (
+            _in_range(rate, self.min_win_rate, self.max_win_rate) &
+            _in_range(odds, self.min_odds, self.max_odds)
+        )
+        return eligible, rate * odds
+
 class MaxJockeyOddsBasedStrategy(BettingStrategy):
     def __init__(self, min_win_rate=0.0, max_win_rate=1.0, min_odds=1.0, max_odds=float('inf'), betting_type=BettingType.WIN):
         super().__init__(betting_type)
@@ -175,11 +306,11 @@ class MaxJockeyOddsBasedStrategy(BettingStrategy):
         self.min_odds = min_odds
         self.max_odds = max_odds
         
-    def select_horse(self, race_group):
+    def select_horse(self, race_group, rng=None):
         """根據馬匹勝率和賠率選擇馬匹"""
         # 根據投注類型選擇對應的勝率欄位和賠率欄位
         win_rate_column = "jockey_win_rate_top1" if self.betting_type == BettingType.WIN else "jockey_win_rate_top3"
-        odds_column = "win_dividend1" if self.betting_type == BettingType.WIN else "place_odds"
+        odds_column = self.odds_column()
         
         # 先篩選符合勝率條件的馬匹
         filtered = race_group[
@@ -191,7 +322,7 @@ class MaxJockeyOddsBasedStrategy(BettingStrategy):
         
         # 如果沒有符合條件的馬匹，則從整個賽事組中隨機選擇
         if len(filtered) == 0:
-            return race_group.sample(n=1)
+            return race_group.sample(n=1, random_state=rng)
             
         # 計算勝率和賠率的綜合分數
         # 使用勝率和賠率的乘積作為評分標準
@@ -201,7 +332,16 @@ class MaxJockeyOddsBasedStrategy(BettingStrategy):
         max_score = filtered['score'].max()
         selected = filtered[filtered['score'] == max_score]
         
-        return selected.sample(n=1)  # 若有多匹馬分數一樣，隨機選一 
+        return selected.sample(n=1, random_state=rng)  # 若有多匹馬分數一樣，隨機選一
+
+    def score_arrays(self, arrays):
+        rate = _column(arrays, self.rate_column("jockey"))
+        odds = _column(arrays, self.odds_column())
+        eligible = (
+            _in_range(rate, self.min_win_rate, self.max_win_rate) &
+            _in_range(odds, self.min_odds, self.max_odds)
+        )
+        return eligible, rate * odds
 
 class CombinedStrategy(BettingStrategy):
     def __init__(self, alpha=0.65, beta=0.25, gamma=0.10, betting_type=BettingType.WIN):
@@ -210,19 +350,19 @@ class CombinedStrategy(BettingStrategy):
         self.beta = beta    # 騎師勝率權重
         self.gamma = gamma  # 賠率權重
         
-    def select_horse(self, race_group):
+    def select_horse(self, race_group, rng=None):
         """根據馬匹勝率、騎師勝率和賠率綜合評分選擇馬匹"""
         # 根據投注類型選擇對應的勝率欄位和賠率欄位
         horse_win_rate = "horse_win_rate_top1" if self.betting_type == BettingType.WIN else "horse_win_rate_top3"
         jockey_win_rate = "jockey_win_rate_top1" if self.betting_type == BettingType.WIN else "jockey_win_rate_top3"
-        odds_column = "win_dividend1" if self.betting_type == BettingType.WIN else "place_odds"
+        odds_column = self.odds_column()
         
         # 檢查必要欄位是否存在
         required_columns = [horse_win_rate, jockey_win_rate, odds_column]
         missing_columns = [col for col in required_columns if col not in race_group.columns]
         if missing_columns:
             print(f"警告：缺少必要欄位：{missing_columns}")
-            return race_group.sample(n=1)
+            return race_group.sample(n=1, random_state=rng)
             
         df = race_group.copy()
         
@@ -259,4 +399,18 @@ class CombinedStrategy(BettingStrategy):
         # 所有 score ≧ 第三高分數的馬都選進來
         selected = df[df["score"] == threshold]
 
-        return selected.sample(n=1)  # 若有多匹馬評分一樣，隨機選一 
\ No newline at end of file
+        return selected.sample(n=1, random_state=rng)  # 若有多匹馬評分一樣，隨機選一
+
+    def score_arrays(self, arrays):
+        required_columns = [self.rate_column("horse"), self.rate_column("jockey"), self.odds_column()]
+        missing_columns = [col for col in required_columns if col not in arrays]
+        if missing_columns:
+            print(f"警告：缺少必要欄位：{missing_columns}")
+            return None, None
+
+        # 與 select_horse 相同：NaN 視為 0，無限值評分視為 0
+        horse_rate, jockey_rate, odds = (_column(arrays, col) for col in required_columns)
+        horse_rate, jockey_rate, odds = (np.where(np.isnan(x), 0.0, x) for x in (horse_rate, jockey_rate, odds))
+        score = (self.alpha * horse_rate + self.beta * jockey_rate) * self.gamma * odds
+        score[np.isinf(score)] = 0
+        return None, score
@@ -0,0 +1,180 @@
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from grid_runner import strategy_labels
+from race_arrays import RaceArrays
+from random_streams import RandomStreams
+from vectorized_simulation import compute_payouts
+
+
+def race_profits(strategy, arrays):
+    """策略在每場賽事的期望損益（並列的候選各有相同機率被選中，取平均）
+
+    以期望值代替某一次重複模擬的抽樣，拔靴法的變異只來自賽事本身，不混入並列時的亂數。
+    沒有陣列核心的自訂策略以第 0 個重複模擬的選擇計算。
+    """
+    arrays = RaceArrays.from_races(arrays)
+    payouts = compute_payouts(arrays, strategy.betting_type)
+    if not strategy.has_array_kernel:
+        rows = strategy.select_indices(arrays, rng=RandomStreams(0).for_strategy(strategy).replicate(0))
+        return payouts[rows]
+    cand_rows, cand_offsets = strategy.candidates(arrays)
+    counts = np.diff(cand_offsets)
+    return np.add.reduceat(payouts[cand_rows], cand_offsets[:-1]) / counts
+
+
+def race_profit_matrix(strategies, races):
+    """多個策略的每場期望損益 (策略數, 賽事數)，賽事順序相同，可直接做成對比較"""
+    arrays = RaceArrays.from_races(races)
+    return np.stack([race_profits(strategy, arrays) for strategy in strategies])
+
+
+def holm(p_values):
+    """Holm 逐步校正的 p 值（控制族系錯誤率 FWER）"""
+    p_values = np.asarray(p_values, dtype=np.float64)
+    m = len(p_values)
+    order = np.argsort(p_values)
+    adjusted = np.maximum.accumulate((m - np.arange(m)) * p_values[order])
+    result = np.empty(m)
+    result[order] = np.minimum(adjusted, 1.0)
+    return result
+
+
+def benjamini_hochberg(p_values):
+    """Benjamini-Hochberg 校正的 p 值（控制偽發現率 FDR）"""
+    p_values = np.asarray(p_values, dtype=np.float64)
+    m = len(p_values)
+    order = np.argsort(p_values)
+    adjusted = p_values[order] * m / np.arange(1, m + 1)
+    # 由大到小取累積最小值，使校正後的 p 值維持單調
+    adjusted = np.minimum.accumulate(adjusted[::-1])[::-1]
+    result = np.empty(m)
+    result[order] = np.minimum(adjusted, 1.0)
+    return result
+
+
+CORRECTIONS = {"holm": holm, "bh": benjamini_hochberg, "none": lambda p_values: np.asarray(p_values)}
+
+
+class Bootstrap:
+    """以賽事為單位的拔靴法：整季總損益的信賴區間與策略間的成對檢定
+
+    profits 為 (策略數, 賽事數) 的每場損益（例如 race_profit_matrix）。每個重抽樣是一列
+    長度為賽事數的重抽樣索引，轉成每場被抽中的次數後，全部策略的總損益只是一次矩陣乘法
+    (批次, 賽事數) @ (賽事數, 策略數)。所有策略共用同一組索引，因此任兩個策略的差就是
+    成對的拔靴分佈，不必再重抽。
+    索引由 RandomStreams 依 (重抽樣編號, 賽事位置) 決定，結果與批次大小、執行緒數無關。
+    """
+
+    # 每批計數矩陣的元素上限
+    max_batch_elements = 1 << 23
+
+    def __init__(self, profits, labels=None, n_resamples=10_000, seed=None, max_workers=None):
+        self.profits = np.atleast_2d(np.asarray(profits, dtype=np.float64))
+        n_strategies, self.n_races = self.profits.shape
+        if self.n_races == 0:
+            raise ValueError("沒有賽事可以重抽樣")
+        self.labels = list(labels) if labels is not None else [str(i) for i in range(n_strategies)]
+        if len(self.labels) != n_strategies:
+            raise ValueError("labels 的數量與策略數不同")
+        # 標籤用來對應策略位置，重複時成對比較會對到錯的策略
+        duplicates = sorted({label for label in self.labels if self.labels.count(label) > 1})
+        if duplicates:
+            raise ValueError(f"labels 重複：{duplicates}")
+        self.n_resamples = n_resamples
+        self.streams = RandomStreams(seed)
+        self.seed = self.streams.entropy
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._totals = None
+
+    @classmethod
+    def from_strategies(cls, strategies, races, **kwargs):
+        """由策略建立，標籤為含參數的名稱（grid_runner.strategy_labels），同類別不同參數的策略可以分開比較"""
+        strategies = list(strategies)
+        return cls(race_profit_matrix(strategies, races), strategy_labels(strategies), **kwargs)
+
+    def resample_indices(self, start, stop):
+        """第 start ~ stop - 1 個重抽樣的索引矩陣 (重抽樣數, 賽事數)"""
+        u = self.streams.uniforms(np.arange(start, stop), np.arange(self.n_races))
+        return np.minimum((u * self.n_races).astype(np.int64), self.n_races - 1)
+
+    def _batch_totals(self, bounds):
+        start, stop = bounds
+        indices = self.resample_indices(start, stop)
+        indices += (np.arange(stop - start) * self.n_races)[:, None]
+        counts = np.bincount(indices.ravel(), minlength=(stop - start) * self.n_races)
+        return counts.reshape(stop - start, self.n_races).astype(np.float64) @ self.profits.T
+
+    @property
+    def totals(self):
+        """每個重抽樣的整季總損益 (重抽樣數, 策略數)，第一次使用時以多個執行緒分批計算"""
+        if self._totals is None:
+            batch = max(1, self.max_batch_elements // self.n_races)
+            bounds = [(start, min(start + batch, self.n_resamples)) for start in range(0, self.n_resamples, batch)]
+            if self.max_workers > 1 and len(bounds) > 1:
+                with ThreadPoolExecutor(self.max_workers) as executor:
+                    parts = list(executor.map(self._batch_totals, bounds))
+            else:
+                parts = [self._batch_totals(b) for b in bounds]
+            self._totals = np.concatenate(parts) if parts else np.zeros((0, len(self.labels)))
+        return self._totals
+
+    @property
+    def observed(self):
+        """實際資料上的整季總損益（每個策略一個值）"""
+        return self.profits.sum(axis=1)
+
+    def confidence_intervals(self, confidence=0.95):
+        """各策略整季總損益的百分位數信賴區間"""
+        alpha = (1 - confidence) / 2
+        lower, upper = np.quantile(self.totals, [alpha, 1 - alpha], axis=0)
+        return pd.DataFrame({
+            "策略": self.labels,
+            "總損益": self.observed,
+            "標準誤": self.totals.std(axis=0, ddof=1),
+            "下界": lower,
+            "上界": upper,
+        })
+
+    def _pairs(self, pairs=None, baseline=None):
+        index = {label: i for i, label in enumerate(self.labels)}
+        if pairs is not None:
+            return [(index[a] if a in index else a, index[b] if b in index else b) for a, b in pairs]
+        if baseline is not None:
+            base = index.get(baseline, baseline)
+            return [(i, base) for i in range(len(self.labels)) if i != base]
+        return list(itertools.combinations(range(len(self.labels)), 2))
+
+    def paired_tests(self, pairs=None, baseline=None, correction="holm", confidence=0.95):
+        """策略兩兩比較：差的信賴區間與雙尾 p 值，並做多重比較校正
+
+        pairs 為 (策略 a, 策略 b) 的 list（標籤或位置）；省略時與 baseline 比較，
+        兩者都省略時比較全部組合。p 值以平移到虛無假設（差為 0）的拔靴分佈計算。
+        correction 為 "holm"、"bh" 或 "none"。
+        """
+        if correction not in CORRECTIONS:
+            raise ValueError(f"不支援的校正方法: {correction}")
+        pairs = self._pairs(pairs, baseline)
+        if not pairs:
+            return pd.DataFrame(columns=["策略 A", "策略 B", "差", "下界", "上界", "p 值", "校正 p 值"])
+        a, b = (np.array(side) for side in zip(*pairs))
+        observed = self.observed[a] - self.observed[b]
+        diffs = self.totals[:, a] - self.totals[:, b]
+
+        alpha = (1 - confidence) / 2
+        lower, upper = np.quantile(diffs, [alpha, 1 - alpha], axis=0)
+        extreme = (np.abs(diffs - observed) >= np.abs(observed)).sum(axis=0)
+        p_values = (extreme + 1) / (len(diffs) + 1)
+        return pd.DataFrame({
+            "策略 A": [self.labels[i] for i in a],
+            "策略 B": [self.labels[i] for i in b],
+            "差": observed,
+            "下界": lower,
+            "上界": upper,
+            "p 值": p_values,
+            "校正 p 值": CORRECTIONS[correction](p_values),
+        })
@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import sys
+
+# 專案根目錄；預設的資料、快取與結果資料庫路徑以此為準，可以在任何目錄執行
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLUMNS = ["race_id", "horse_id", "result", "date",
+           "win_odds", "place_odds", "win_dividend1",
+           "place_dividend1", "place_dividend2", "place_dividend3",
+           "jockey_id"]
+
+# 與 betting_strategy 的類別名稱相同（列在這裡，--help 不必載入策略模組）
+STRATEGY_CHOICES = [
+    "RandomStrategy", "OddsBasedStrategy", "MinOddsBasedStrategy", "MaxOddsBasedStrategy",
+    "JockeyBasedStrategy", "MaxJockeyBasedStrategy", "MaxHorseBasedStrategy",
+    "MaxHorseOddsBasedStrategy", "MaxJockeyOddsBasedStrategy", "CombinedStrategy",
+]
+
+# 預設的策略網格：每項為策略名稱、參數網格（每個參數一個 list），可選擇限定投注類型
+DEFAULT_STRATEGIES = [
+    {"name": "RandomStrategy"},
+    {"name": "OddsBasedStrategy", "params": {"min_odds": [2.0], "max_odds": [5.0]}},
+    {"name": "MinOddsBasedStrategy"},
+    {"name": "MaxOddsBasedStrategy"},
+    {"name": "JockeyBasedStrategy", "params": {"min_win_rate": [0.05], "max_win_rate": [1]}, "bet_types": ["win"]},
+    {"name": "JockeyBasedStrategy", "params": {"min_win_rate": [0.17], "max_win_rate": [1]}, "bet_types": ["place"]},
+    {"name": "MaxJockeyBasedStrategy"},
+    {"name": "MaxHorseBasedStrategy"},
+    {"name": "MaxHorseOddsBasedStrategy"},
+    {"name": "MaxJockeyOddsBasedStrategy"},
+    {"name": "CombinedStrategy", "params": {"alpha": [0.75], "beta": [0.25], "gamma": [0.10]}},
+]
+
+# 參數的預設值；設定檔的同名欄位會覆寫，命令列明確指定的值再覆寫設定檔
+# 相對路徑的基準依來源而定：預設值以專案根目錄、設定檔以設定檔所在目錄、命令列以目前目錄為準
+DEFAULTS = {
+    "runs": "data/run.csv",
+    "races": "data/races.csv",
+    "cache": "cache",
+    "store": "results/results.sqlite",
+    "n_simulations": 10000,
+    "n_races": 10,
+    "workers": None,
+    "seed": None,
+    "tag": None,
+    "bet_types": ["win", "place"],
+    "strategies": None,
+    "format": "table",
+    "output": None,
+}
+
+PATH_KEYS = ("runs", "races", "cache", "store", "output")
+
+
+def build_parser():
+    """只用到標準函式庫；pandas 與策略模組在 run 內才載入，--help 不必等待"""
+    parser = argparse.ArgumentParser(
+        description="以策略網格模擬賽馬投注，結果寫入 SQLite 結果資料庫",
+        argument_default=argparse.SUPPRESS,
+    )
+    parser.add_argument("--config", help="JSON 設定檔，欄位與下列參數同名（另可用 grid 指定策略網格），"
+                                         "其中的相對路徑以設定檔所在目錄為準")
+    parser.add_argument("--runs", help=f"run.csv 路徑（預設為專案根目錄下的 {DEFAULTS['runs']}）")
+    parser.add_argument("--races", help=f"races.csv 路徑（預設 {DEFAULTS['races']}）")
+    parser.add_argument("--cache", help=f"特徵快取目錄（預設 {DEFAULTS['cache']}）")
+    parser.add_argument("--no-cache", action="store_true", help="不使用特徵快取")
+    parser.add_argument("--store", help=f"結果資料庫路徑（預設 {DEFAULTS['store']}）")
+    parser.add_argument("--no-store", action="store_true", help="不寫入結果資料庫")
+    parser.add_argument("--tag", help="寫入結果資料庫的標籤，方便之後查詢")
+    parser.add_argument("-n", "--n-simulations", type=int, help=f"重複模擬次數（預設 {DEFAULTS['n_simulations']}）")
+    parser.add_argument("--n-races", type=int, help=f"勝率的滾動視窗場數（預設 {DEFAULTS['n_races']}）")
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGY_CHOICES, metavar="STRATEGY",
+                        help="只執行這些策略（預設為全部），可用 --list-strategies 查看")
+    parser.add_argument("--bet-types", nargs="+", choices=["win", "place"], help="投注類型（預設 win place）")
+    parser.add_argument("-j", "--workers", type=int, help="行程池大小（預設為 CPU 數）")
+    parser.add_argument("--seed", type=int, help="主亂數種子，指定後結果可重現")
+    parser.add_argument("--format", choices=["table", "csv", "json", "none"], help="結果表的輸出格式（預設 table）")
+    parser.add_argument("-o", "--output", help="結果表輸出檔案（預設輸出到標準輸出）")
+    parser.add_argument("--list-strategies", action="store_true", help="列出預設的策略網格後結束")
+    return parser
+
+
+def resolve_path(path, base=ROOT_DIR):
+    """相對路徑以 base 為準（預設為專案根目錄）"""
+    if path is None or os.path.isabs(path):
+        return path
+    return os.path.normpath(os.path.join(base, path))
+
+
+def _resolve_paths(config, base):
+    return {key: resolve_path(value, base) if key in PATH_KEYS else value for key, value in config.items()}
+
+
+def load_config(args):
+    """合併預設值、設定檔與命令列參數；路徑在合併前依各自的來源轉成絕對路徑"""
+    config = _resolve_paths(dict(DEFAULTS, grid=DEFAULT_STRATEGIES), ROOT_DIR)
+    options = vars(args)
+    if "config" in options:
+        config_path = os.path.abspath(options["config"])
+        with open(config_path, encoding="utf-8") as f:
+            file_config = json.load(f)
+        unknown = set(file_config) - set(config)
+        if unknown:
+            raise ValueError(f"設定檔有不認得的欄位：{sorted(unknown)}")
+        config.update(_resolve_paths(file_config, os.path.dirname(config_path)))
+    config.update(_resolve_paths({key: value for key, value in options.items() if key in config}, os.getcwd()))
+    if options.get("no_cache"):
+        config["cache"] = None
+    if options.get("no_store"):
+        config["store"] = None
+    return config
+
+
+def build_strategies(grid, names=None, bet_types=("win", "place")):
+    """依策略網格建立策略實例；names 為要保留的策略名稱，不在網格中的名稱以預設參數建立"""
+    import betting_strategy
+    from grid_runner import expand_grid
+
+    if names is not None:
+        listed = {spec["name"] for spec in grid}
+        grid = [spec for spec in grid if spec["name"] in names] + [{"name": name} for name in names if name not in listed]
+
+    strategies = []
+    for spec in grid:
+        name = spec["name"]
+        if name not in STRATEGY_CHOICES:
+            raise ValueError(f"不支援的策略: {name}")
+        types = [bet_type for bet_type in spec.get("bet_types", bet_types) if bet_type in bet_types]
+        strategies += expand_grid(getattr(betting_strategy, name), spec.get("params"), betting_types=types)
+    return strategies
+
+
+def write_results(results, fmt, output=None):
+    if fmt == "none":
+        return
+    if fmt == "csv":
+        text = results.to_csv(index=False)
+    elif fmt == "json":
+        text = results.to_json(orient="records", force_ascii=False, indent=2)
+    else:
+        import pandas as pd
+        with pd.option_context("display.max_rows", None, "display.width", 200):
+            text = results.round(2).to_string(index=False) + "\n"
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+
+def run(config):
+    """依合併後的設定執行策略網格，回傳結果表"""
+    from data_processor import DataProcessor
+    from feature_cache import FeatureCache
+    from grid_runner import run_grid
+    from results_store import ResultsStore
+
+    strategies = build_strategies(config["grid"], config["strategies"], config["bet_types"])
+    if not strategies:
+        raise ValueError("沒有要執行的策略")
+
+    # 處理結果會快取在 cache 目錄，資料或參數沒變時直接讀取
+    cache = FeatureCache(config["cache"]) if config["cache"] else None
+    processor = DataProcessor().prepare(config["runs"], COLUMNS, n_races=config["n_races"],
+                                        cache=cache, races_path=config["races"])
+
+    if config["store"] is None:
+        return run_grid(strategies, processor.get_races(), config["n_simulations"],
+                        max_workers=config["workers"], seed=config["seed"])
+    with ResultsStore(config["store"]) as store:
+        results = run_grid(strategies, processor.get_races(), config["n_simulations"],
+                           max_workers=config["workers"], seed=config["seed"], store=store, tag=config["tag"])
+    print(f"已寫入 {len(strategies)} 筆結果到 {config['store']}", file=sys.stderr)
+    return results
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        config = load_config(args)
+        if getattr(args, "list_strategies", False):
+            from grid_runner import strategy_params
+            for strategy in build_strategies(config["grid"], config["strategies"], config["bet_types"]):
+                print(type(strategy).__name__, strategy.betting_type, json.dumps(strategy_params(strategy)))
+            return
+        results = run(config)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    write_results(results, config["format"], config["output"])
+
+
+if __name__ == "__main__":
+    main()
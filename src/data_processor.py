@@ -1,16 +1,149 @@
+import copy
+import json
+
 import pandas as pd
 import numpy as np
 
+from feature_state import TARGETS, EntityHistory, RunningMoments, hit_matrix
+from race_tensor import RaceTensor
+
+# races.csv / run.csv 的精簡型別（預設 read_csv 會給 int64 / float64 / object）
+RACES_DTYPES = {
+    "race_id": "int32",
+    "prize": "float32",
+    "race_class": "int8",
+    "place_combination1": "float32",
+    "place_combination2": "float32",
+    "place_combination3": "float32",
+    "place_dividend1": "float32",
+    "place_dividend2": "float32",
+    "place_dividend3": "float32",
+    "win_combination1": "float32",
+    "win_dividend1": "float32",
+}
+
+RUNS_DTYPES = {
+    "race_id": "int32",
+    "horse_no": "int8",
+    "horse_id": "int32",
+    "result": "int8",
+    "horse_age": "int8",
+    "horse_rating": "int16",
+    "finish_time": "float32",
+    "win_odds": "float32",
+    "place_odds": "float32",
+    "jockey_id": "int16",
+}
+
+
+def read_races(races_path, usecols=None):
+    """以精簡型別讀取 races.csv；usecols 為只讀取的欄位"""
+    races = pd.read_csv(races_path, dtype=RACES_DTYPES, usecols=usecols)
+    if "date" in races.columns:
+        races["date"] = pd.to_datetime(races["date"])
+    if "race_class" in races.columns:
+        races["race_class"] = races["race_class"].astype("category")
+    return races
+
+
+def join_race_runs(races, runs):
+    """以 race_id 合併賽事與出賽資料，每匹馬一列
+
+    派彩依 win_combination1 / place_combination1..3 對到 horse_no，
+    每匹馬只在自己有派彩的欄位有值：win_dividend1 為獨贏派彩，
+    place_dividend{n} 只在名次 n 等於該馬 result 時有值，其餘為 NaN。
+    只讀取部分欄位時（例如 feature_pipeline 的欄位裁剪），缺少組合欄位的派彩不做對應。
+    """
+    data = runs.merge(races, on="race_id", how="inner", validate="many_to_one")
+
+    if "win_combination1" in data.columns:
+        is_winner = data["horse_no"].to_numpy() == data["win_combination1"].to_numpy()
+        data["win_dividend1"] = np.where(is_winner, data["win_dividend1"].to_numpy(), np.nan).astype(np.float32)
+
+    if "place_combination1" in data.columns:
+        horse_no = data["horse_no"].to_numpy()
+        result = data["result"].to_numpy()
+        # 先找出每匹馬自己的位置派彩，再放到與名次相同的欄位
+        place_dividend = np.full(len(data), np.nan, dtype=np.float32)
+        for n in (1, 2, 3):
+            hit = horse_no == data[f"place_combination{n}"].to_numpy()
+            place_dividend[hit] = data[f"place_dividend{n}"].to_numpy()[hit]
+        for n in (1, 2, 3):
+            data[f"place_dividend{n}"] = np.where(result == n, place_dividend, np.nan).astype(np.float32)
+
+    combination_columns = ["win_combination1", "place_combination1", "place_combination2", "place_combination3"]
+    return data.drop(columns=[col for col in combination_columns if col in data.columns])
+
+
+def iter_race_chunks(races_path="./data/races.csv", runs_path="./data/run.csv", chunksize=100_000):
+    """分塊讀取 run.csv 並與 races.csv 合併，每塊只包含完整的賽事
+
+    run.csv 須依 race_id 排列；被切到下一塊的最後一場會併入下一塊。
+    """
+    races = read_races(races_path)
+    carry = None
+    for chunk in pd.read_csv(runs_path, dtype=RUNS_DTYPES, chunksize=chunksize):
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        is_last = chunk["race_id"] == chunk["race_id"].iloc[-1]
+        carry = chunk[is_last]
+        if (~is_last).any():
+            yield join_race_runs(races, chunk[~is_last])
+    if carry is not None and len(carry):
+        yield join_race_runs(races, carry)
+
+
 class DataProcessor:
     def __init__(self):
         self.data = None
         self.processed_data = None
+        # 增量更新勝率特徵所需的狀態（見 append_data）
+        self.win_rate_params = {}   # prefix -> (key, n_races)
+        self.entity_history = {}    # prefix -> EntityHistory
+        self.rate_moments = {}      # 勝率欄位 -> 原始勝率的 RunningMoments
         
     def load_data(self, file_path):
         """載入資料"""
         self.data = pd.read_csv(file_path)
         return self
-            
+
+    def load_race_data(self, races_path="./data/races.csv", runs_path="./data/run.csv"):
+        """載入 races.csv 與 run.csv，以 race_id 合併成每匹馬一列（派彩欄位見 join_race_runs）"""
+        races = read_races(races_path)
+        runs = pd.read_csv(runs_path, dtype=RUNS_DTYPES)
+        self.data = join_race_runs(races, runs)
+        return self
+
+    def prepare(self, file_path, columns, n_races=10, cache=None, races_path=None):
+        """載入、篩選欄位並計算全部特徵；有提供 FeatureCache 時優先讀取快取
+
+        有提供 races_path 時，file_path 視為 run.csv，並以 load_race_data 合併兩個檔案。
+        """
+        source_paths = [file_path] if races_path is None else [races_path, file_path]
+        key = None
+        if cache is not None:
+            params = {"place_result": True, "horse_win_rate": n_races, "jockey_win_rate": n_races}
+            key = cache.make_key(source_paths, columns, params)
+            cached, state = cache.load(key, with_state=True)
+            if cached is not None:
+                # 快取同時保存增量更新所需的狀態，讀取後 append_data 與 save_feature_state 照常可用
+                self.processed_data = cached
+                self.restore_feature_state(state)
+                return self
+
+        if races_path is None:
+            self.load_data(file_path)
+        else:
+            self.load_race_data(races_path, file_path)
+        self.filter_columns(columns)
+        self.add_place_result()
+        self.add_horse_win_rate(n_races=n_races)
+        self.add_jockey_win_rate(n_races=n_races)
+
+        if cache is not None:
+            cache.save(key, self.processed_data, state=self.feature_state())
+        return self
+
     def filter_columns(self, columns):
         if not isinstance(columns, (list, tuple)):
             raise ValueError("columns 必須是 list")
@@ -30,6 +163,12 @@ class DataProcessor:
             raise ValueError("請先載入並處理資料")
         return self.group_races()
         
+    def get_race_tensor(self, features=None):
+        """取得 (賽事數, 最多馬匹數, 特徵數) 的 RaceTensor，可用 save() 存到磁碟"""
+        if self.processed_data is None:
+            raise ValueError("請先載入並處理資料")
+        return RaceTensor.from_dataframe(self.processed_data, features)
+
     def get_data(self):
         """取得處理後的資料"""
         if self.processed_data is None:
@@ -44,93 +183,187 @@ class DataProcessor:
         if 'result' not in self.processed_data.columns:
             raise ValueError("缺少 result 欄位")
             
-        self.processed_data['place_result'] = self.processed_data['result'].apply(
-            lambda x: 1 if x in [1, 2, 3] else 0
-        )
+        self.processed_data['place_result'] = self.processed_data['result'].isin([1, 2, 3]).astype(np.int64)
         return self
         
-    def _normalize_series(self, series):
-        """標準化數列"""
-        mean = series.mean()
-        std = series.std()
-        if std == 0:
-            return series - mean  # 如果標準差為0，只做中心化
-        return (series - mean) / std
+    def _normalize_series(self, series, moments=None):
+        """標準化數列；moments 為累計的平均與變異數，未提供時以整個數列計算"""
+        if moments is None:
+            moments = RunningMoments().update(series)
+        return moments.normalize(series)
 
-    def add_horse_win_rate(self, n_races=10):
-        # DEBUG：印一次狀態
-        print("Before groupby:", type(self.processed_data),
-              "Index:", self.processed_data.index, 
-              "Columns:", self.processed_data.columns.tolist())
-
-        # 確保 horse_id 還在欄位裡
-        if 'horse_id' not in self.processed_data.columns:
-            raise ValueError("horse_id 欄位不見了！")
-
-        def calculate_win_rate(group):
-            # 1. 先按 chronological order
-            group = group.sort_values('date')
-            # 2. 把 result 往下 shift，一定不要把當前比賽算進去
-            wins = (group['result'] == 1).shift(1)
-            places = group['result'].isin([1,2,3]).shift(1)
-            # 3. rolling 並填 0 (最早的一筆 shift 會是 NaN)
-            group['horse_win_rate_top1'] = wins.rolling(window=n_races, min_periods=1).mean().fillna(0)
-            group['horse_win_rate_top3'] = places.rolling(window=n_races, min_periods=1).mean().fillna(0)
-            return group
-
-        # 重新做一次 index 重設，保證是純粹的欄位
-        self.processed_data = self.processed_data.reset_index(drop=True)
-
-        # 再 groupby
-        self.processed_data = (
-            self.processed_data
-                .groupby('horse_id', group_keys=False)
-                .apply(calculate_win_rate)
-                .reset_index(drop=True)
-        )
+    @staticmethod
+    def _windows(n_races):
+        """n_races 可為整數或多個視窗大小的 list，回傳 (視窗, 欄位後綴)"""
+        if np.isscalar(n_races):
+            return [n_races], [""]
+        windows = list(n_races)
+        return windows, [f"_{n}" for n in windows]
+
+    @staticmethod
+    def _date_codes(dates):
+        """日期轉為可排序的整數，NaN 日期排在最後"""
+        codes = pd.factorize(dates, sort=True)[0]
+        codes[codes < 0] = len(codes)
+        return codes
 
-        # 標準化勝率欄位
-        self.processed_data['horse_win_rate_top1'] = self._normalize_series(self.processed_data['horse_win_rate_top1'])
-        self.processed_data['horse_win_rate_top3'] = self._normalize_series(self.processed_data['horse_win_rate_top3'])
+    def _add_win_rate(self, key, prefix, n_races):
+        """以單次全域排序加累積和計算前 n 場的勝率（不含當場）
+
+        n_races 可為整數或多個視窗大小的 list；多個視窗共用同一次排序與累積和，
+        欄位名稱為 {prefix}_win_rate_top1_{n}。
+        """
+        if self.processed_data is None:
+            raise ValueError("請先載入並處理資料")
+
+        if key not in self.processed_data.columns:
+            raise ValueError(f"{key} 欄位不見了！")
+
+        data = self.processed_data
+        self.win_rate_params[prefix] = (key, n_races)
+        self.entity_history[prefix] = EntityHistory(self._windows(n_races)[0])
+
+        for column, values in self._fold_win_rate(data, prefix).items():
+            # 標準化勝率欄位（最早的一場沒有歷史資料，勝率為 0）
+            moments = self.rate_moments[column] = RunningMoments().update(values)
+            self.processed_data[column] = self._normalize_series(pd.Series(values, index=data.index), moments)
 
-        print("After groupby:", self.processed_data.shape)
         return self
 
-    def add_jockey_win_rate(self, n_races=10):
-        # DEBUG：印一次狀態
-        print("Before groupby:", type(self.processed_data),
-              "Index:", self.processed_data.index, 
-              "Columns:", self.processed_data.columns.tolist())
-
-        # 確保 jockey_id 還在欄位裡
-        if 'jockey_id' not in self.processed_data.columns:
-            raise ValueError("jockey_id 欄位不見了！")
-
-        def calculate_win_rate(group):
-            # 1. 先按 chronological order
-            group = group.sort_values('date')
-            # 2. 把 result 往下 shift，一定不要把當前比賽算進去
-            wins = (group['result'] == 1).shift(1)
-            places = group['result'].isin([1,2,3]).shift(1)
-            # 3. rolling 並填 0 (最早的一筆 shift 會是 NaN)
-            group['jockey_win_rate_top1'] = wins.rolling(window=n_races, min_periods=1).mean().fillna(0)
-            group['jockey_win_rate_top3'] = places.rolling(window=n_races, min_periods=1).mean().fillna(0)
-            return group
-
-        # 重新做一次 index 重設，保證是純粹的欄位
-        self.processed_data = self.processed_data.reset_index(drop=True)
-
-        # 再 groupby
-        self.processed_data = (
-            self.processed_data
-                .groupby('jockey_id', group_keys=False)
-                .apply(calculate_win_rate)
-                .reset_index(drop=True)
+    def _fold_win_rate(self, block, prefix):
+        """以保存的個體歷史計算 block 的原始滾動勝率並更新狀態，回傳 {欄位: 勝率}
+
+        先依 key，再依 date 排序；同一天的多場比賽維持原本列順序（即賽事順序）。
+        """
+        key, n_races = self.win_rate_params[prefix]
+        windows, suffixes = self._windows(n_races)
+        rates = self.entity_history[prefix].update(
+            block[key].to_numpy(),
+            self._date_codes(block['date']),
+            hit_matrix(block['result']),
         )
 
-        # 標準化勝率欄位
-        self.processed_data['jockey_win_rate_top1'] = self._normalize_series(self.processed_data['jockey_win_rate_top1'])
-        self.processed_data['jockey_win_rate_top3'] = self._normalize_series(self.processed_data['jockey_win_rate_top3'])
+        columns = {}
+        for t, target in enumerate(TARGETS):
+            for window, suffix in zip(windows, suffixes):
+                columns[f"{prefix}_win_rate_{target}{suffix}"] = rates[t, window]
+        return columns
+
+    @classmethod
+    def raw_win_rates(cls, data, n_races=10):
+        """未標準化的馬匹與騎師滾動勝率 {欄位: 陣列}，不改變任何處理器的狀態
+
+        每一列只用到之前的比賽，沒有未來資訊；需要 horse_id、jockey_id、result、date 欄位。
+        """
+        processor = cls()
+        rates = {}
+        for prefix, key in (("horse", "horse_id"), ("jockey", "jockey_id")):
+            processor.win_rate_params[prefix] = (key, n_races)
+            processor.entity_history[prefix] = EntityHistory(cls._windows(n_races)[0])
+            rates.update(processor._fold_win_rate(data, prefix))
+        return rates
+
+    def add_horse_win_rate(self, n_races=10):
+        """新增馬匹前 n 場的勝率與上名率"""
+        return self._add_win_rate('horse_id', 'horse', n_races)
+
+    def add_jockey_win_rate(self, n_races=10):
+        """新增騎師前 n 場的勝率與上名率"""
+        return self._add_win_rate('jockey_id', 'jockey', n_races)
+
+    def stream_races(self, runs_path="./data/run.csv", races_path="./data/races.csv",
+                     n_races=10, chunksize=100_000, columns=None):
+        """串流處理：依日期順序分塊讀取，逐塊產生處理好的完整賽事
+
+        馬匹與騎師的滾動勝率以環狀緩衝區跨區塊延續，與一次處理全部資料的結果相同；
+        標準化則使用到目前區塊為止累計的平均與標準差（只用已讀入的資料）。
+        記憶體用量只與 chunksize 有關。回傳的 generator 可直接交給 run_simulation。
+        """
+        entities = {"horse": "horse_id", "jockey": "jockey_id"}
+        self.win_rate_params = {prefix: (key, n_races) for prefix, key in entities.items()}
+        self.entity_history = {prefix: EntityHistory(self._windows(n_races)[0]) for prefix in entities}
+        self.rate_moments = {}
 
-        print("After groupby:", self.processed_data.shape)
-        return self
\ No newline at end of file
+        for block in iter_race_chunks(races_path, runs_path, chunksize):
+            if columns is not None:
+                block = block[columns].reset_index(drop=True)
+            block['place_result'] = block['result'].isin([1, 2, 3]).astype(np.int64)
+
+            for prefix in entities:
+                for column, values in self._fold_win_rate(block, prefix).items():
+                    moments = self.rate_moments.setdefault(column, RunningMoments())
+                    block[column] = moments.update(values).normalize(values)
+            yield block
+
+    def append_data(self, new_data):
+        """加入較晚的賽事資料（例如每週新的賽馬日），只處理新列
+
+        新列的滾動勝率由保存的環狀緩衝區延續，與整份資料重算的結果相同；
+        標準化的平均與變異數以累計值更新，既有列只做一次線性轉換，不必重新 groupby。
+        """
+        if self.processed_data is None or not self.win_rate_params:
+            raise ValueError("請先載入資料並計算勝率特徵")
+
+        feature_columns = set(self.rate_moments) | {'place_result'}
+        columns = [col for col in self.processed_data.columns if col not in feature_columns]
+        missing_columns = [col for col in columns if col not in new_data.columns]
+        if missing_columns:
+            raise ValueError(f"新增資料缺少欄位：{missing_columns}")
+        if len(new_data) and new_data['date'].min() < self.processed_data['date'].max():
+            raise ValueError("新增資料的日期不可早於既有資料")
+
+        block = new_data[columns].reset_index(drop=True)
+        if 'place_result' in self.processed_data.columns:
+            block['place_result'] = block['result'].isin([1, 2, 3]).astype(np.int64)
+
+        for prefix in self.win_rate_params:
+            for column, values in self._fold_win_rate(block, prefix).items():
+                moments = self.rate_moments[column]
+                previous = copy.copy(moments)
+                moments.update(values)
+                # 既有列：還原成原始勝率，再以更新後的平均與標準差標準化
+                self.processed_data[column] = moments.normalize(previous.denormalize(self.processed_data[column]))
+                block[column] = moments.normalize(values)
+
+        self.processed_data = pd.concat([self.processed_data, block[self.processed_data.columns]], ignore_index=True)
+        return self
+
+    def feature_state(self):
+        """增量更新所需的狀態 {名稱: 陣列}（save_feature_state 與特徵快取共用）"""
+        arrays = {}
+        for prefix, history in self.entity_history.items():
+            for name, values in history.state().items():
+                arrays[f"{prefix}/{name}"] = values
+        for column, moments in self.rate_moments.items():
+            arrays[f"moments/{column}"] = np.array([moments.count, moments.mean, moments.m2])
+        arrays["__params__"] = np.array(json.dumps(self.win_rate_params))
+        return arrays
+
+    def restore_feature_state(self, stored):
+        """由 feature_state 的陣列（dict 或 np.load 讀回的 .npz）還原狀態"""
+        self.win_rate_params = {prefix: tuple(params) for prefix, params in json.loads(str(stored["__params__"])).items()}
+        self.entity_history = {
+            prefix: EntityHistory.from_state({
+                name: stored[f"{prefix}/{name}"] for name in EntityHistory.STATE_FIELDS
+            })
+            for prefix in self.win_rate_params
+        }
+        self.rate_moments = {}
+        for field in stored.keys():
+            if field.startswith("moments/"):
+                count, mean, m2 = stored[field]
+                moments = RunningMoments()
+                moments.count, moments.mean, moments.m2 = int(count), float(mean), float(m2)
+                self.rate_moments[field[len("moments/"):]] = moments
+        return self
+
+    def save_feature_state(self, path):
+        """把增量更新所需的狀態存成 .npz"""
+        np.savez(path, **self.feature_state())
+        return self
+
+    def load_feature_state(self, path):
+        """讀回 save_feature_state 存的狀態"""
+        with np.load(path, allow_pickle=False) as stored:
+            self.restore_feature_state(stored)
+        return self
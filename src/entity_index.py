@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+from data_processor import RUNS_DTYPES, join_race_runs, read_races
+
+# 預設保存的出賽紀錄欄位（date 轉成天數，其餘依 run.csv 的型別）
+HISTORY_COLUMNS = ["race_id", "horse_no", "result", "finish_time"]
+
+
+class EntityIndex:
+    """某個個體（例如 horse_id、jockey_id）的出賽紀錄，以 CSR 方式排列
+
+    全部出賽依 (個體, 日期, 原始列順序) 排序後存成連續的陣列，
+    第 i 個個體的紀錄為 arrays[offsets[i]:offsets[i + 1]]（由舊到新），取出是 O(1) 的視圖。
+    position[row] 為原始資料第 row 列在排序後陣列中的位置，因此某一列「之前」的紀錄就是
+    offsets[slot]:position[row]，不需要 pandas 篩選。同一天的多場以原始列順序（賽事順序）
+    排列，與 DataProcessor 的滾動勝率相同。
+    """
+
+    def __init__(self, key, index, offsets, columns, row_slots, position):
+        self.key = key
+        self.index = index              # 個體 id -> 槽位（pd.Index）
+        self.offsets = offsets          # (個體數 + 1,)
+        self.columns = columns          # 欄位 -> 依 CSR 順序排列的陣列，另有 row 與 day
+        self.row_slots = row_slots      # 原始每一列所屬的槽位
+        self.position = position        # 原始每一列在 CSR 陣列中的位置
+
+    @classmethod
+    def from_dataframe(cls, data, key, columns=HISTORY_COLUMNS):
+        """由每匹馬一列的資料建立（需要 key、date 與 columns 欄位）"""
+        missing_columns = [col for col in [key, "date"] + list(columns) if col not in data.columns]
+        if missing_columns:
+            raise ValueError(f"缺少必要欄位：{missing_columns}")
+        codes, uniques = pd.factorize(data[key], sort=True)
+        if (codes < 0).any():
+            raise ValueError(f"{key} 有缺值")
+        # 以天數表示日期，日期差即為間隔天數
+        day = pd.to_datetime(data["date"]).to_numpy().astype("datetime64[D]").astype(np.int64)
+
+        order = np.lexsort((day, codes))
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=len(uniques))))).astype(np.int64)
+        arrays = {name: data[name].to_numpy()[order] for name in columns}
+        arrays["day"] = day[order]
+        arrays["row"] = order
+        position = np.empty(len(order), dtype=np.int64)
+        position[order] = np.arange(len(order))
+        return cls(key, pd.Index(uniques), offsets, arrays, codes, position)
+
+    @property
+    def n_entities(self):
+        return len(self.index)
+
+    def __contains__(self, entity_id):
+        return entity_id in self.index
+
+    def slot(self, entity_id):
+        """個體 id 的槽位，不存在時 KeyError"""
+        return self.index.get_loc(entity_id)
+
+    def runs(self, entity_id):
+        """某個個體的全部出賽紀錄 {欄位: 視圖}，由舊到新"""
+        slot = self.slot(entity_id)
+        start, stop = self.offsets[slot], self.offsets[slot + 1]
+        return {name: values[start:stop] for name, values in self.columns.items()}
+
+    def prior_runs(self, row, n=None):
+        """原始第 row 列之前（不含當列）的出賽紀錄，n 為只取最近幾場"""
+        start, stop = self.offsets[self.row_slots[row]], self.position[row]
+        if n is not None:
+            start = max(start, stop - n)
+        return {name: values[start:stop] for name, values in self.columns.items()}
+
+    def _lagged(self, lag):
+        """每一列往前第 lag 場在 CSR 陣列中的位置，以及是否存在"""
+        positions = self.position - lag
+        return positions, positions >= self.offsets[self.row_slots]
+
+    def last(self, column, n=3):
+        """每一列之前最近 n 場的某欄位值 (列數, n)，第 j 欄為往前第 j + 1 場，沒有則為 NaN"""
+        values = np.asarray(self.columns[column], dtype=np.float64)
+        result = np.full((len(self.position), n), np.nan)
+        for lag in range(1, n + 1):
+            positions, valid = self._lagged(lag)
+            result[valid, lag - 1] = values[positions[valid]]
+        return result
+
+    def days_since_last(self):
+        """每一列距離上一場的天數，第一場為 NaN"""
+        positions, valid = self._lagged(1)
+        days = np.full(len(self.position), np.nan)
+        day = self.columns["day"]
+        days[valid] = day[self.position[valid]] - day[positions[valid]]
+        return days
+
+    def prior_mean(self, column, window=None):
+        """每一列之前（最近 window 場，None 為全部）某欄位的平均，忽略缺值；沒有紀錄時為 NaN"""
+        values = np.asarray(self.columns[column], dtype=np.float64)
+        present = ~np.isnan(values)
+        # 前綴和：cumsum[j] 為 CSR 陣列前 j 筆的總和，跨個體相減即為區間總和
+        total = np.concatenate(([0.0], np.cumsum(np.where(present, values, 0.0))))
+        count = np.concatenate(([0], np.cumsum(present)))
+        stop = self.position
+        start = self.offsets[self.row_slots]
+        if window is not None:
+            start = np.maximum(start, stop - window)
+        n = count[stop] - count[start]
+        return np.divide(total[stop] - total[start], n, out=np.full(len(stop), np.nan), where=n > 0)
+
+    def form_features(self, prefix, n_last=3, window=None):
+        """策略可直接使用的近況特徵 {欄位: 依原始列排列的陣列}
+
+        {prefix}_last{j}_result 為往前第 j 場的名次，{prefix}_days_since_last 為休息天數，
+        {prefix}_avg_finish_time 為之前（最近 window 場）的平均完成時間。
+        """
+        features = {}
+        last = self.last("result", n_last)
+        for j in range(n_last):
+            features[f"{prefix}_last{j + 1}_result"] = last[:, j]
+        features[f"{prefix}_days_since_last"] = self.days_since_last()
+        if "finish_time" in self.columns:
+            features[f"{prefix}_avg_finish_time"] = self.prior_mean("finish_time", window)
+        return features
+
+
+def build_entity_indexes(runs_path="./data/run.csv", races_path="./data/races.csv",
+                         keys=("horse_id", "jockey_id"), columns=HISTORY_COLUMNS):
+    """讀取 run.csv（只讀需要的欄位）與 races.csv 的日期，一次建立多個個體的 EntityIndex
+
+    回傳 ({key: EntityIndex}, 合併後的資料)；資料的列順序與 EntityIndex 的 row 相同。
+    """
+    runs_columns = list(dict.fromkeys(["race_id"] + list(keys) + list(columns)))
+    runs = pd.read_csv(runs_path, usecols=runs_columns,
+                       dtype={col: RUNS_DTYPES[col] for col in runs_columns if col in RUNS_DTYPES})
+    data = join_race_runs(read_races(races_path, usecols=["race_id", "date"]), runs)
+    return {key: EntityIndex.from_dataframe(data, key, columns) for key in keys}, data
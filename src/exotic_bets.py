@@ -0,0 +1,224 @@
+import itertools
+
+import numpy as np
+
+from betting_strategy import BettingType
+from vectorized_simulation import VectorizedSimulation
+
+# 每種組合投注的馬匹數，以及是否需要依名次順序
+LEGS = {BettingType.QUINELLA: 2, BettingType.TIERCE: 3, BettingType.TRIO: 3}
+ORDERED = {BettingType.TIERCE}
+
+
+def dividend_column(bet_type):
+    """組合投注的派彩欄位（每 10 元的派彩，整場賽事同一個值）"""
+    return f"{bet_type}_dividend"
+
+
+def _legs(bet_type):
+    if bet_type not in LEGS:
+        raise ValueError(f"不支援的投注類型: {bet_type}")
+    return LEGS[bet_type]
+
+
+class FinishIndex:
+    """每場賽事的名次索引，建立一次後對任何彩票的命中判斷都是 O(1)
+
+    order[i, p] 為第 i 場第 p + 1 名的列（沒有則為 -1），
+    position[row] 為每一列的名次（沒有名次為 0）。
+    命中判斷以每匹馬自己的名次進行，因此並列名次（例如兩匹並列第一）也會正確結算。
+    """
+
+    def __init__(self, arrays, depth=3):
+        result = np.nan_to_num(np.asarray(arrays["result"], dtype=np.float64), nan=0.0).astype(np.int64)
+        self.depth = depth
+        self.position = np.where(result > 0, result, 0)
+
+        # 依 (賽事, 名次) 排序後，每場前 depth 個有名次的列即為名次表
+        placed = np.flatnonzero((self.position >= 1) & (self.position <= depth))
+        placed = placed[np.lexsort((self.position[placed], arrays.race_index[placed]))]
+        race = arrays.race_index[placed]
+        first = np.searchsorted(race, race, side="left")
+        rank = np.arange(len(placed)) - first
+        keep = rank < depth
+
+        self.order = np.full((arrays.n_races, depth), -1, dtype=np.int64)
+        self.order[race[keep], rank[keep]] = placed[keep]
+
+    def hits(self, bet_type, tickets):
+        """tickets 為 (..., 馬匹數) 的列索引（-1 表示沒有下注），回傳是否命中"""
+        legs = _legs(bet_type)
+        tickets = np.asarray(tickets)
+        if tickets.shape[-1] != legs:
+            raise ValueError(f"{bet_type} 每張彩票需要 {legs} 匹馬")
+        valid = (tickets >= 0).all(axis=-1)
+        position = self.position[np.where(tickets >= 0, tickets, 0)]
+
+        if bet_type in ORDERED:
+            hit = (position == np.arange(1, legs + 1)).all(axis=-1)
+        else:
+            hit = ((position >= 1) & (position <= legs)).all(axis=-1)
+        return hit & valid
+
+    def winning_tickets(self, bet_type):
+        """每場的中獎組合 (n_races, 馬匹數)，依名次排列"""
+        return self.order[:, :_legs(bet_type)]
+
+
+def box_combinations(box_size, bet_type):
+    """前 box_size 匹馬組成的全部彩票位置 (彩票數, 馬匹數)：不分順序用組合，三重彩用排列"""
+    legs = _legs(bet_type)
+    combine = itertools.permutations if bet_type in ORDERED else itertools.combinations
+    combos = np.array(list(combine(range(box_size), legs)), dtype=np.int64)
+    return combos.reshape(-1, legs)
+
+
+def ranked_rows(arrays, strategy, u):
+    """依策略評分排出每場候選馬的順序，並列時以亂數 u 決定
+
+    u 為 (..., 列數)，每個重複模擬每列一個亂數；回傳 (..., 候選列數)、依 (賽事, 名次) 排列的列索引。
+    不在候選內（eligible 為 False 或評分為 NaN）的馬與 TopKCandidates 相同，先排除、不參與排序。
+    (賽事, 評分) 的順序與重複模擬無關，只排序一次；每個重複模擬只需在並列的組內以 u 排序，
+    以「組別 + u」為鍵沿最後一維排序，整批一次完成。
+    """
+    if not strategy.has_array_kernel:
+        raise ValueError(f"組合投注需要策略的陣列核心: {type(strategy).__name__}")
+    eligible, score = strategy.score_arrays(arrays)
+    score = np.zeros(arrays.n_rows) if score is None else np.asarray(score, dtype=np.float64)
+    valid = ~np.isnan(score) if eligible is None else np.asarray(eligible, dtype=bool) & ~np.isnan(score)
+    rows = np.flatnonzero(valid)
+
+    static = rows[np.lexsort((-score[rows], arrays.race_index[rows]))]
+    race, key = arrays.race_index[static], score[static]
+    # 同一場、評分相同的列為一組，組別依序遞增；u 在 [0, 1) 之間，不會跨過組別
+    group = np.cumsum(np.r_[True, (race[1:] != race[:-1]) | (key[1:] != key[:-1])]) - 1
+    order = np.argsort(group + np.asarray(u)[..., static], axis=-1, kind="stable")
+    return static[order]
+
+
+class ExoticSimulation(VectorizedSimulation):
+    """組合投注（連贏、三重彩、單 T）的模擬
+
+    策略只負責為每匹馬評分（沿用 score_arrays，例如 CombinedStrategy），
+    每場取評分最高的 box_size 匹馬，買下它們組成的全部彩票（複式），每張 stake 元；
+    候選馬（eligible 且評分不是 NaN）不足 box_size 匹的賽事不下注。
+    重複模擬以批次處理：每批一個 (重複次數, 列數) 的亂數矩陣，一次排序、一次結算命中。
+    派彩來自 {bet_type}_dividend 欄位（每 10 元的派彩，整場同一個值）；附帶的 races.csv
+    只有獨贏與位置派彩，沒有這些欄位，需自行由賽果資料補上，否則只能用 simulate_hits 統計命中。
+    """
+
+    # 排序與名次索引依一維欄位計算
+    padded_blocks = False
+
+    def __init__(self, n_simulations: int, betting_strategy, bet_type, box_size=None, stake=1.0,
+                 seed=None, instrumentation=None):
+        super().__init__(n_simulations, betting_strategy, seed=seed, instrumentation=instrumentation)
+        legs = _legs(bet_type)
+        self.bet_type = bet_type
+        self.box_size = legs if box_size is None else box_size
+        if self.box_size < legs:
+            raise ValueError(f"box_size 至少要 {legs}")
+        self.stake = stake
+        self.combinations = box_combinations(self.box_size, bet_type)
+        self.hit_counts = []
+        self.ticket_counts = []
+
+    def tickets(self, arrays, u):
+        """全部彩票 (..., n_races, 每場彩票數, 馬匹數)，u 為 (..., 列數)；候選馬不足 box_size 匹的賽事為 -1"""
+        order = ranked_rows(arrays, self.betting_strategy, u)
+        order = order.reshape(-1, order.shape[-1])
+        n_batch = len(order)
+        # 排序後依 (重複模擬, 賽事) 分組，每個位置所屬的賽事與重複模擬無關，組內位置即為名次
+        race = arrays.race_index[order[0]] if n_batch else np.zeros(0, dtype=np.int64)
+        rank = np.arange(len(race)) - np.searchsorted(race, race, side="left")
+        keep = rank < self.box_size
+        top = np.full((n_batch, arrays.n_races, self.box_size), -1, dtype=np.int64)
+        top[:, race[keep], rank[keep]] = order[:, keep]
+
+        tickets = top[:, :, self.combinations]
+        # 有任何一匹馬不足就整場不買
+        race_ok = (top >= 0).all(axis=-1)
+        tickets[~race_ok] = -1
+        return tickets.reshape(np.shape(u)[:-1] + tickets.shape[1:])
+
+    def _row_uniforms(self, arrays, replicates):
+        """每個重複模擬每列一個亂數 (重複次數, 列數)，以 (race_id, 場內位置) 決定"""
+        return self.streams.uniforms(replicates, arrays.race_ids[arrays.race_index], arrays.field_position)
+
+    def _batches(self, arrays, replicates):
+        """依 max_batch_elements 把重複模擬切成批次，回傳 [(批次在 replicates 中的位置, 重複模擬編號)]"""
+        per_replicate = max(arrays.n_rows, arrays.n_races * len(self.combinations) * self.combinations.shape[1])
+        batch = max(1, self.max_batch_elements // max(per_replicate, 1))
+        return [(slice(start, start + batch), replicates[start:start + batch])
+                for start in range(0, len(replicates), batch)]
+
+    def _replicates(self, replicates):
+        return np.arange(self.n_simulations) if replicates is None else np.asarray(replicates)
+
+    def simulate_hits(self, arrays, replicates=None):
+        """每個重複模擬的 (命中張數, 下注張數)，不需要派彩欄位；回傳與 replicates 等長的陣列"""
+        replicates = self._replicates(replicates)
+        finish = FinishIndex(arrays, depth=LEGS[self.bet_type])
+        hits = np.empty(len(replicates), dtype=np.int64)
+        counts = np.empty(len(replicates), dtype=np.int64)
+        for position, batch in self._batches(arrays, replicates):
+            tickets = self.tickets(arrays, self._row_uniforms(arrays, batch))
+            hits[position] = finish.hits(self.bet_type, tickets).sum(axis=(1, 2))
+            counts[position] = (tickets >= 0).all(axis=-1).sum(axis=(1, 2))
+        return hits, counts
+
+    def run_simulation(self, races):
+        """執行模擬，races 可為 VectorizedSimulation.run_simulation 接受的任何來源
+
+        損益、命中張數與下注張數都依重複模擬跨區塊累加，全部區塊跑完後才寫入結果。
+        """
+        profits = np.zeros(self.n_simulations)
+        hits = np.zeros(self.n_simulations, dtype=np.int64)
+        counts = np.zeros(self.n_simulations, dtype=np.int64)
+        race_count = 0
+        for arrays in self._iter_blocks(races):
+            block_profits, block_hits, block_counts = self._settle(arrays, self._replicates(None))
+            profits += block_profits
+            hits += block_hits
+            counts += block_counts
+            race_count += arrays.n_races
+
+        self.results.extend(profits.tolist())
+        self.race_counts.extend([race_count] * self.n_simulations)
+        self.hit_counts.extend(hits.tolist())
+        self.ticket_counts.extend(counts.tolist())
+        print(f"模擬 {self.n_simulations} 次: 每次跑了 {race_count} 場賽事，平均損益: {profits.mean():.2f}")
+        return self
+
+    def simulate_replicates(self, arrays, replicates=None):
+        """一次算出全部重複模擬的損益（依批次向量化），回傳與 replicates 等長的陣列（預設長度為 n_simulations）
+
+        replicates 為要計算的重複模擬編號，只為這些重複模擬抽亂數；亂數由 (重複模擬, race_id, 場內位置) 決定，
+        結果與批次大小、區塊切法無關。
+        """
+        return self._settle(arrays, self._replicates(replicates))[0]
+
+    def _settle(self, arrays, replicates):
+        """結算 replicates 的 (損益, 命中張數, 下注張數)"""
+        column = dividend_column(self.bet_type)
+        if column not in arrays:
+            raise ValueError(f"缺少 {column} 欄位，無法計算 {self.bet_type} 的派彩（可改用 simulate_hits 統計命中）")
+        # 派彩是賽事層級的欄位，取每場第一列；缺值與 win / place 相同視為 1
+        dividend = np.asarray(arrays[column], dtype=np.float64)[arrays.starts]
+        dividend = np.where(np.isnan(dividend), 1.0, dividend)
+        payout = self.stake * (dividend / 10 - 1)
+
+        finish = FinishIndex(arrays, depth=LEGS[self.bet_type])
+        profits = np.empty(len(replicates))
+        hits = np.empty(len(replicates), dtype=np.int64)
+        counts = np.empty(len(replicates), dtype=np.int64)
+        for position, batch in self._batches(arrays, replicates):
+            tickets = self.tickets(arrays, self._row_uniforms(arrays, batch))
+            placed = (tickets >= 0).all(axis=-1)
+            hit = finish.hits(self.bet_type, tickets)
+            # 每張彩票：命中得到派彩淨額，否則輸掉本金；沒有下注的不計
+            ticket_profit = np.where(hit, payout[:, None], -self.stake)
+            profits[position] = np.where(placed, ticket_profit, 0.0).sum(axis=(1, 2))
+            hits[position] = hit.sum(axis=(1, 2))
+            counts[position] = placed.sum(axis=(1, 2))
+        return profits, hits, counts
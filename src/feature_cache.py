@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# 快取格式或特徵演算法改變時遞增，讓舊快取自動失效
+# 2：項目另存增量更新所需的特徵狀態
+CACHE_VERSION = 2
+
+# 特徵狀態在 .npz 中的欄位前綴
+STATE_PREFIX = "state/"
+
+
+class FeatureCache:
+    """處理後資料的磁碟快取（每個項目為一個未壓縮的 .npz，逐欄儲存）
+
+    檔名為 {參數鍵}-{來源檔雜湊}.npz：參數鍵由來源路徑、欄位與特徵參數組成，
+    來源檔內容改變時雜湊不同，舊項目會在寫入新項目時一併刪除。
+    超過容量上限時，依最近使用時間刪除最舊的項目。
+    """
+
+    def __init__(self, cache_dir="./cache", max_bytes=1 << 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def file_hash(file_path, chunk_size=1 << 20):
+        """計算來源檔內容的 SHA-256"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def make_key(self, file_paths, columns, params):
+        """由來源檔（單一路徑或路徑 list）、欄位與特徵參數組成快取鍵"""
+        if isinstance(file_paths, (str, os.PathLike)):
+            file_paths = [file_paths]
+        spec = json.dumps({
+            "version": CACHE_VERSION,
+            "sources": [os.path.abspath(path) for path in file_paths],
+            "columns": list(columns),
+            "params": params,
+        }, sort_keys=True, default=str)
+        params_key = hashlib.sha256(spec.encode()).hexdigest()[:16]
+        content_key = hashlib.sha256("".join(self.file_hash(path) for path in file_paths).encode()).hexdigest()
+        return f"{params_key}-{content_key[:16]}"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def load(self, key, with_state=False):
+        """讀取快取，不存在時回傳 None
+
+        with_state 為 True 時回傳 (資料, 特徵狀態)，特徵狀態為 save 時傳入的 {名稱: 陣列}。
+        """
+        path = self._path(key)
+        if not os.path.exists(path):
+            return (None, None) if with_state else None
+
+        with np.load(path, allow_pickle=False) as stored:
+            meta = json.loads(str(stored["__meta__"]))
+            data = pd.DataFrame({
+                column["name"]: self._decode(stored, f"c{i}", column)
+                for i, column in enumerate(meta)
+            })
+            state = {name[len(STATE_PREFIX):]: stored[name] for name in stored.files if name.startswith(STATE_PREFIX)}
+        # 更新使用時間，供 LRU 淘汰判斷
+        os.utime(path)
+        return (data, state) if with_state else data
+
+    def save(self, key, data, state=None):
+        """寫入快取，並移除同一組參數的過期項目與超出容量的項目
+
+        state 為要一併保存的特徵狀態 {名稱: 陣列}（例如 DataProcessor.feature_state()）。
+        """
+        arrays = {}
+        meta = []
+        for i, name in enumerate(data.columns):
+            meta.append(self._encode(arrays, f"c{i}", name, data[name]))
+        arrays["__meta__"] = np.array(json.dumps(meta))
+        for name, values in (state or {}).items():
+            arrays[STATE_PREFIX + name] = values
+
+        # 先寫暫存檔再改名，避免中斷時留下損壞的快取
+        path = self._path(key)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+        params_key = key.split("-")[0]
+        for entry in self._entries():
+            if entry != path and os.path.basename(entry).startswith(params_key + "-"):
+                os.remove(entry)
+
+        self._evict()
+        return self
+
+    def clear(self):
+        for entry in self._entries():
+            os.remove(entry)
+        return self
+
+    def _entries(self):
+        return [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                if name.endswith(".npz") and not name.endswith(".tmp.npz")]
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=os.path.getmtime)
+        total = sum(os.path.getsize(entry) for entry in entries)
+        # 保留最新寫入的項目，從最久未使用的開始刪
+        while total > self.max_bytes and len(entries) > 1:
+            oldest = entries.pop(0)
+            total -= os.path.getsize(oldest)
+            os.remove(oldest)
+
+    @staticmethod
+    def _encode(arrays, field, name, series):
+        dtype = series.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            categories = dtype.categories.to_numpy()
+            arrays[field] = series.cat.codes.to_numpy()
+            arrays[field + "_categories"] = categories.astype(str) if categories.dtype == object else categories
+            return {"name": name, "kind": "category", "dtype": str(dtype), "ordered": bool(dtype.ordered)}
+
+        if isinstance(dtype, np.dtype) and dtype.kind in "biufcmM":
+            arrays[field] = series.to_numpy()
+            return {"name": name, "kind": "numeric", "dtype": str(dtype)}
+
+        # 字串等物件欄位：存成固定長度 unicode，並另存缺值遮罩
+        missing = series.isna().to_numpy()
+        arrays[field] = np.where(missing, "", series.astype(object).to_numpy()).astype(str)
+        arrays[field + "_missing"] = missing
+        return {"name": name, "kind": "string", "dtype": str(dtype)}
+
+    @staticmethod
+    def _decode(stored, field, column):
+        kind = column["kind"]
+        if kind == "category":
+            categories = stored[field + "_categories"]
+            return pd.Categorical.from_codes(stored[field], categories=categories, ordered=column["ordered"])
+        if kind == "numeric":
+            return stored[field]
+        values = stored[field].astype(object)
+        values[stored[field + "_missing"]] = None
+        return pd.Series(values, dtype=column["dtype"])
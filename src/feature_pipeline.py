@@ -0,0 +1,214 @@
+import numpy as np
+import pandas as pd
+
+from data_processor import RUNS_DTYPES, DataProcessor, join_race_runs, read_races
+from feature_state import TARGETS, RunningMoments, hit_matrix, rolling_hit_rates
+
+COMBINATION_COLUMNS = ["win_combination1", "place_combination1", "place_combination2", "place_combination3"]
+
+# 合併後才有意義的派彩欄位：需要哪些 run.csv / races.csv 欄位才能算出
+DERIVED_COLUMNS = {
+    "win_dividend1": (["horse_no"], ["win_combination1", "win_dividend1"]),
+    **{
+        f"place_dividend{n}": (["horse_no", "result"],
+                               [f"place_combination{m}" for m in (1, 2, 3)] + [f"place_dividend{m}" for m in (1, 2, 3)])
+        for n in (1, 2, 3)
+    },
+}
+
+
+class RollingRate:
+    """宣告一組滾動命中率特徵：某個個體（一個或多個欄位組成的鍵）前 n 場的第一名率與前三名率
+
+    例如 RollingRate("horse_id", "horse", 10) 與 DataProcessor.add_horse_win_rate(10) 相同，
+    RollingRate(["horse_id", "jockey_id"], "pair", [5, 20]) 為馬匹與騎師搭配的勝率。
+    欄位名稱為 {prefix}_win_rate_{target}{suffix}，windows 為 list 時 suffix 為 _{n}。
+    normalize 為 True 時以全部資料的平均與標準差標準化（與 DataProcessor 相同）。
+    """
+
+    def __init__(self, key, prefix=None, windows=10, targets=TARGETS, normalize=True):
+        self.keys = (key,) if isinstance(key, str) else tuple(key)
+        self.prefix = prefix or "_".join(name[:-3] if name.endswith("_id") else name for name in self.keys)
+        self.windows, self.suffixes = DataProcessor._windows(windows)
+        unknown = [target for target in targets if target not in TARGETS]
+        if unknown:
+            raise ValueError(f"不支援的命中條件：{unknown}")
+        self.targets = tuple(targets)
+        self.normalize = normalize
+
+    def output_columns(self):
+        """{欄位名稱: (目標索引, 視窗大小)}"""
+        return {
+            f"{self.prefix}_win_rate_{target}{suffix}": (TARGETS.index(target), window)
+            for target in self.targets
+            for window, suffix in zip(self.windows, self.suffixes)
+        }
+
+    def __repr__(self):
+        return f"RollingRate({list(self.keys)}, prefix={self.prefix!r}, windows={self.windows})"
+
+
+class FeaturePlan:
+    """FeaturePipeline.plan 的結果：要讀取的欄位，以及依排序方式合併後的計算步驟"""
+
+    def __init__(self, runs_columns, races_columns, sort_groups, outputs):
+        self.runs_columns = runs_columns        # 只讀取的 run.csv 欄位（DataFrame 輸入時為全部需要的欄位）
+        self.races_columns = races_columns      # 只讀取的 races.csv 欄位
+        self.sort_groups = sort_groups          # 個體鍵 -> 共用同一次排序的 RollingRate
+        self.outputs = outputs                  # 輸出欄位順序
+
+    def explain(self):
+        """以文字列出計算步驟"""
+        lines = [f"讀取 run.csv 欄位：{self.runs_columns}"]
+        if self.races_columns is not None:
+            lines.append(f"讀取 races.csv 欄位：{self.races_columns}，以 race_id 合併")
+        if self.sort_groups:
+            lines.append("依 date 排序一次，命中矩陣計算一次（全部個體共用）")
+        for keys, features in self.sort_groups.items():
+            windows = sorted({window for feature in features for window in feature.windows})
+            columns = [column for feature in features for column in feature.output_columns()]
+            lines.append(f"依 {list(keys)} 穩定排序一次，視窗 {windows} 共用前綴和 -> {columns}")
+        lines.append(f"輸出欄位：{self.outputs}")
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.explain()
+
+
+class FeaturePipeline:
+    """宣告式的特徵處理流程：先描述要哪些欄位與特徵，plan 規劃後 collect 一次執行
+
+    規劃時只讀 CSV 的標頭，依輸出欄位與特徵需要的欄位裁剪 usecols，不讀用不到的欄位；
+    個體鍵相同的 RollingRate 合併成一次排序（視窗取聯集），日期排序與命中矩陣
+    全部個體共用，因此新增一個個體特徵只多一次以個體鍵的穩定排序，不多一次 groupby。
+    """
+
+    def __init__(self, columns=None, features=(), place_result=False):
+        self.columns = None if columns is None else list(columns)
+        self.features = list(features)
+        self.place_result = place_result
+        self.rate_moments = {}      # 勝率欄位 -> 原始勝率的 RunningMoments（collect 後）
+
+    @classmethod
+    def default(cls, columns, n_races=10):
+        """與 DataProcessor.prepare 相同的特徵：place_result 與馬匹、騎師的勝率"""
+        return cls(columns, [RollingRate("horse_id", "horse", n_races), RollingRate("jockey_id", "jockey", n_races)],
+                   place_result=True)
+
+    def add(self, feature):
+        self.features.append(feature)
+        return self
+
+    def _required_columns(self, available):
+        columns = list(available) if self.columns is None else list(self.columns)
+        needed = ["race_id"] + columns
+        if self.place_result:
+            needed.append("result")
+        for feature in self.features:
+            needed += list(feature.keys) + ["result", "date"]
+        return columns, list(dict.fromkeys(needed))
+
+    def _sort_groups(self):
+        groups = {}
+        for feature in self.features:
+            groups.setdefault(feature.keys, []).append(feature)
+        return groups
+
+    def _outputs(self, columns):
+        outputs = columns + (["place_result"] if self.place_result else [])
+        for feature in self.features:
+            outputs += list(feature.output_columns())
+        duplicated = sorted({column for column in outputs if outputs.count(column) > 1})
+        if duplicated:
+            raise ValueError(f"輸出欄位重複：{duplicated}")
+        return outputs
+
+    def plan(self, runs_path="./data/run.csv", races_path="./data/races.csv", data=None):
+        """規劃要讀取的欄位與計算步驟（只讀 CSV 標頭）；data 為已載入的 DataFrame 時不讀檔"""
+        if data is not None:
+            columns, needed = self._required_columns(data.columns)
+            missing_columns = [col for col in needed if col not in data.columns]
+            if missing_columns:
+                raise ValueError(f"缺少必要欄位：{missing_columns}")
+            return FeaturePlan(needed, None, self._sort_groups(), self._outputs(columns))
+
+        runs_header = list(pd.read_csv(runs_path, nrows=0).columns)
+        races_header = [] if races_path is None else list(pd.read_csv(races_path, nrows=0).columns)
+        # 組合欄位在合併時已換算成每匹馬的派彩，不會出現在結果中
+        available = [col for col in dict.fromkeys(runs_header + races_header) if col not in COMBINATION_COLUMNS]
+        columns, needed = self._required_columns(available)
+
+        runs_columns, races_columns = ["race_id"], ["race_id"]
+        missing_columns = []
+        for column in needed:
+            if column in DERIVED_COLUMNS and races_path is not None:
+                run_sources, race_sources = DERIVED_COLUMNS[column]
+                runs_columns += run_sources
+                races_columns += race_sources
+            elif column in runs_header:
+                runs_columns.append(column)
+            elif column in races_header:
+                races_columns.append(column)
+            else:
+                missing_columns.append(column)
+        if missing_columns:
+            raise ValueError(f"缺少必要欄位：{missing_columns}")
+        runs_columns = list(dict.fromkeys(runs_columns))
+        races_columns = list(dict.fromkeys(races_columns)) if races_path is not None else None
+        return FeaturePlan(runs_columns, races_columns, self._sort_groups(), self._outputs(columns))
+
+    def collect(self, runs_path="./data/run.csv", races_path="./data/races.csv", data=None):
+        """依規劃讀取資料並一次算出全部特徵，回傳處理後的 DataFrame"""
+        plan = self.plan(runs_path, races_path, data)
+        if data is not None:
+            data = data[plan.runs_columns].reset_index(drop=True)
+        else:
+            runs = pd.read_csv(runs_path, usecols=plan.runs_columns,
+                               dtype={col: RUNS_DTYPES[col] for col in plan.runs_columns if col in RUNS_DTYPES})
+            if plan.races_columns is None:
+                data = runs
+            else:
+                data = join_race_runs(read_races(races_path, usecols=plan.races_columns), runs)
+
+        outputs = {column: data[column] for column in plan.outputs if column in data.columns}
+        if self.place_result:
+            outputs["place_result"] = data["result"].isin([1, 2, 3]).astype(np.int64)
+        outputs.update(self._rolling_rates(data, plan.sort_groups))
+        return pd.DataFrame(outputs, index=data.index)[plan.outputs]
+
+    def _rolling_rates(self, data, sort_groups):
+        if not sort_groups:
+            return {}
+        # 全部個體共用：日期代碼與其穩定排序、命中矩陣
+        date_codes = DataProcessor._date_codes(data["date"])
+        date_order = np.argsort(date_codes, kind="stable")
+        hits = hit_matrix(data["result"])
+
+        columns = {}
+        self.rate_moments = {}
+        for keys, features in sort_groups.items():
+            group_codes = self._group_codes(data, keys)
+            # 日期已排好，以個體鍵再做一次穩定排序即等於 lexsort((date, key))
+            order = date_order[np.argsort(group_codes[date_order], kind="stable")]
+            windows = sorted({window for feature in features for window in feature.windows})
+            rates = rolling_hit_rates(group_codes, date_codes, hits, windows, order=order)
+
+            for feature in features:
+                for column, rate_key in feature.output_columns().items():
+                    values = rates[rate_key]
+                    if feature.normalize:
+                        moments = self.rate_moments[column] = RunningMoments().update(values)
+                        values = moments.normalize(values)
+                    columns[column] = values
+        return columns
+
+    @staticmethod
+    def _group_codes(data, keys):
+        """一個或多個欄位組成的個體鍵轉成整數代碼"""
+        codes = np.zeros(len(data), dtype=np.int64)
+        for key in keys:
+            key_codes, uniques = pd.factorize(data[key])
+            # 缺值自成一組
+            key_codes = np.where(key_codes < 0, len(uniques), key_codes)
+            codes = codes * (len(uniques) + 1) + key_codes
+        return codes
@@ -0,0 +1,197 @@
+import numpy as np
+import pandas as pd
+
+# 勝率特徵的命中條件
+TARGETS = ("top1", "top3")
+
+
+def hit_matrix(result):
+    """由名次算出 (n, 2) 的命中矩陣：第一名、前三名"""
+    result = np.asarray(result)
+    return np.column_stack([result == 1, np.isin(result, [1, 2, 3])])
+
+
+def rolling_hit_rates(group_codes, order_codes, hits, windows, order=None):
+    """以單次穩定排序加前綴和，計算每一列在所屬群組中前 n 列的命中率（不含當列）
+
+    group_codes 與 order_codes 為整數陣列；同一群組內依 order_codes 排序，
+    相同 order_codes 維持輸入順序。hits 為 (n, 目標數) 的命中矩陣。
+    order 為已算好的 np.lexsort((order_codes, group_codes))，可省去排序。
+    回傳 {(目標索引, 視窗大小): 依輸入順序排列的命中率}，沒有歷史資料時為 0。
+    """
+    if order is None:
+        order = np.lexsort((order_codes, group_codes))
+
+    # 每一列在所屬群組中的位置
+    n = len(order)
+    sorted_groups = group_codes[order]
+    is_start = np.ones(n, dtype=bool)
+    is_start[1:] = sorted_groups[1:] != sorted_groups[:-1]
+    group_start = np.maximum.accumulate(np.where(is_start, np.arange(n), 0))
+    position = np.arange(n) - group_start
+
+    rates = {}
+    for target in range(hits.shape[1]):
+        # 前綴和：cumsum[j] 為排序後前 j 列的命中次數，當列不會被算進去
+        cumsum = np.concatenate(([0], np.cumsum(hits[order, target])))
+        for window in windows:
+            count = np.minimum(position, window)
+            total = cumsum[:-1] - cumsum[np.arange(n) - count]
+            rate = np.divide(total, count, out=np.zeros(n), where=count > 0)
+
+            values = np.empty(n)
+            values[order] = rate
+            rates[target, window] = values
+    return rates
+
+
+class EntityHistory:
+    """每個個體（馬匹、騎師）最近幾場的命中紀錄，以環狀緩衝區保存
+
+    用來在分塊或新增資料時延續滾動勝率：新區塊只需處理新列，
+    並把緩衝區內的歷史當成排在最前面的列一起計算。
+    """
+
+    STATE_FIELDS = ("windows", "index", "buffer", "count", "head")
+
+    def __init__(self, windows):
+        self.windows = list(windows)
+        self.size = max(self.windows)
+        self.index = pd.Index([])                                        # 個體 id -> 槽位
+        self.buffer = np.zeros((0, self.size, len(TARGETS)), dtype=bool)
+        self.count = np.zeros(0, dtype=np.int64)                         # 緩衝區內的場數
+        self.head = np.zeros(0, dtype=np.int64)                          # 下一筆寫入位置
+
+    def state(self):
+        """以陣列表示的狀態，可用 np.savez 儲存"""
+        return {
+            "windows": np.asarray(self.windows),
+            "index": self.index.to_numpy(),
+            "buffer": self.buffer,
+            "count": self.count,
+            "head": self.head,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        history = cls(state["windows"].tolist())
+        history.index = pd.Index(state["index"])
+        history.buffer = state["buffer"]
+        history.count = state["count"]
+        history.head = state["head"]
+        return history
+
+    def _slots(self, keys):
+        slots = self.index.get_indexer(keys)
+        new = slots < 0
+        if new.any():
+            new_keys = pd.unique(np.asarray(keys)[new])
+            self.index = self.index.append(pd.Index(new_keys))
+            n_new = len(new_keys)
+            self.buffer = np.concatenate([self.buffer, np.zeros((n_new, self.size, len(TARGETS)), dtype=bool)])
+            self.count = np.concatenate([self.count, np.zeros(n_new, dtype=np.int64)])
+            self.head = np.concatenate([self.head, np.zeros(n_new, dtype=np.int64)])
+            slots = self.index.get_indexer(keys)
+        return slots
+
+    def update(self, keys, order_codes, hits):
+        """加入新列並回傳新列的滾動命中率 {(目標索引, 視窗大小): 陣列}
+
+        新列須晚於緩衝區內所有紀錄；新列之間依 order_codes 排序。
+        """
+        slots = self._slots(keys)
+        present = np.unique(slots)
+
+        # 1. 把出現個體的歷史從環狀緩衝區展開成列（由舊到新）
+        history_count = self.count[present]
+        history_slots = np.repeat(present, history_count)
+        history_start = np.repeat(np.cumsum(history_count) - history_count, history_count)
+        age = np.arange(len(history_slots)) - history_start
+        position = (self.head[history_slots] - self.count[history_slots] + age) % self.size
+        history_hits = self.buffer[history_slots, position]
+
+        # 2. 歷史列排在所有新列之前，一起計算
+        n_history = len(history_slots)
+        rates = rolling_hit_rates(
+            np.concatenate([history_slots, slots]),
+            np.concatenate([np.full(n_history, -1), order_codes]),
+            np.concatenate([history_hits, hits]),
+            self.windows,
+        )
+        rates = {key: values[n_history:] for key, values in rates.items()}
+
+        # 3. 新列依時間寫回緩衝區，只保留每個個體最後 size 筆
+        order = np.lexsort((order_codes, slots))
+        sorted_slots = slots[order]
+        new_count = np.bincount(sorted_slots, minlength=len(self.index))
+        rank = np.arange(len(order)) - (np.cumsum(new_count) - new_count)[sorted_slots]
+        keep = rank >= new_count[sorted_slots] - self.size
+        kept_slots = sorted_slots[keep]
+        self.buffer[kept_slots, (self.head[kept_slots] + rank[keep]) % self.size] = hits[order][keep]
+        self.head = (self.head + new_count) % self.size
+        self.count = np.minimum(self.count + new_count, self.size)
+        return rates
+
+    def current_rates(self):
+        """每個個體「下一場」的滾動命中率 {(目標索引, 視窗大小): 依 index 排列的陣列}
+
+        與 update 對新列算出的值相同（只用緩衝區內最近 min(場數, 視窗) 場），沒有歷史時為 0。
+        """
+        n = len(self.index)
+        age = np.arange(self.size)      # 0 為最近一場
+        position = (self.head[:, None] - 1 - age) % self.size
+        recent = self.buffer[np.arange(n)[:, None], position] & (age < self.count[:, None])[:, :, None]
+        cumsum = np.cumsum(recent, axis=1)
+
+        rates = {}
+        for target in range(len(TARGETS)):
+            for window in self.windows:
+                count = np.minimum(self.count, window)
+                total = cumsum[:, window - 1, target] if n else np.zeros(0)
+                rates[target, window] = np.divide(total, count, out=np.zeros(n), where=count > 0)
+        return rates
+
+
+class RunningMoments:
+    """以合併公式累計的平均與變異數，不需保留全部資料"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        count = len(values)
+        if count == 0:
+            return self
+        mean = values.mean()
+        m2 = ((values - mean) ** 2).sum()
+
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+        return self
+
+    @property
+    def std(self):
+        """樣本標準差（與 pandas Series.std() 相同，ddof=1）"""
+        if self.count < 2:
+            return np.nan
+        return np.sqrt(self.m2 / (self.count - 1))
+
+    def denormalize(self, values):
+        """normalize 的反運算"""
+        std = self.std
+        if not std > 0:
+            return values + self.mean
+        return values * std + self.mean
+
+    def normalize(self, values):
+        """以目前累計的平均與標準差標準化"""
+        std = self.std
+        if not std > 0:
+            return values - self.mean  # 如果標準差為0，只做中心化
+        return (values - self.mean) / std
@@ -0,0 +1,170 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from betting_strategy import BettingType
+from profiling import strategy_label
+from race_arrays import RaceArrays
+from random_streams import RandomStreams
+from vectorized_simulation import VectorizedSimulation
+
+# 與 result_records.py 的表格相同的策略名稱
+STRATEGY_NAMES = {
+    "RandomStrategy": "隨機策略",
+    "OddsBasedStrategy": "賠率策略",
+    "MinOddsBasedStrategy": "最低賠率策略",
+    "MaxOddsBasedStrategy": "最高賠率策略",
+    "JockeyBasedStrategy": "騎師勝率策略",
+    "MaxJockeyBasedStrategy": "最高騎師勝率策略",
+    "MaxHorseBasedStrategy": "馬匹勝率策略",
+    "MaxHorseOddsBasedStrategy": "馬匹賠率策略",
+    "MaxJockeyOddsBasedStrategy": "騎師賠率策略",
+    "CombinedStrategy": "綜合策略",
+}
+
+RESULT_COLUMNS = ["策略", "投注項目", "平均損益", "損益標準差", "最小損益", "最大損益", "平均賽事數"]
+
+
+class SharedRaceArrays:
+    """把 RaceArrays 的數值欄位放進共享記憶體，子行程只需掛載、不必 pickle 整份資料"""
+
+    def __init__(self, arrays, columns=None):
+        if columns is None:
+            # 物件欄位（例如字串日期）無法放進共享記憶體，模擬也用不到
+            columns = [name for name, values in arrays.columns.items() if values.dtype != object]
+
+        self._blocks = []
+        self.spec = {
+            "columns": {name: self._share(arrays[name]) for name in columns},
+            "offsets": self._share(arrays.offsets),
+            "race_ids": self._share(arrays.race_ids),
+        }
+
+    def _share(self, values):
+        values = np.ascontiguousarray(values)
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[...] = values
+        self._blocks.append(block)
+        return block.name, values.dtype.str, values.shape
+
+    @staticmethod
+    def attach(spec):
+        """依 spec 掛載共享記憶體，回傳 (RaceArrays, 需保留參照的區塊)"""
+        blocks = []
+
+        def view(entry):
+            name, dtype, shape = entry
+            block = shared_memory.SharedMemory(name=name)
+            blocks.append(block)
+            return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+        columns = {name: view(entry) for name, entry in spec["columns"].items()}
+        arrays = RaceArrays(columns, view(spec["offsets"]), view(spec["race_ids"]))
+        return arrays, blocks
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# 子行程內掛載好的賽事資料
+_worker_arrays = None
+_worker_blocks = None
+
+
+def _init_worker(spec):
+    global _worker_arrays, _worker_blocks
+    _worker_arrays, _worker_blocks = SharedRaceArrays.attach(spec)
+
+
+def _run_task(task):
+    strategy, n_simulations, seed = task
+    sim = VectorizedSimulation(n_simulations, strategy, seed=seed)
+    profits = sim.simulate_replicates(_worker_arrays)
+    return profits, _worker_arrays.n_races
+
+
+def strategy_params(strategy):
+    """取得策略的參數（不含 betting_type）"""
+    return {key: value for key, value in vars(strategy).items() if key != "betting_type"}
+
+
+def strategy_labels(strategies):
+    """每個策略含參數的名稱，例如 CombinedStrategy[win](alpha=0.65, beta=0.25, gamma=0.1)
+
+    同類別、不同參數的策略（例如 expand_grid 展開的網格）名稱不同；完全相同的策略會引發 ValueError。
+    """
+    labels = []
+    for strategy in strategies:
+        params = ", ".join(f"{key}={value}" for key, value in strategy_params(strategy).items())
+        labels.append(f"{strategy_label(strategy)}({params})" if params else strategy_label(strategy))
+    duplicates = sorted({label for label in labels if labels.count(label) > 1})
+    if duplicates:
+        raise ValueError(f"策略重複：{duplicates}")
+    return labels
+
+
+def expand_grid(strategy_cls, param_grid=None, betting_types=(BettingType.WIN, BettingType.PLACE)):
+    """依參數網格展開策略實例，例如 expand_grid(CombinedStrategy, {"alpha": [0.65, 0.75]})"""
+    param_grid = param_grid or {}
+    keys = list(param_grid)
+    strategies = []
+    for values in itertools.product(*(param_grid[key] for key in keys)):
+        for betting_type in betting_types:
+            strategies.append(strategy_cls(**dict(zip(keys, values)), betting_type=betting_type))
+    return strategies
+
+
+def run_grid(strategies, races, n_simulations, max_workers=None, seed=None, store=None, tag=None):
+    """在行程池上平行執行多個策略，回傳與 result_records.py 相同格式的結果表
+
+    strategies 為 BettingStrategy 實例的 list；races 可為 RaceArrays、DataFrame 或 GroupBy。
+    有提供 results_store.ResultsStore 時，各策略的每個重複模擬損益連同資料雜湊與種子一併寫入。
+    """
+    strategies = list(strategies)
+    arrays = RaceArrays.from_races(races)
+
+    # 全部任務共用主種子，各策略的亂數流由策略本身衍生，結果與排程順序、平行度無關
+    seed = RandomStreams(seed).entropy
+    tasks = [(strategy, n_simulations, seed) for strategy in strategies]
+
+    max_workers = max_workers or min(len(tasks), os.cpu_count() or 1)
+    with SharedRaceArrays(arrays) as shared:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(shared.spec,)) as executor:
+            outputs = list(executor.map(_run_task, tasks))
+
+    if store is not None:
+        data_hash = arrays.content_hash()
+        store.add_runs([(strategy, profits, race_count, seed, data_hash, "VectorizedSimulation", tag)
+                        for strategy, (profits, race_count) in zip(strategies, outputs)])
+
+    rows = []
+    for strategy, (profits, race_count) in zip(strategies, outputs):
+        name = type(strategy).__name__
+        rows.append({
+            "策略": STRATEGY_NAMES.get(name, name),
+            "投注項目": strategy.betting_type.upper(),
+            "平均損益": np.mean(profits),
+            "損益標準差": np.std(profits),
+            "最小損益": np.min(profits),
+            "最大損益": np.max(profits),
+            "平均賽事數": race_count,
+            **strategy_params(strategy),
+        })
+
+    df = pd.DataFrame(rows)
+    param_columns = [col for col in df.columns if col not in RESULT_COLUMNS]
+    return df[RESULT_COLUMNS[:2] + param_columns + RESULT_COLUMNS[2:]]
@@ -0,0 +1,256 @@
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_processor import DataProcessor
+from feature_state import TARGETS
+from grid_runner import strategy_labels
+from race_arrays import RaceArrays, pick_candidates
+from random_streams import RandomStreams
+
+# 賠率更新檔的欄位：time 為距離回放開始的秒數
+UPDATE_COLUMNS = ["time", "race_id", "horse_no", "win_odds", "place_odds"]
+# 排位表（每場出賽馬匹）的欄位
+CARD_COLUMNS = ["race_id", "horse_no", "horse_id", "jockey_id"]
+
+
+def write_odds_timeline(data, path, n_updates=5, race_interval=1800.0, window=1200.0, volatility=0.3, seed=0):
+    """由歷史資料產生模擬的賠率更新檔，當成即時賠率的替代來源
+
+    每場賽事依 race_id 順序每 race_interval 秒開跑一場，開跑前 window 秒內每匹馬有
+    n_updates 筆更新；賠率由最終賠率加上隨時間縮小的對數常態擾動，最後一筆即為最終賠率。
+    """
+    missing_columns = [col for col in ["race_id", "horse_no", "win_odds", "place_odds"] if col not in data.columns]
+    if missing_columns:
+        raise ValueError(f"缺少必要欄位：{missing_columns}")
+    rng = np.random.default_rng(seed)
+    runs = data[["race_id", "horse_no", "win_odds", "place_odds"]].dropna(subset=["race_id"])
+    post = pd.factorize(runs["race_id"], sort=True)[0] * race_interval + window
+
+    # 每匹馬 n_updates 筆：剩餘時間比例 1 -> 0
+    remaining = np.linspace(1.0, 0.0, n_updates)
+    rows = np.repeat(np.arange(len(runs)), n_updates)
+    fraction = np.tile(remaining, len(runs))
+    noise = np.exp(volatility * fraction[:, None] * rng.standard_normal((len(rows), 2)))
+    timeline = pd.DataFrame({
+        "time": np.repeat(post, n_updates) - fraction * window,
+        "race_id": runs["race_id"].to_numpy()[rows],
+        "horse_no": runs["horse_no"].to_numpy()[rows],
+        # 賠率最低為 1
+        "win_odds": np.maximum(runs["win_odds"].to_numpy()[rows] * noise[:, 0], 1.0).round(1),
+        "place_odds": np.maximum(runs["place_odds"].to_numpy()[rows] * noise[:, 1], 1.0).round(1),
+    })
+    timeline = timeline.sort_values(["time", "race_id", "horse_no"], kind="stable")
+    timeline.to_csv(path, index=False)
+    return timeline
+
+
+class OddsFileSource:
+    """從本地檔案回放賠率更新（即時賠率來源的替代品）
+
+    speed 為回放倍速：0 表示不等待、盡快送出；1 表示依檔案中的時間間隔即時送出。
+    """
+
+    def __init__(self, path, speed=0.0):
+        self.path = path
+        self.speed = speed
+
+    async def __aiter__(self):
+        updates = pd.read_csv(self.path)
+        missing_columns = [col for col in UPDATE_COLUMNS if col not in updates.columns]
+        if missing_columns:
+            raise ValueError(f"賠率更新檔缺少欄位：{missing_columns}")
+        updates = updates.sort_values("time", kind="stable")
+
+        start = time.perf_counter()
+        first = updates["time"].iloc[0] if len(updates) else 0.0
+        for update in updates[UPDATE_COLUMNS].itertuples(index=False):
+            if self.speed > 0:
+                delay = (update.time - first) / self.speed - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield update
+
+
+class LiveFeatures:
+    """由 DataProcessor 保存的個體歷史與標準化統計量查詢馬匹、騎師的勝率特徵
+
+    每個個體「下一場」的勝率在建立時一次算好並標準化，之後每場賽事只是查表，
+    不需要重跑 DataProcessor。沒有歷史的個體與 DataProcessor 相同以勝率 0 計算。
+    """
+
+    def __init__(self, entity_history, rate_moments, win_rate_params):
+        self.tables = {}    # prefix -> (id 的 Index, {欄位: 依 Index 排列的標準化勝率}, {欄位: 沒有歷史時的值})
+        for prefix, history in entity_history.items():
+            _, n_races = win_rate_params[prefix]
+            windows, suffixes = DataProcessor._windows(n_races)
+            rates = history.current_rates()
+            values, defaults = {}, {}
+            for t, target in enumerate(TARGETS):
+                for window, suffix in zip(windows, suffixes):
+                    column = f"{prefix}_win_rate_{target}{suffix}"
+                    moments = rate_moments[column]
+                    values[column] = moments.normalize(rates[t, window])
+                    defaults[column] = moments.normalize(0.0)
+            self.tables[prefix] = (history.index, values, defaults)
+        self.keys = {prefix: key for prefix, (key, _) in win_rate_params.items()}
+
+    @classmethod
+    def from_processor(cls, processor):
+        """processor 須已計算勝率特徵（prepare / add_*_win_rate）或以 load_feature_state 讀回狀態"""
+        if not processor.entity_history:
+            raise ValueError("請先載入資料並計算勝率特徵")
+        return cls(processor.entity_history, processor.rate_moments, processor.win_rate_params)
+
+    def lookup(self, card):
+        """排位表（含 horse_id、jockey_id 等欄位的 DataFrame）每一列的特徵 {欄位: 陣列}"""
+        features = {}
+        for prefix, (index, values, defaults) in self.tables.items():
+            slots = index.get_indexer(card[self.keys[prefix]].to_numpy())
+            known = slots >= 0
+            for column, table in values.items():
+                features[column] = np.where(known, table[np.where(known, slots, 0)], defaults[column])
+        return features
+
+
+class RaceState:
+    """一場賽事在記憶體中的狀態：特徵在建立時查好，每筆更新只原地改賠率"""
+
+    def __init__(self, race_id, card, features, uniforms):
+        self.race_id = race_id
+        self.uniforms = uniforms    # 每個策略在這場並列時用的亂數，與 race_id 綁定，不必每次更新重算
+        self.horse_no = card["horse_no"].to_numpy()
+        columns = {name: np.asarray(values, dtype=np.float64) for name, values in features.items()}
+        columns["horse_no"] = self.horse_no
+        for column in ("win_odds", "place_odds"):
+            columns[column] = np.full(len(card), np.nan)
+        self.arrays = RaceArrays(columns, np.array([0, len(card)], dtype=np.int64), np.array([race_id]))
+        self._position = {horse_no: i for i, horse_no in enumerate(self.horse_no.tolist())}
+        self.n_updates = 0
+
+    def update(self, horse_no, win_odds, place_odds):
+        i = self._position.get(horse_no)
+        if i is None:
+            return False
+        self.arrays.columns["win_odds"][i] = win_odds
+        self.arrays.columns["place_odds"][i] = place_odds
+        self.n_updates += 1
+        return True
+
+
+class OddsReplayService:
+    """以 asyncio 回放賠率更新，每筆更新後讓各策略對該場賽事重新選馬
+
+    策略使用陣列核心（score_arrays）在單場的小陣列上選馬，並列時的亂數由
+    RandomStreams 依 (策略, race_id) 決定並在建立時一次算好，同一場的多次更新不會因亂數而換馬，
+    選擇也與 VectorizedSimulation 第 0 個重複模擬在最終賠率上的選擇相同。
+    每次選馬的耗時記錄在 latencies，latency_report 回傳各策略的百分位數；
+    策略以含參數的名稱（grid_runner.strategy_labels）區分，不可重複。
+    """
+
+    def __init__(self, card, features, strategies, seed=None, queue_size=10_000):
+        missing_columns = [col for col in CARD_COLUMNS if col not in card.columns]
+        if missing_columns:
+            raise ValueError(f"排位表缺少欄位：{missing_columns}")
+        self.strategies = list(strategies)
+        for strategy in self.strategies:
+            if not strategy.has_array_kernel:
+                raise ValueError(f"即時選馬需要策略的陣列核心: {type(strategy).__name__}")
+
+        streams = RandomStreams(seed)
+        self.seed = streams.entropy
+        replicates = [streams.for_strategy(strategy).replicate(0) for strategy in self.strategies]
+        # 名稱含參數，同類別、不同參數的策略各自記錄耗時與選擇
+        self.labels = strategy_labels(self.strategies)
+        self.queue_size = queue_size
+
+        # 全部賽事的特徵一次查好，依 race_id 切成各場的狀態
+        card = card.sort_values(["race_id", "horse_no"], kind="stable").reset_index(drop=True)
+        features = features.lookup(card)
+        groups = card.groupby("race_id", sort=False).indices
+        race_ids = np.array(list(groups))
+        uniforms = np.stack([stream.uniforms(race_ids) for stream in replicates], axis=1) if len(race_ids) else None
+        self.races = {}
+        for i, (race_id, rows) in enumerate(groups.items()):
+            race_features = {column: values[rows] for column, values in features.items()}
+            self.races[race_id] = RaceState(race_id, card.iloc[rows], race_features, uniforms[i])
+
+        self.latencies = {label: [] for label in self.labels}
+        self.decisions = {}     # (race_id, 策略) -> 最新選中的馬號
+        self.n_updates = 0
+        self.n_skipped = 0
+
+    def decide(self, race):
+        """對一場賽事執行全部策略，回傳 {策略: 馬號}，並記錄每個策略的耗時"""
+        now = time.perf_counter_ns
+        decisions = {}
+        for j, (strategy, label) in enumerate(zip(self.strategies, self.labels)):
+            start = now()
+            cand_rows, cand_offsets = strategy.candidates(race.arrays)
+            row = pick_candidates(cand_rows, cand_offsets, race.uniforms[j])[0]
+            self.latencies[label].append(now() - start)
+            decisions[label] = race.horse_no[row]
+        return decisions
+
+    def handle(self, update):
+        """處理一筆賠率更新，回傳各策略的選擇；不在排位表上的更新略過並回傳 None"""
+        race = self.races.get(update.race_id)
+        if race is None or not race.update(update.horse_no, update.win_odds, update.place_odds):
+            self.n_skipped += 1
+            return None
+        self.n_updates += 1
+        decisions = self.decide(race)
+        for label, horse_no in decisions.items():
+            self.decisions[update.race_id, label] = horse_no
+        return decisions
+
+    async def replay(self, source, on_decision=None):
+        """由 source（非同步產生更新的物件，例如 OddsFileSource）回放全部更新
+
+        讀取與處理以 asyncio.Queue 分開，來源換成真正的即時連線時處理端不必修改；
+        on_decision(update, decisions) 可接收每筆更新後的選擇。
+        """
+        queue = asyncio.Queue(self.queue_size)
+
+        async def produce():
+            async for update in source:
+                await queue.put(update)
+            await queue.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                update = await queue.get()
+                if update is None:
+                    break
+                decisions = self.handle(update)
+                if decisions is not None and on_decision is not None:
+                    on_decision(update, decisions)
+        finally:
+            producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+        return self
+
+    def run(self, source, on_decision=None):
+        """同步版本的 replay"""
+        return asyncio.run(self.replay(source, on_decision))
+
+    def decision_table(self):
+        """每場賽事、每個策略最後一次的選擇"""
+        rows = [{"race_id": race_id, "策略": label, "horse_no": horse_no}
+                for (race_id, label), horse_no in self.decisions.items()]
+        return pd.DataFrame(rows, columns=["race_id", "策略", "horse_no"])
+
+    def latency_report(self, percentiles=(50, 90, 99)):
+        """各策略每次選馬耗時的百分位數與最大值（微秒）"""
+        rows = []
+        for label, latencies in self.latencies.items():
+            latencies = np.asarray(latencies) / 1e3
+            row = {"策略": label, "次數": len(latencies)}
+            for q in percentiles:
+                row[f"p{q}_us"] = np.percentile(latencies, q) if len(latencies) else np.nan
+            row["max_us"] = latencies.max() if len(latencies) else np.nan
+            rows.append(row)
+        return pd.DataFrame(rows)
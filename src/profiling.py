@@ -0,0 +1,90 @@
+import json
+import os
+import time
+
+
+def strategy_label(strategy):
+    """計時紀錄使用的策略名稱，例如 CombinedStrategy[win]"""
+    return f"{type(strategy).__name__}[{strategy.betting_type}]"
+
+
+class StageProfiler:
+    """模擬各階段的計時器，傳給 Simulation(instrumentation=...) 才會啟用
+
+    每個 (策略, 階段) 只累加呼叫次數與總奈秒數；trace=True 時另外保留每次呼叫的
+    起訖時間，可輸出成 Chrome trace（chrome://tracing 或 Perfetto 開啟）。
+    同一個 StageProfiler 可以傳給多個 Simulation，彙總整個策略網格的耗時。
+    """
+
+    now = staticmethod(time.perf_counter_ns)
+
+    def __init__(self, trace=False, max_events=1_000_000):
+        self.totals = {}    # (策略, 階段) -> [次數, 總奈秒數]
+        self.trace = trace
+        self.max_events = max_events
+        self.events = []    # (策略, 階段, 開始奈秒, 結束奈秒)
+        self.dropped_events = 0
+
+    def add(self, strategy, stage, start, stop):
+        """記錄一段 [start, stop) 的耗時，時間由 now() 取得"""
+        total = self.totals.get((strategy, stage))
+        if total is None:
+            total = self.totals[strategy, stage] = [0, 0]
+        total[0] += 1
+        total[1] += stop - start
+        if self.trace:
+            if len(self.events) < self.max_events:
+                self.events.append((strategy, stage, start, stop))
+            else:
+                self.dropped_events += 1
+
+    def reset(self):
+        self.totals = {}
+        self.events = []
+        self.dropped_events = 0
+
+    def summary(self):
+        """{策略: {階段: {count, seconds, mean_us, share}}}，share 為該階段佔策略總耗時的比例
+
+        run_simulation 階段包含其他階段，不計入 share 的分母。
+        """
+        result = {}
+        for (strategy, stage), (count, total_ns) in self.totals.items():
+            result.setdefault(strategy, {})[stage] = {
+                "count": count,
+                "seconds": total_ns / 1e9,
+                "mean_us": total_ns / count / 1e3,
+            }
+        for stages in result.values():
+            inner = sum(record["seconds"] for stage, record in stages.items() if stage != "run_simulation")
+            for stage, record in stages.items():
+                record["share"] = record["seconds"] / inner if stage != "run_simulation" and inner > 0 else None
+        return result
+
+    def to_json(self, path=None):
+        """輸出彙總結果；有 path 時寫入檔案，並回傳 JSON 字串"""
+        text = json.dumps(self.summary(), indent=2, ensure_ascii=False)
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def chrome_trace(self):
+        """Chrome trace event 格式的 dict，每個策略一條執行緒"""
+        if not self.trace:
+            raise ValueError("需以 StageProfiler(trace=True) 記錄每次呼叫才能輸出 trace")
+        pid = os.getpid()
+        tids = {}
+        events = []
+        for strategy, stage, start, stop in self.events:
+            tid = tids.setdefault(strategy, len(tids))
+            events.append({"name": stage, "cat": strategy, "ph": "X", "pid": pid, "tid": tid,
+                           "ts": start / 1e3, "dur": (stop - start) / 1e3})
+        for strategy, tid in tids.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": strategy}})
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"dropped_events": self.dropped_events}}
+
+    def to_chrome_trace(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
@@ -0,0 +1,313 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+class RaceArrays:
+    """以扁平 NumPy 陣列表示全部賽事
+
+    所有欄位依 race_id 排序後攤平成一維陣列，
+    offsets[i]:offsets[i + 1] 即為第 i 場賽事的列範圍。
+    """
+
+    def __init__(self, columns, offsets, race_ids):
+        self.columns = columns      # 欄位名稱 -> 一維陣列
+        self.offsets = offsets      # 長度為 n_races + 1
+        self.race_ids = race_ids    # 每場賽事的 race_id
+        self._race_index = None
+
+    @classmethod
+    def from_dataframe(cls, data, columns=None):
+        """由處理後的 DataFrame 建立（賽事順序與 groupby('race_id') 相同）"""
+        if 'race_id' not in data.columns:
+            raise ValueError("缺少 race_id 欄位")
+        if columns is None:
+            columns = data.columns.tolist()
+
+        # groupby 會略過 race_id 為 NaN 的列
+        data = data[data['race_id'].notna()]
+        race_id = data['race_id'].to_numpy()
+
+        # 穩定排序，確保同一場賽事內維持原本列順序
+        order = np.argsort(race_id, kind='stable')
+        race_id = race_id[order]
+
+        if len(race_id):
+            starts = np.flatnonzero(np.r_[True, race_id[1:] != race_id[:-1]])
+        else:
+            starts = np.zeros(0, dtype=np.int64)
+        offsets = np.append(starts, len(race_id)).astype(np.int64)
+
+        arrays = {col: data[col].to_numpy()[order] for col in columns}
+        return cls(arrays, offsets, race_id[starts])
+
+    @classmethod
+    def from_columns(cls, columns, offsets=None):
+        """由已依賽事排列的欄位陣列建立；offsets 為 None 時視為單一場賽事"""
+        columns = {name: np.asarray(values) for name, values in columns.items()}
+        n_rows = len(next(iter(columns.values()))) if columns else 0
+        offsets = np.array([0, n_rows]) if offsets is None else np.asarray(offsets)
+        return cls(columns, offsets.astype(np.int64), np.arange(len(offsets) - 1))
+
+    @classmethod
+    def from_races(cls, races, columns=None):
+        """接受 RaceArrays、DataFrame、get_races() 回傳的 GroupBy 或 RaceTensor"""
+        if isinstance(races, cls):
+            return races
+        if hasattr(races, 'to_arrays'):
+            return races.to_arrays(columns=columns)
+        if isinstance(races, pd.DataFrame):
+            return cls.from_dataframe(races, columns)
+        if hasattr(races, 'obj'):
+            return cls.from_dataframe(races.obj, columns)
+        raise ValueError(f"無法轉換為 RaceArrays: {type(races)}")
+
+    @property
+    def n_races(self):
+        return len(self.offsets) - 1
+
+    @property
+    def n_rows(self):
+        return int(self.offsets[-1])
+
+    @property
+    def starts(self):
+        return self.offsets[:-1]
+
+    @property
+    def race_sizes(self):
+        return np.diff(self.offsets)
+
+    @property
+    def race_index(self):
+        """每一列所屬的賽事編號（0 ~ n_races - 1）"""
+        if self._race_index is None:
+            self._race_index = np.repeat(np.arange(self.n_races), self.race_sizes)
+        return self._race_index
+
+    def take(self, races):
+        """取出部分賽事（races 為賽事編號），回傳新的 RaceArrays"""
+        races = np.asarray(races, dtype=np.int64)
+        sizes = self.race_sizes[races]
+        offsets = np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+        # 每場賽事的列範圍接在一起
+        rows = np.repeat(self.offsets[races] - offsets[:-1], sizes) + np.arange(offsets[-1])
+        columns = {name: np.asarray(values)[rows] for name, values in self.columns.items()}
+        return type(self)(columns, offsets, self.race_ids[races])
+
+    @property
+    def max_field(self):
+        """出賽馬匹最多的賽事的馬匹數"""
+        return int(self.race_sizes.max()) if self.n_races else 0
+
+    @property
+    def field_position(self):
+        """每一列在所屬賽事中的位置（0 起算）"""
+        return np.arange(self.n_rows) - self.offsets[:-1][self.race_index]
+
+    def pad(self, values, fill=np.nan):
+        """把依列排列的值攤成 (n_races, max_field) 矩陣，不足的位置填入 fill"""
+        values = np.asarray(values)
+        padded = np.full((self.n_races, self.max_field), fill, dtype=np.result_type(values, np.min_scalar_type(fill)))
+        padded[self.race_index, self.field_position] = values
+        return padded
+
+    def content_hash(self):
+        """資料內容的 SHA-256（前 16 字元）：賽事切分、欄位名稱、型別與值都相同才會相同"""
+        digest = hashlib.sha256()
+        digest.update(np.ascontiguousarray(self.offsets, dtype=np.int64).tobytes())
+        for name in sorted(self.columns):
+            values = np.asarray(self.columns[name])
+            digest.update(f"{name}:{values.dtype.str}".encode())
+            if values.dtype == object:
+                digest.update("\x00".join(map(str, values)).encode())
+            else:
+                digest.update(np.ascontiguousarray(values).tobytes())
+        return digest.hexdigest()[:16]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+
+class PaddedRaces:
+    """以補齊的 (賽事數, 最多馬匹數) 矩陣表示一批賽事，不攤平成一維（例如 RaceTensor 的視圖）
+
+    columns 為欄位名稱 -> (n_races, width) 陣列，mask 標出真正有馬的位置。
+    列索引為攤平後的位置 race * width + position：策略的 score_arrays 是逐元素運算，
+    select_candidates 與 compute_payouts 都可以直接使用，不必先以 mask 複製出一維欄位。
+    """
+
+    def __init__(self, columns, mask, race_ids):
+        self.columns = columns      # 欄位名稱 -> (n_races, width) 陣列，空位的值不使用
+        self.mask = mask            # (n_races, width)
+        self.race_ids = race_ids
+
+    @property
+    def n_races(self):
+        return self.mask.shape[0]
+
+    @property
+    def n_rows(self):
+        """攤平後的位置數（含空位）"""
+        return self.mask.size
+
+    @property
+    def race_sizes(self):
+        return self.mask.sum(axis=1)
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+
+def _select_padded_candidates(races, eligible=None, score=None):
+    """select_candidates 的補齊版本：每場取一列的最大值，候選列為攤平後的位置"""
+    mask = races.mask
+    valid = mask.copy() if eligible is None else mask & np.asarray(eligible, dtype=bool)
+    score = np.zeros(mask.shape) if score is None else np.asarray(score, dtype=np.float64)
+    valid &= ~np.isnan(score)
+
+    # 沒有任何候選的賽事退回整場隨機選一
+    fallback = ~valid.any(axis=1)
+    valid[fallback] = mask[fallback]
+    score = np.where(fallback[:, None], 0.0, score)
+
+    masked = np.where(valid, score, -np.inf)
+    ties = valid & (masked == masked.max(axis=1, keepdims=True))
+
+    cand_rows = np.flatnonzero(ties)
+    cand_offsets = np.concatenate(([0], np.cumsum(ties.sum(axis=1))))
+    return cand_rows, cand_offsets
+
+
+def select_candidates(arrays, eligible=None, score=None):
+    """找出每場賽事評分最高的候選馬（並列者全部保留）
+
+    回傳 (cand_rows, cand_offsets)：第 i 場的候選列為
+    cand_rows[cand_offsets[i]:cand_offsets[i + 1]]。
+    arrays 為 PaddedRaces 時，候選列為補齊矩陣攤平後的位置。
+    """
+    if isinstance(arrays, PaddedRaces):
+        return _select_padded_candidates(arrays, eligible, score)
+    n_rows = arrays.n_rows
+    race_index = arrays.race_index
+    starts = arrays.starts
+
+    valid = np.ones(n_rows, dtype=bool) if eligible is None else np.asarray(eligible, dtype=bool).copy()
+    score = np.zeros(n_rows) if score is None else np.asarray(score, dtype=np.float64)
+    valid &= ~np.isnan(score)
+
+    # 沒有任何候選的賽事退回整場隨機選一
+    fallback = ~np.logical_or.reduceat(valid, starts)[race_index]
+    valid |= fallback
+    score = np.where(fallback, 0.0, score)
+
+    masked = np.where(valid, score, -np.inf)
+    race_max = np.maximum.reduceat(masked, starts)
+    ties = valid & (masked == race_max[race_index])
+
+    cand_rows = np.flatnonzero(ties)
+    counts = np.bincount(race_index[cand_rows], minlength=arrays.n_races)
+    cand_offsets = np.concatenate(([0], np.cumsum(counts)))
+    return cand_rows, cand_offsets
+
+
+def pick_candidates(cand_rows, cand_offsets, u):
+    """以 [0, 1) 均勻亂數 u 在每場的並列候選中選一匹，u 的最後一維對應賽事"""
+    counts = np.diff(cand_offsets)
+    choice = np.minimum((u * counts).astype(np.int64), counts - 1)
+    return cand_rows[cand_offsets[:-1] + choice]
+
+
+class TopKCandidates:
+    """每場評分最高的 k 匹馬（依評分排序，並列時隨機）
+
+    評分攤成 (賽事數, 最多馬匹數) 的矩陣後每場排序一次；不在候選內的馬與空位排在最後，
+    不會被選中，沒有任何候選的賽事與 select_candidates 相同，整場都當成並列候選。
+    前 k 個名次（含第 k 名的並列）都沒有並列的賽事結果固定，只在 fixed_rows 算一次。
+    其餘賽事的每個名次落在某一組並列的馬中，pick 以每個名次一個亂數，
+    在同組還沒選到的馬之中均勻抽一匹（不放回抽樣），等同把並列的馬隨機排序。
+    """
+
+    def __init__(self, arrays, eligible=None, score=None, k=1):
+        if k < 1:
+            raise ValueError("k 必須至少為 1")
+        self.k = k
+        n_races, width = arrays.n_races, max(arrays.max_field, k)
+
+        valid = np.ones(arrays.n_rows, dtype=bool) if eligible is None else np.asarray(eligible, dtype=bool).copy()
+        score = np.zeros(arrays.n_rows) if score is None else np.asarray(score, dtype=np.float64)
+        valid &= ~np.isnan(score)
+        fallback = ~np.logical_or.reduceat(valid, arrays.starts)[arrays.race_index] if n_races else valid
+        valid |= fallback
+        score = np.where(fallback, 0.0, score)
+
+        rows = np.full((n_races, width), -1, dtype=np.int64)
+        rows[arrays.race_index, arrays.field_position] = np.arange(arrays.n_rows)
+        padded = np.full((n_races, width), -np.inf)
+        padded[arrays.race_index, arrays.field_position] = np.where(valid, score, -np.inf)
+        usable = np.zeros((n_races, width), dtype=bool)
+        usable[arrays.race_index, arrays.field_position] = valid
+
+        # 每場先排候選、再依評分由高到低
+        order = np.lexsort((-padded, ~usable), axis=-1)
+        sorted_score = np.take_along_axis(padded, order, axis=1)
+        sorted_usable = np.take_along_axis(usable, order, axis=1)
+        self.sorted_rows = np.take_along_axis(rows, order, axis=1)
+
+        # 每個排序位置所屬並列組的起點與大小
+        new_group = np.ones((n_races, width), dtype=bool)
+        new_group[:, 1:] = (sorted_score[:, 1:] != sorted_score[:, :-1]) | (sorted_usable[:, 1:] != sorted_usable[:, :-1])
+        position = np.broadcast_to(np.arange(width), (n_races, width))
+        group_start = np.maximum.accumulate(np.where(new_group, position, 0), axis=1)
+        group_id = np.cumsum(new_group, axis=1) - 1
+        flat_group = np.arange(n_races)[:, None] * width + group_id
+        group_size = np.bincount(flat_group.ravel(), minlength=n_races * width)[flat_group]
+
+        # 前 k 個名次
+        slot_valid = sorted_usable[:, :k]
+        is_random = (slot_valid & (group_size[:, :k] > 1)).any(axis=1)
+        self.fixed_rows = np.where(slot_valid & ~is_random[:, None], self.sorted_rows[:, :k], -1)
+        self.random_races = np.flatnonzero(is_random)
+        self.sorted_rows = self.sorted_rows[is_random]
+        self.slot_valid = slot_valid[is_random]
+        self.slot_start = group_start[is_random, :k]
+        # 輪到這個名次時，同組還沒被選到的馬數
+        self.slot_remaining = group_size[is_random, :k] - (np.arange(k) - self.slot_start)
+
+    @property
+    def n_random(self):
+        return len(self.random_races)
+
+    @property
+    def random_shape(self):
+        """pick 需要的亂數形狀 (k, 隨機賽事數)"""
+        return self.k, self.n_random
+
+    def pick(self, u):
+        """以 [0, 1) 亂數 u（形狀 (..., k, 隨機賽事數)）選出隨機賽事第 1 到 k 名的列索引 (..., k, 隨機賽事數)"""
+        width = self.sorted_rows.shape[1]
+        flat_rows = self.sorted_rows.ravel()
+        base = np.arange(self.n_random) * width
+        rows = np.empty(u.shape, dtype=np.int64)
+        chosen = []
+        # 每個名次各自是 (..., 隨機賽事數) 的連續陣列運算，避免沿著長度只有 k 的軸加總
+        for j in range(self.k):
+            start = self.slot_start[:, j]
+            draw = (u[..., j, :] * self.slot_remaining[:, j]).astype(np.int64)
+            # 同組先前名次選到的位置（其他組的設為 width，不影響計數）
+            previous = [np.where(start <= i, chosen[i], width) for i in range(j)]
+            # 第 draw 個還沒被選到的位置：x = draw + #{previous <= x} 的不動點
+            index = draw
+            for _ in range(j):
+                index = draw + sum(p <= index for p in previous)
+            chosen.append(index)
+            valid = self.slot_valid[:, j]
+            rows[..., j, :] = np.where(valid, flat_rows[np.where(valid, base + start + index, 0)], -1)
+        return rows
@@ -0,0 +1,130 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_processor import iter_race_chunks
+from race_arrays import RaceArrays
+
+
+class RaceStore:
+    """以每欄一個二進位檔儲存、以記憶體映射讀取的賽事資料
+
+    目錄內容：
+        meta.json          欄位名稱與型別、總列數與賽事數
+        {欄位}.bin         依賽事順序攤平的欄位值
+        offsets.bin        賽事的列範圍（長度為 n_races + 1）
+        race_ids.bin       每場賽事的 race_id
+
+    讀取時每個區塊各自映射所需的列範圍，區塊用完即釋放，
+    因此記憶體用量只與區塊大小有關，與資料總量無關。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        self.n_rows = meta["n_rows"]
+        self.columns = {name: np.dtype(dtype) for name, dtype in meta["columns"].items()}
+        # 索引本身很小，直接讀進記憶體
+        self.offsets = np.fromfile(os.path.join(directory, "offsets.bin"), dtype=np.int64)
+        self.race_ids = np.fromfile(os.path.join(directory, "race_ids.bin"), dtype=np.dtype(meta["race_id_dtype"]))
+
+    @property
+    def n_races(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    def build(cls, directory, blocks):
+        """由 DataFrame 區塊寫入資料；每場賽事須完整落在同一區塊，且區塊依 race_id 遞增"""
+        os.makedirs(directory, exist_ok=True)
+        columns = None
+        n_rows = 0
+        last_race_id = None
+        race_id_dtype = None
+
+        with open(os.path.join(directory, "offsets.bin"), "wb") as offsets_file, \
+                open(os.path.join(directory, "race_ids.bin"), "wb") as race_ids_file:
+            np.zeros(1, dtype=np.int64).tofile(offsets_file)
+
+            for block in blocks:
+                block = cls._to_numeric(block)
+                if columns is None:
+                    columns = {name: block[name].dtype for name in block.columns}
+                    for name in columns:
+                        open(cls._column_path(directory, name), "wb").close()
+                    race_id_dtype = block["race_id"].dtype
+
+                arrays = RaceArrays.from_dataframe(block, list(columns))
+                if arrays.n_races == 0:
+                    continue
+                if last_race_id is not None and arrays.race_ids[0] <= last_race_id:
+                    raise ValueError("賽事必須依 race_id 遞增，且同一場賽事不可跨區塊")
+                last_race_id = arrays.race_ids[-1]
+
+                for name, dtype in columns.items():
+                    with open(cls._column_path(directory, name), "ab") as f:
+                        np.asarray(arrays[name], dtype=dtype).tofile(f)
+                (arrays.offsets[1:] + n_rows).tofile(offsets_file)
+                arrays.race_ids.astype(race_id_dtype).tofile(race_ids_file)
+                n_rows += arrays.n_rows
+
+        if columns is None:
+            raise ValueError("沒有任何資料可寫入")
+
+        meta = {
+            "n_rows": n_rows,
+            "columns": {name: dtype.str for name, dtype in columns.items()},
+            "race_id_dtype": race_id_dtype.str,
+        }
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+        return cls(directory)
+
+    @classmethod
+    def from_dataframe(cls, directory, data):
+        """由處理後的 DataFrame 建立"""
+        return cls.build(directory, [data])
+
+    @classmethod
+    def from_csv(cls, directory, races_path="./data/races.csv", runs_path="./data/run.csv", chunksize=100_000):
+        """分塊讀取 run.csv 並與 races.csv 合併後寫入，run.csv 須依 race_id 排列"""
+        return cls.build(directory, iter_race_chunks(races_path, runs_path, chunksize))
+
+    @staticmethod
+    def _column_path(directory, name):
+        return os.path.join(directory, f"{name}.bin")
+
+    @staticmethod
+    def _to_numeric(block):
+        block = block.copy(deep=False)
+        for name in block.columns:
+            dtype = block[name].dtype
+            if isinstance(dtype, pd.CategoricalDtype):
+                block[name] = block[name].astype(dtype.categories.dtype)
+            elif not (isinstance(dtype, np.dtype) and dtype.kind in "biufcmM"):
+                raise ValueError(f"RaceStore 只支援數值欄位: {name} ({dtype})")
+        return block
+
+    def race_arrays(self, start=0, stop=None, columns=None):
+        """取得第 start ~ stop 場賽事的 RaceArrays，欄位為記憶體映射的零複製視圖"""
+        stop = self.n_races if stop is None else min(stop, self.n_races)
+        columns = list(self.columns) if columns is None else columns
+        row_start, row_stop = int(self.offsets[start]), int(self.offsets[stop])
+
+        arrays = {}
+        for name in columns:
+            dtype = self.columns[name]
+            if row_stop == row_start:
+                arrays[name] = np.empty(0, dtype=dtype)
+                continue
+            arrays[name] = np.memmap(self._column_path(self.directory, name), dtype=dtype, mode="r",
+                                     offset=row_start * dtype.itemsize, shape=(row_stop - row_start,))
+        offsets = self.offsets[start:stop + 1] - row_start
+        return RaceArrays(arrays, offsets, self.race_ids[start:stop])
+
+    def iter_blocks(self, races_per_block=10_000, columns=None):
+        """依序產生每 races_per_block 場賽事的 RaceArrays"""
+        for start in range(0, self.n_races, races_per_block):
+            yield self.race_arrays(start, start + races_per_block, columns)
@@ -0,0 +1,159 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from race_arrays import PaddedRaces, RaceArrays
+
+
+class RaceTensor:
+    """以補齊的三維陣列表示全部賽事
+
+    values 為 (賽事數, 最多馬匹數, 特徵數) 的 float32，mask 標出真正有馬的位置
+    （每場的馬排在前面，之後為補齊的空位，值為 NaN）；races 為每場一列的賽事資料表
+    （race_id、出賽馬匹數，以及同一場內都相同的欄位，例如日期）。
+    任一場賽事都是 values[i, :field_size] 的視圖，存取是 O(1) 且不配置記憶體。
+    模擬使用 iter_padded 產生的 PaddedRaces（各特徵的視圖加上 mask），也不複製特徵；
+    to_arrays / iter_blocks 則以 mask 複製出一維欄位，供需要 RaceArrays 的程式使用。
+    float32 只能精確表示 2**24 以內的整數，race_id 因此放在賽事資料表，不放進 values。
+    """
+
+    def __init__(self, values, mask, features, races):
+        self.values = values        # (n_races, max_field, n_features)
+        self.mask = mask            # (n_races, max_field)
+        self.features = list(features)
+        self.races = races          # 每場一列，依 race_id 排序
+        self._feature_index = {name: i for i, name in enumerate(self.features)}
+        # race() 每次都會用到，不經過 pandas
+        self._field_sizes = races["field_size"].to_numpy()
+        self._race_ids = races["race_id"].to_numpy()
+
+    @classmethod
+    def from_arrays(cls, arrays, features=None):
+        """由 RaceArrays 建立：數值欄位放進 values，同一場內都相同的欄位放進賽事資料表"""
+        n_races, width = arrays.n_races, arrays.max_field
+        race_index, position = arrays.race_index, arrays.field_position
+
+        race_columns = {"race_id": arrays.race_ids, "field_size": arrays.race_sizes}
+        if features is None:
+            features = []
+            for name, values in arrays.columns.items():
+                values = np.asarray(values)
+                if name == "race_id":
+                    continue
+                if values.dtype.kind in "biuf":
+                    features.append(name)
+                elif n_races and (values == values[arrays.starts][race_index]).all():
+                    # 非數值欄位（例如日期）只在每場都相同時保留為賽事層級欄位
+                    race_columns[name] = values[arrays.starts]
+        else:
+            missing_columns = [col for col in features if col not in arrays]
+            if missing_columns:
+                raise ValueError(f"缺少必要欄位：{missing_columns}")
+
+        values = np.full((n_races, width, len(features)), np.nan, dtype=np.float32)
+        for j, name in enumerate(features):
+            values[race_index, position, j] = arrays[name]
+        mask = np.zeros((n_races, width), dtype=bool)
+        mask[race_index, position] = True
+        return cls(values, mask, features, pd.DataFrame(race_columns))
+
+    @classmethod
+    def from_dataframe(cls, data, features=None):
+        """由處理後的 DataFrame 建立（賽事順序與 groupby('race_id') 相同）"""
+        return cls.from_arrays(RaceArrays.from_dataframe(data), features)
+
+    @property
+    def n_races(self):
+        return self.values.shape[0]
+
+    @property
+    def max_field(self):
+        return self.values.shape[1]
+
+    @property
+    def field_sizes(self):
+        return self._field_sizes
+
+    @property
+    def race_ids(self):
+        return self._race_ids
+
+    def index_of(self, race_id):
+        """race_id 對應的賽事編號"""
+        race_ids = self.race_ids
+        i = np.searchsorted(race_ids, race_id)
+        if i >= len(race_ids) or race_ids[i] != race_id:
+            raise KeyError(race_id)
+        return int(i)
+
+    def race(self, i):
+        """第 i 場賽事的 (出賽馬匹數, 特徵數) 視圖"""
+        return self.values[i, :self.field_sizes[i]]
+
+    def feature(self, name):
+        """某個特徵的 (賽事數, 最多馬匹數) 視圖，空位為 NaN"""
+        if name not in self._feature_index:
+            raise ValueError(f"沒有這個特徵：{name}")
+        return self.values[:, :, self._feature_index[name]]
+
+    def __contains__(self, name):
+        return name in self._feature_index
+
+    def __getitem__(self, name):
+        return self.feature(name)
+
+    def padded(self, start=0, stop=None, columns=None):
+        """第 start ~ stop 場的 PaddedRaces：每個欄位都是 values 的視圖，不複製資料"""
+        stop = self.n_races if stop is None else min(stop, self.n_races)
+        columns = self.features if columns is None else [col for col in columns if col != "race_id"]
+        views = {name: self.feature(name)[start:stop] for name in columns}
+        return PaddedRaces(views, self.mask[start:stop], self.race_ids[start:stop])
+
+    def iter_padded(self, races_per_block=10_000, columns=None):
+        """依序產生每 races_per_block 場賽事的 PaddedRaces（VectorizedSimulation 優先使用）"""
+        for start in range(0, self.n_races, races_per_block):
+            yield self.padded(start, start + races_per_block, columns)
+
+    def to_arrays(self, start=0, stop=None, columns=None):
+        """轉回第 start ~ stop 場的 RaceArrays（欄位為 float32，以 mask 複製），供需要一維欄位的程式使用"""
+        stop = self.n_races if stop is None else min(stop, self.n_races)
+        columns = self.features if columns is None else [col for col in columns if col != "race_id"]
+        mask = self.mask[start:stop]
+        arrays = {name: self.feature(name)[start:stop][mask] for name in columns}
+        offsets = np.concatenate(([0], np.cumsum(self.field_sizes[start:stop]))).astype(np.int64)
+        arrays["race_id"] = np.repeat(self.race_ids[start:stop], self.field_sizes[start:stop])
+        return RaceArrays(arrays, offsets, self.race_ids[start:stop])
+
+    def iter_blocks(self, races_per_block=10_000, columns=None):
+        """依序產生每 races_per_block 場賽事的 RaceArrays（VectorizedSimulation 可直接使用）"""
+        for start in range(0, self.n_races, races_per_block):
+            yield self.to_arrays(start, start + races_per_block, columns)
+
+    def save(self, directory):
+        """寫入目錄：values.npy、mask.npy、races.npz 與 meta.json"""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "values.npy"), self.values)
+        np.save(os.path.join(directory, "mask.npy"), self.mask)
+        races = {}
+        for i, name in enumerate(self.races.columns):
+            values = self.races[name].to_numpy()
+            # 字串欄位存成定長字串，讀取時不需要 pickle
+            races[f"c{i}"] = values.astype(str) if values.dtype == object else values
+        np.savez(os.path.join(directory, "races.npz"), **races)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"features": self.features, "race_columns": list(self.races.columns)}, f,
+                      indent=2, ensure_ascii=False)
+        return self
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """讀回 save 寫入的目錄；mmap=True 時 values 以唯讀記憶體映射開啟，不必整個讀進記憶體"""
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        values = np.load(os.path.join(directory, "values.npy"), mmap_mode="r" if mmap else None)
+        mask = np.load(os.path.join(directory, "mask.npy"))
+        with np.load(os.path.join(directory, "races.npz"), allow_pickle=False) as stored:
+            races = pd.DataFrame({name: stored[f"c{i}"] for i, name in enumerate(meta["race_columns"])})
+        return cls(values, mask, meta["features"], races)
@@ -0,0 +1,109 @@
+import hashlib
+import json
+
+import numpy as np
+
+# splitmix64 的常數
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_DRAW = np.uint64(0xD1B54A32D192ED03)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+def _mix64(x):
+    """splitmix64 的混合函式，原地修改 uint64 陣列 x（乘法溢位即為 mod 2**64）"""
+    temp = x >> np.uint64(30)
+    x ^= temp
+    x *= _MIX1
+    np.right_shift(x, np.uint64(27), out=temp)
+    x ^= temp
+    x *= _MIX2
+    np.right_shift(x, np.uint64(31), out=temp)
+    x ^= temp
+    return x
+
+
+def strategy_key(strategy):
+    """由策略類別、投注類型與參數算出的穩定整數，與策略在網格中的順序無關"""
+    spec = json.dumps([type(strategy).__name__, vars(strategy)], sort_keys=True, default=str)
+    return int.from_bytes(hashlib.sha256(spec.encode()).digest()[:8], "little")
+
+
+class RandomStreams:
+    """由一個主種子衍生的亂數流：策略 → 重複模擬 → 賽事
+
+    策略與重複模擬以 numpy.random.SeedSequence 的 spawn_key 衍生（策略以 strategy_key，
+    重複模擬以編號），每個重複模擬得到一個 64 位元金鑰；每場賽事的亂數為以金鑰為種子、
+    race_id 與抽取序號為計數器的 splitmix64，不依賴抽取順序。
+    因此同一個 (主種子, 策略, 重複模擬, 賽事) 永遠得到同一個亂數，與批次大小、
+    區塊切法、賽事子集以及是否在行程池執行都無關，也可以只重跑其中一個重複模擬。
+    """
+
+    def __init__(self, seed=None, spawn_key=()):
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            # seed 為 None 時取新的熵，之後可由 entropy 重現
+            self.seed_sequence = np.random.SeedSequence(seed, spawn_key=tuple(spawn_key))
+        self._keys = np.zeros(0, dtype=np.uint64)
+
+    @property
+    def entropy(self):
+        return self.seed_sequence.entropy
+
+    @property
+    def spawn_key(self):
+        return self.seed_sequence.spawn_key
+
+    def child(self, key):
+        """以整數 key 衍生子亂數流"""
+        return type(self)(np.random.SeedSequence(self.entropy, spawn_key=self.spawn_key + (int(key),)))
+
+    def for_strategy(self, strategy):
+        """策略自己的亂數流"""
+        return self.child(strategy_key(strategy))
+
+    def replicate(self, replicate):
+        """第 replicate 個重複模擬的亂數流"""
+        return ReplicateStream(self, replicate)
+
+    def replicate_keys(self, replicates):
+        """每個重複模擬的 64 位元金鑰；0 ~ n - 1 的金鑰會保留下來重複使用"""
+        replicates = np.asarray(replicates, dtype=np.int64)
+        n = int(replicates.max()) + 1 if len(replicates) else 0
+        if (replicates < 0).any():
+            raise ValueError("重複模擬編號不可為負數")
+        if n > len(self._keys):
+            new_keys = [self.child(r).seed_sequence.generate_state(1, np.uint64)[0] for r in range(len(self._keys), n)]
+            self._keys = np.concatenate([self._keys, np.array(new_keys, dtype=np.uint64)])
+        return self._keys[replicates]
+
+    def uniforms(self, replicates, race_ids, draw=0):
+        """[0, 1) 亂數，形狀為 (重複次數,) + race_ids 與 draw 廣播後的形狀
+
+        race_ids 為每個亂數所屬賽事的 race_id，draw 為同一場內的抽取序號（例如第幾名、第幾匹）。
+        """
+        keys = self.replicate_keys(replicates)
+        counter = np.asarray(race_ids).astype(np.uint64) * _GOLDEN + np.asarray(draw).astype(np.uint64) * _DRAW
+        bits = _mix64(keys.reshape((len(keys),) + (1,) * counter.ndim) + counter)
+        # 取高 53 位元，與 Generator.random 相同的精度
+        bits >>= np.uint64(11)
+        return bits * (1.0 / (1 << 53))
+
+    def race_generator(self, replicate, race_id):
+        """某個重複模擬在某場賽事的 Generator（例如給 DataFrame.sample 使用）"""
+        return np.random.default_rng(self.child(replicate).child(race_id).seed_sequence)
+
+
+class ReplicateStream:
+    """單一重複模擬的亂數流，可傳給 BettingStrategy.select_indices 的 rng"""
+
+    def __init__(self, streams, replicate):
+        self.streams = streams
+        self.replicate = replicate
+
+    def uniforms(self, race_ids, draw=0):
+        return self.streams.uniforms([self.replicate], race_ids, draw)[0]
+
+    def race_generator(self, race_id):
+        return self.streams.race_generator(self.replicate, race_id)
@@ -0,0 +1,205 @@
+import datetime
+import json
+import os
+import re
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from grid_runner import RESULT_COLUMNS, STRATEGY_NAMES, strategy_params
+from race_arrays import RaceArrays
+
+# runs 表本身的欄位，其餘欄位名稱視為策略參數（存在 params 的 JSON 中）
+RUN_COLUMNS = ["run_id", "created_at", "strategy", "betting_type", "params", "engine", "data_hash", "seed",
+               "tag", "n_replicates", "race_count", "total", "total_sq", "min", "max"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    betting_type TEXT NOT NULL,
+    params TEXT NOT NULL,
+    engine TEXT,
+    data_hash TEXT,
+    seed TEXT,
+    tag TEXT,
+    n_replicates INTEGER NOT NULL,
+    race_count REAL,
+    total REAL NOT NULL,
+    total_sq REAL NOT NULL,
+    min REAL,
+    max REAL
+);
+CREATE TABLE IF NOT EXISTS replicates (
+    run_id INTEGER PRIMARY KEY REFERENCES runs(run_id),
+    profits BLOB NOT NULL,
+    race_counts BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_strategy ON runs(strategy, betting_type);
+CREATE INDEX IF NOT EXISTS runs_data_hash ON runs(data_hash);
+"""
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def dataset_hash(races):
+    """資料內容的雜湊（RaceArrays.content_hash），記錄每次執行用的是哪一份資料"""
+    return RaceArrays.from_races(races).content_hash()
+
+
+class ResultsStore:
+    """模擬結果的 SQLite 資料庫（Python 內建，不需要額外套件）
+
+    每次執行一列 runs：策略、投注類型、參數（JSON）、資料雜湊、亂數種子，以及損益的
+    次數、總和、平方和與最大最小值，分組查詢的平均與標準差直接在 SQL 內合併算出，
+    不必讀回每個重複模擬。各重複模擬的損益與賽事數以 float64 / int64 的二進位整欄
+    存在 replicates，需要時以 np.frombuffer 讀回（零複製），不經過 Python list。
+    """
+
+    def __init__(self, path="./results/results.sqlite"):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and path != ":memory:":
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def _run_row(strategy, profits, race_counts, seed=None, data_hash=None, engine=None, tag=None):
+        profits = np.ascontiguousarray(profits, dtype=np.float64)
+        race_counts = np.broadcast_to(np.asarray(race_counts, dtype=np.int64), profits.shape)
+        params = strategy_params(strategy)
+        row = (
+            datetime.datetime.now().isoformat(timespec="seconds"),
+            type(strategy).__name__,
+            strategy.betting_type,
+            json.dumps(params, sort_keys=True, default=str),
+            engine,
+            data_hash,
+            None if seed is None else str(seed),
+            tag,
+            len(profits),
+            float(race_counts.mean()) if len(profits) else None,
+            float(profits.sum()),
+            float((profits ** 2).sum()),
+            float(profits.min()) if len(profits) else None,
+            float(profits.max()) if len(profits) else None,
+        )
+        return row, (profits.tobytes(), np.ascontiguousarray(race_counts).tobytes())
+
+    def add_runs(self, runs):
+        """一次寫入多筆 (strategy, profits, race_counts, seed, data_hash, engine, tag)，回傳 run_id 的 list"""
+        run_ids = []
+        with self.conn:
+            for run in runs:
+                row, blobs = self._run_row(*run)
+                cursor = self.conn.execute(
+                    f"INSERT INTO runs ({', '.join(RUN_COLUMNS[1:])}) VALUES ({', '.join('?' * len(row))})", row)
+                self.conn.execute("INSERT INTO replicates VALUES (?, ?, ?)", (cursor.lastrowid,) + blobs)
+                run_ids.append(cursor.lastrowid)
+        return run_ids
+
+    def add_run(self, strategy, profits, race_counts, seed=None, data_hash=None, engine=None, tag=None):
+        """寫入一次執行的各重複模擬損益，回傳 run_id"""
+        return self.add_runs([(strategy, profits, race_counts, seed, data_hash, engine, tag)])[0]
+
+    def add_simulation(self, simulation, data_hash=None, tag=None):
+        """寫入 Simulation（或其子類別）執行完的結果，種子為 simulation.seed"""
+        return self.add_run(simulation.betting_strategy, simulation.results, simulation.race_counts,
+                            seed=simulation.seed, data_hash=data_hash, engine=type(simulation).__name__, tag=tag)
+
+    @staticmethod
+    def _column(name):
+        """runs 表的欄位，或以 json_extract 取出的策略參數"""
+        if name in RUN_COLUMNS:
+            return name
+        if not _IDENTIFIER.match(name):
+            raise ValueError(f"不合法的欄位名稱: {name}")
+        return f"json_extract(params, '$.{name}')"
+
+    def _where(self, filters):
+        clauses, values = [], []
+        for name, value in filters.items():
+            if isinstance(value, (list, tuple, set)):
+                value = list(value)
+                clauses.append(f"{self._column(name)} IN ({', '.join('?' * len(value))})")
+                values.extend(value)
+            else:
+                clauses.append(f"{self._column(name)} = ?")
+                values.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", values
+
+    def runs(self, **filters):
+        """符合條件的執行（例如 runs(strategy="CombinedStrategy", alpha=0.65)），參數展開成欄位"""
+        where, values = self._where(filters)
+        runs = pd.read_sql_query(f"SELECT * FROM runs{where} ORDER BY run_id", self.conn, params=values)
+        params = pd.DataFrame([json.loads(text) for text in runs.pop("params")], index=runs.index)
+        runs["mean"] = runs["total"] / runs["n_replicates"]
+        return pd.concat([runs, params], axis=1)
+
+    def summary(self, by=("strategy", "betting_type"), **filters):
+        """依 by（runs 欄位或策略參數名稱）分組，合併各次執行的全部重複模擬
+
+        回傳每組的執行次數、重複模擬數、平均損益、標準差（ddof=0，與 get_results 相同）、
+        最小與最大損益以及平均賽事數。
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        keys = "".join(f"{self._column(name)} AS {name}, " for name in by)
+        where, values = self._where(filters)
+        group = f" GROUP BY {', '.join(self._column(name) for name in by)}" if by else ""
+        query = (
+            f"SELECT {keys}"
+            "COUNT(*) AS n_runs, SUM(n_replicates) AS n_replicates, "
+            "SUM(total) / SUM(n_replicates) AS mean, "
+            "SUM(total_sq) / SUM(n_replicates) - (SUM(total) / SUM(n_replicates)) * (SUM(total) / SUM(n_replicates)) AS var, "
+            "MIN(min) AS min, MAX(max) AS max, "
+            "SUM(race_count * n_replicates) / SUM(n_replicates) AS avg_races "
+            f"FROM runs{where}{group}"
+        )
+        result = pd.read_sql_query(query, self.conn, params=values)
+        result["std"] = np.sqrt(result.pop("var").clip(lower=0))
+        return result[by + ["n_runs", "n_replicates", "mean", "std", "min", "max", "avg_races"]]
+
+    def profits(self, run_ids):
+        """各次執行的損益陣列 {run_id: ndarray}（唯讀，直接指向資料庫讀出的 bytes）"""
+        run_ids = [int(run_id) for run_id in np.atleast_1d(run_ids)]
+        rows = self.conn.execute(
+            f"SELECT run_id, profits FROM replicates WHERE run_id IN ({', '.join('?' * len(run_ids))})", run_ids)
+        stored = {run_id: np.frombuffer(blob, dtype=np.float64) for run_id, blob in rows}
+        return {run_id: stored[run_id] for run_id in run_ids if run_id in stored}
+
+    def race_counts(self, run_id):
+        row = self.conn.execute("SELECT race_counts FROM replicates WHERE run_id = ?", (int(run_id),)).fetchone()
+        return None if row is None else np.frombuffer(row[0], dtype=np.int64)
+
+    def profit_matrix(self, run_ids):
+        """重複次數相同的多次執行疊成 (執行數, 重複次數) 的矩陣，方便跨策略比較"""
+        profits = self.profits(run_ids)
+        lengths = {len(values) for values in profits.values()}
+        if len(lengths) > 1:
+            raise ValueError("各次執行的重複次數不同，無法疊成矩陣")
+        return np.stack([profits[int(run_id)] for run_id in np.atleast_1d(run_ids)])
+
+    def result_table(self, **filters):
+        """與 result_records.py 相同格式的結果表（每個策略與投注類型一列）"""
+        summary = self.summary(("strategy", "betting_type"), **filters)
+        return pd.DataFrame({
+            "策略": summary["strategy"].map(lambda name: STRATEGY_NAMES.get(name, name)),
+            "投注項目": summary["betting_type"].str.upper(),
+            "平均損益": summary["mean"],
+            "損益標準差": summary["std"],
+            "最小損益": summary["min"],
+            "最大損益": summary["max"],
+            "平均賽事數": summary["avg_races"],
+        }, columns=RESULT_COLUMNS)
@@ -2,65 +2,136 @@ import numpy as np
 import pandas as pd
 from typing import List
 
+from profiling import strategy_label
+from race_arrays import RaceArrays
+from random_streams import RandomStreams
+
 class Simulation:
-    def __init__(self, n_simulations: int, betting_strategy):
+    def __init__(self, n_simulations: int, betting_strategy, seed=None, instrumentation=None):
         self.n_simulations = n_simulations
         self.betting_strategy = betting_strategy
         self.results = []
         self.race_counts = []  # 新增：追蹤每場模擬的賽事數量
+        # 傳入 profiling.StageProfiler 才會記錄各階段耗時，預設不計時
+        self.instrumentation = instrumentation
+        # 每個 (策略, 重複模擬, 賽事) 各自的亂數流；seed 為 None 時由 self.seed 記下實際使用的熵
+        self.streams = RandomStreams(seed).for_strategy(betting_strategy)
+        self.seed = self.streams.entropy
         
     def run_simulation(self, races):
-        """執行模擬"""
+        """執行模擬
+
+        races 可為 get_races() 的 GroupBy，或 DataProcessor.stream_races() 產生的
+        DataFrame 區塊 generator（每個區塊只讀一次，跑完全部模擬後累加損益）。
+        """
+        timer = self.instrumentation
+        run_start = timer.now() if timer is not None else None
+        simulate_one_round = self._simulate_one_round if timer is None else self._simulate_one_round_timed
+
+        profits = [0] * self.n_simulations
+        race_counts = [0] * self.n_simulations
+        for block in self._iter_blocks(races):
+            for sim_num in range(self.n_simulations):
+                profit, race_count = simulate_one_round(block, sim_num)
+                profits[sim_num] += profit
+                race_counts[sim_num] += race_count
+
+        if timer is not None:
+            timer.add(strategy_label(self.betting_strategy), "run_simulation", run_start, timer.now())
+
         for sim_num in range(self.n_simulations):
-            profit, race_count = self._simulate_one_round(races)
-            self.results.append(profit)
-            self.race_counts.append(race_count)
-            print(f"模擬 #{sim_num + 1}: 跑了 {race_count} 場賽事，損益: {profit:.2f}")
+            self.results.append(profits[sim_num])
+            self.race_counts.append(race_counts[sim_num])
+            print(f"模擬 #{sim_num + 1}: 跑了 {race_counts[sim_num]} 場賽事，損益: {profits[sim_num]:.2f}")
         return self
+
+    @staticmethod
+    def _iter_blocks(races):
+        if isinstance(races, pd.DataFrame):
+            return [races.groupby('race_id')]
+        if hasattr(races, 'ngroups'):
+            return [races]
+        return (block.groupby('race_id') for block in races)
         
-    def _simulate_one_round(self, races):
-        """執行一輪模擬"""
+    def _simulate_one_round(self, races, replicate=0):
+        """執行一輪模擬（第 replicate 個重複模擬，可單獨重跑）"""
         profit = 0
         race_count = 0
-        for _, group in races:
-            selected = self.betting_strategy.select_horse(group)
-            
-            # 若 select_horse 回傳為 DataFrame，取第一行
-            if hasattr(selected, "iloc"):
-                selected = selected.iloc[0]
-            
+        for race_id, group in races:
+            selected = self._select(group, race_id, replicate)
             is_win = self.betting_strategy.get_result(selected)
-            betting_type = self.betting_strategy.betting_type
-
-            if betting_type == "win":
-                # 獨贏：只算第一名的 win_dividend
-                if is_win:
-                    odds = float(selected["win_dividend1"])
-                    profit += odds/10 - 1
-                else:
-                    profit -= 1
-
-            elif betting_type == "place":
-                # 位置：若進前三名，根據名次用正確的 place_dividend
-                result = int(selected["result"])
-                
-                if result in [1, 2, 3]:
-                    # 使用對應名次的 place_dividend
-                    odds = float(selected[f"place_dividend{result}"])
-                    # place 的獲利計算方式：賠率 - 1
-                    if pd.isna(odds):
-                        # 缺值你可以自訂：1.賠掉本金 2.視為0 3.略過這場
-                        odds = 1
-                    profit += odds/10 - 1
-                else:
-                    profit -= 1
-
-            else:
-                raise ValueError(f"不支援的投注類型: {betting_type}")
-            
+            profit += self._payout(selected, is_win)
             race_count += 1
         return profit, race_count
 
+    def _simulate_one_round_timed(self, races, replicate=0):
+        """與 _simulate_one_round 相同，另外記錄 GroupBy 迭代、選馬、結果與派彩各階段的耗時"""
+        timer = self.instrumentation
+        label = strategy_label(self.betting_strategy)
+        profit = 0
+        race_count = 0
+        t0 = timer.now()
+        for race_id, group in races:
+            t1 = timer.now()
+            selected = self._select(group, race_id, replicate)
+            t2 = timer.now()
+            is_win = self.betting_strategy.get_result(selected)
+            t3 = timer.now()
+            profit += self._payout(selected, is_win)
+            race_count += 1
+            t4 = timer.now()
+
+            timer.add(label, "groupby", t0, t1)
+            timer.add(label, "select_horse", t1, t2)
+            timer.add(label, "get_result", t2, t3)
+            timer.add(label, "payout", t3, t4)
+            t0 = timer.now()
+        return profit, race_count
+
+    def _select(self, group, race_id, replicate):
+        """第 replicate 個重複模擬在這場選中的馬（Series）
+
+        與 VectorizedSimulation 相同經過 select_indices：有陣列核心的策略在並列候選中
+        以 streams.uniforms([replicate], race_id) 依 pick_candidates 的規則選一匹，
+        自訂策略則以 race_generator(replicate, race_id) 呼叫 select_horse，
+        因此同一個種子下兩種模擬選到同一匹馬。
+        """
+        columns = {name: group[name].to_numpy() for name in group.columns}
+        arrays = RaceArrays(columns, np.array([0, len(group)], dtype=np.int64), np.array([race_id]))
+        row = self.betting_strategy.select_indices(arrays, rng=self.streams.replicate(replicate))[0]
+        return group.iloc[row]
+
+    def _payout(self, selected, is_win):
+        """單場下注一元的損益"""
+        betting_type = self.betting_strategy.betting_type
+
+        if betting_type == "win":
+            # 獨贏：只算第一名的 win_dividend
+            if is_win:
+                odds = float(selected["win_dividend1"])
+                # 並列第一但沒有派彩資料時，與 place 相同視為 1
+                if pd.isna(odds):
+                    odds = 1
+                return odds/10 - 1
+            return -1
+
+        elif betting_type == "place":
+            # 位置：若進前三名，根據名次用正確的 place_dividend
+            result = int(selected["result"])
+            
+            if result in [1, 2, 3]:
+                # 使用對應名次的 place_dividend
+                odds = float(selected[f"place_dividend{result}"])
+                # place 的獲利計算方式：賠率 - 1
+                if pd.isna(odds):
+                    # 缺值你可以自訂：1.賠掉本金 2.視為0 3.略過這場
+                    odds = 1
+                return odds/10 - 1
+            return -1
+
+        else:
+            raise ValueError(f"不支援的投注類型: {betting_type}")
+
     
     def get_results(self):
         """取得模擬結果"""
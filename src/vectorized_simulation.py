@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+
+from profiling import strategy_label
+from race_arrays import RaceArrays, pick_candidates
+from simulation import Simulation
+
+
+def _column(arrays, name):
+    return np.asarray(arrays[name], dtype=np.float64)
+
+
+def compute_payouts(arrays, betting_type):
+    """計算每一列若被選中時的單注損益（與 Simulation._simulate_one_round 相同）
+
+    逐元素運算，arrays 為 PaddedRaces 時回傳同形狀的 (賽事數, 最多馬匹數) 矩陣。
+    """
+    result = _column(arrays, "result")
+
+    if betting_type == "win":
+        # 不可原地修改：_column 對 float64 欄位回傳的是呼叫端資料本身
+        dividend = _column(arrays, "win_dividend1")
+        dividend = np.where(np.isnan(dividend), 1.0, dividend)
+        return np.where(result == 1, dividend / 10 - 1, -1.0)
+
+    elif betting_type == "place":
+        odds = np.ones_like(result)
+        for place in (1, 2, 3):
+            hit = result == place
+            odds[hit] = _column(arrays, f"place_dividend{place}")[hit]
+        odds[np.isnan(odds)] = 1
+        return np.where(np.isin(result, [1, 2, 3]), odds / 10 - 1, -1.0)
+
+    else:
+        raise ValueError(f"不支援的投注類型: {betting_type}")
+
+
+class VectorizedSimulation(Simulation):
+    """以扁平陣列一次算完整季賽事的模擬
+
+    所有重複模擬共用同一組候選馬，只在並列時需要亂數，
+    因此一次抽出 (重複次數 × 賽事數) 的亂數矩陣即可同時算完全部重複模擬。
+    """
+
+    # 每批亂數矩陣的元素上限，避免一次配置過多記憶體
+    max_batch_elements = 1 << 22
+    # 來源提供 iter_padded()（例如 RaceTensor）時直接使用補齊的區塊；需要一維欄位的子類別設為 False
+    padded_blocks = True
+
+    def __init__(self, n_simulations: int, betting_strategy, seed=None, instrumentation=None):
+        super().__init__(n_simulations, betting_strategy, seed=seed, instrumentation=instrumentation)
+
+    def run_simulation(self, races):
+        """執行模擬
+
+        races 可為 RaceArrays、DataFrame、get_races() 的 GroupBy、
+        RaceStore 等提供 iter_blocks() 的來源，或 DataFrame 區塊的 generator
+        （逐區塊串流，損益跨區塊累加）。
+        """
+        timer = self.instrumentation
+        label = strategy_label(self.betting_strategy)
+        run_start = t0 = timer.now() if timer is not None else None
+
+        profits = np.zeros(self.n_simulations)
+        race_count = 0
+        for arrays in self._iter_blocks(races):
+            if timer is not None:
+                timer.add(label, "blocks", t0, timer.now())
+            profits += self.simulate_replicates(arrays)
+            race_count += arrays.n_races
+            if timer is not None:
+                t0 = timer.now()
+
+        if timer is not None:
+            timer.add(label, "run_simulation", run_start, timer.now())
+
+        self.results.extend(profits.tolist())
+        self.race_counts.extend([race_count] * len(profits))
+        print(f"模擬 {len(profits)} 次: 每次跑了 {race_count} 場賽事，平均損益: {profits.mean():.2f}")
+        return self
+
+    def simulate_replicates(self, arrays, replicates=None):
+        """一次算出全部重複模擬的損益，回傳與 replicates 等長的陣列（預設長度為 n_simulations）
+
+        replicates 為要計算的重複模擬編號（預設 0 ~ n_simulations - 1），
+        每個重複模擬的亂數只由編號決定，可以單獨重跑。
+        """
+        strategy = self.betting_strategy
+        replicates = np.arange(self.n_simulations) if replicates is None else np.asarray(replicates)
+        timer = self.instrumentation
+        label = strategy_label(strategy)
+        t0 = timer.now() if timer is not None else None
+        # 補齊的區塊以攤平後的位置作為列索引
+        payouts = compute_payouts(arrays, strategy.betting_type).ravel()
+        if timer is not None:
+            t1 = timer.now()
+            timer.add(label, "payout", t0, t1)
+
+        if not strategy.has_array_kernel:
+            # 自訂策略沒有陣列核心：每次重複模擬各自逐場呼叫 select_horse
+            profits = np.array([payouts[strategy.select_indices(arrays, rng=self.streams.replicate(r))].sum()
+                                for r in replicates])
+            if timer is not None:
+                timer.add(label, "select_horse", t1, timer.now())
+            return profits
+
+        cand_rows, cand_offsets = strategy.candidates(arrays)
+        if timer is not None:
+            t2 = timer.now()
+            timer.add(label, "candidates", t1, t2)
+
+        profits = np.empty(len(replicates))
+        batch = max(1, self.max_batch_elements // max(arrays.n_races, 1))
+        # 亂數由 (重複模擬, race_id) 決定，結果與批次大小、區塊切法無關
+        for start in range(0, len(replicates), batch):
+            stop = min(start + batch, len(replicates))
+            u = self.streams.uniforms(replicates[start:stop], arrays.race_ids)
+            selected = pick_candidates(cand_rows, cand_offsets, u)
+            profits[start:stop] = payouts[selected].sum(axis=1)
+        if timer is not None:
+            timer.add(label, "sample", t2, timer.now())
+        return profits
+
+    def _iter_blocks(self, races):
+        if self.padded_blocks and self.betting_strategy.has_array_kernel and hasattr(races, "iter_padded"):
+            return races.iter_padded()
+        if hasattr(races, "iter_blocks"):
+            return races.iter_blocks()
+        if isinstance(races, (RaceArrays, pd.DataFrame)) or hasattr(races, "ngroups"):
+            return [RaceArrays.from_races(races)]
+        # DataFrame 區塊的 generator（例如 DataProcessor.stream_races()）
+        return (RaceArrays.from_races(block) for block in races)
+
+
+class TopKSimulation(VectorizedSimulation):
+    """每場買評分最高的 k 匹馬（例如「綜合評分前三名各買一注」）
+
+    stake_weights 為依名次的下注額（長度 k，預設每匹 1），候選不足 k 匹的賽事只買有的馬。
+    每場的排序只在 TopKCandidates 做一次：前 k 名沒有並列的賽事選法固定，損益只算一次；
+    其餘賽事每批抽一個 (重複次數, 並列賽事數, k) 的亂數矩陣，全部彩票一次結算。
+    因此前 k 名幾乎沒有並列的策略（如 CombinedStrategy）比單選還快。
+    """
+
+    # TopKCandidates 需要一維欄位
+    padded_blocks = False
+
+    def __init__(self, n_simulations: int, betting_strategy, k=3, stake_weights=None, seed=None,
+                 instrumentation=None):
+        super().__init__(n_simulations, betting_strategy, seed=seed, instrumentation=instrumentation)
+        if k < 1:
+            raise ValueError("k 必須至少為 1")
+        self.k = k
+        self.stake_weights = np.ones(k) if stake_weights is None else np.asarray(stake_weights, dtype=np.float64)
+        if self.stake_weights.shape != (k,):
+            raise ValueError(f"stake_weights 的長度必須為 k = {k}")
+
+    def simulate_replicates(self, arrays, replicates=None):
+        """一次算出全部重複模擬的損益，回傳與 replicates 等長的陣列（預設長度為 n_simulations）"""
+        strategy = self.betting_strategy
+        replicates = np.arange(self.n_simulations) if replicates is None else np.asarray(replicates)
+        timer = self.instrumentation
+        label = strategy_label(strategy)
+        t0 = timer.now() if timer is not None else None
+        # 最後補一個 0，-1（沒有下注）取到的損益為 0
+        payouts = np.append(compute_payouts(arrays, strategy.betting_type), 0.0)
+        if timer is not None:
+            t1 = timer.now()
+            timer.add(label, "payout", t0, t1)
+
+        ranked = strategy.ranked_candidates(arrays, self.k)
+        fixed_profit = payouts[ranked.fixed_rows] @ self.stake_weights
+        fixed_profit = fixed_profit.sum()
+        if timer is not None:
+            t2 = timer.now()
+            timer.add(label, "candidates", t1, t2)
+
+        profits = np.full(len(replicates), fixed_profit)
+        if ranked.n_random:
+            batch = max(1, self.max_batch_elements // (ranked.n_random * self.k))
+            # 第 j 名的亂數以 j 為抽取序號
+            race_ids = arrays.race_ids[ranked.random_races]
+            draws = np.arange(self.k)[:, None]
+            for start in range(0, len(replicates), batch):
+                stop = min(start + batch, len(replicates))
+                selected = ranked.pick(self.streams.uniforms(replicates[start:stop], race_ids, draws))
+                for j, weight in enumerate(self.stake_weights):
+                    profits[start:stop] += weight * payouts[selected[:, j]].sum(axis=1)
+        if timer is not None:
+            timer.add(label, "sample", t2, timer.now())
+        return profits
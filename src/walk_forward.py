@@ -0,0 +1,207 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_processor import DataProcessor
+from grid_runner import RESULT_COLUMNS, STRATEGY_NAMES, SharedRaceArrays, strategy_params
+from race_arrays import RaceArrays
+from random_streams import RandomStreams
+from vectorized_simulation import VectorizedSimulation
+
+WINDOW_COLUMNS = ["視窗", "訓練開始", "訓練結束", "測試開始", "測試結束"]
+
+
+class PrefixMoments:
+    """依日期累加的次數、和、平方和，任一段日期的平均與標準差都是 O(1)
+
+    累加前先減去最早一天的平均值，避免平方和相減時失去精度（只是平移，不用到未來資料）。
+    """
+
+    def __init__(self, date_codes, values, n_dates):
+        values = np.asarray(values, dtype=np.float64)
+        first = date_codes == date_codes.min() if len(values) else np.zeros(0, dtype=bool)
+        self.shift = float(values[first].mean()) if first.any() else 0.0
+        centered = values - self.shift
+
+        def prefix(weights=None):
+            return np.concatenate(([0.0], np.cumsum(np.bincount(date_codes, weights=weights, minlength=n_dates))))
+
+        self.count = prefix()
+        self.total = prefix(centered)
+        self.total_sq = prefix(centered ** 2)
+
+    def stats(self, start, stop):
+        """日期代碼 [start, stop) 的 (平均, 樣本標準差)，與 RunningMoments 相同（ddof=1）"""
+        n = self.count[stop] - self.count[start]
+        if n == 0:
+            return np.nan, np.nan
+        total = self.total[stop] - self.total[start]
+        mean = total / n
+        if n < 2:
+            return mean + self.shift, np.nan
+        var = (self.total_sq[stop] - self.total_sq[start] - total * mean) / (n - 1)
+        return mean + self.shift, np.sqrt(max(var, 0.0))
+
+    def normalize(self, values, start, stop):
+        """以日期代碼 [start, stop) 的統計量標準化（標準差為 0 或無法計算時只做中心化）"""
+        mean, std = self.stats(start, stop)
+        if not std > 0:
+            return values - mean
+        return (values - mean) / std
+
+
+# 子行程內掛載好的資料與前綴和
+_worker_state = None
+
+
+def _init_worker(spec, prefix_moments, race_dates):
+    global _worker_state
+    arrays, blocks = SharedRaceArrays.attach(spec)
+    _worker_state = (arrays, blocks, prefix_moments, race_dates)
+
+
+def _window_arrays(window, part):
+    """取出視窗的訓練或測試賽事，勝率欄位以訓練期間的統計量標準化"""
+    arrays, _, prefix_moments, race_dates = _worker_state
+    train_start, train_stop, test_start, test_stop = window
+    start, stop = (train_start, train_stop) if part == "train" else (test_start, test_stop)
+
+    selected = arrays.take(np.flatnonzero((race_dates >= start) & (race_dates < stop)))
+    for column, moments in prefix_moments.items():
+        selected.columns[column] = moments.normalize(selected[column], train_start, train_stop)
+    return selected
+
+
+def _run_window(task):
+    window, strategies, n_simulations, seed = task
+    if callable(strategies):
+        # 策略可以依訓練期間的資料決定（例如調整權重）
+        strategies = strategies(_window_arrays(window, "train"))
+    test = _window_arrays(window, "test")
+
+    outputs = []
+    for strategy in strategies:
+        profits = VectorizedSimulation(n_simulations, strategy, seed=seed).simulate_replicates(test)
+        outputs.append((strategy, profits, test.n_races))
+    return outputs
+
+
+def _run_serial(initargs, tasks):
+    """不開行程池，在本行程依序執行（結果與平行執行相同）"""
+    global _worker_state
+    _init_worker(*initargs)
+    try:
+        return [_run_window(task) for task in tasks]
+    finally:
+        _worker_state = None
+
+
+class WalkForwardBacktester:
+    """依日期切成訓練 / 測試視窗的前進式回測
+
+    滾動勝率本身只用到每列之前的比賽，但 DataProcessor 以整份資料標準化，
+    會把未來的平均與標準差帶進過去的特徵。這裡保留未標準化的勝率，
+    每個測試視窗只以訓練期間（測試開始之前）的平均與標準差標準化。
+    各勝率欄位依日期的前綴和只建立一次，所有視窗共用，每個視窗的統計量都是 O(1)。
+
+    視窗以賽馬日（資料中出現的日期）計算：測試視窗長 test_days 個賽馬日，每次前進 step_days；
+    train_days 為 None 時訓練期間從第一天開始（擴張視窗），否則只取測試開始前 train_days 天。
+    """
+
+    def __init__(self, data, n_races=10, test_days=60, train_days=None, min_train_days=None, step_days=None):
+        required_columns = ["race_id", "horse_id", "jockey_id", "result", "date"]
+        missing_columns = [col for col in required_columns if col not in data.columns]
+        if missing_columns:
+            raise ValueError(f"缺少必要欄位：{missing_columns}")
+        if test_days < 1:
+            raise ValueError("test_days 必須至少為 1")
+
+        # 沒有日期的列無法排進時間軸
+        data = data[data["race_id"].notna() & data["date"].notna()].reset_index(drop=True)
+        self.dates, date_codes = np.unique(pd.to_datetime(data["date"]).to_numpy(), return_inverse=True)
+        n_dates = len(self.dates)
+
+        rates = DataProcessor.raw_win_rates(data, n_races)
+        columns = {name: data[name].to_numpy() for name in data.columns
+                   if name not in rates and name != "date" and data[name].dtype != object}
+        columns.update(rates)
+        columns["date_code"] = date_codes
+        self.arrays = RaceArrays.from_dataframe(pd.DataFrame(columns))
+        self.race_dates = self.arrays["date_code"][self.arrays.starts]
+
+        self.prefix_moments = {
+            column: PrefixMoments(self.arrays["date_code"], self.arrays[column], n_dates) for column in rates
+        }
+        self.windows = self.make_windows(n_dates, test_days, train_days,
+                                         test_days if min_train_days is None else min_train_days,
+                                         test_days if step_days is None else step_days)
+        if not self.windows:
+            raise ValueError("資料的賽馬日不足以切出任何測試視窗")
+
+    @staticmethod
+    def make_windows(n_dates, test_days, train_days=None, min_train_days=1, step_days=None):
+        """回傳 [(訓練開始, 訓練結束, 測試開始, 測試結束)]，皆為日期代碼、左閉右開"""
+        step_days = step_days or test_days
+        windows = []
+        for test_start in range(max(min_train_days, 1), n_dates, step_days):
+            train_start = 0 if train_days is None else max(0, test_start - train_days)
+            windows.append((train_start, test_start, test_start, min(test_start + test_days, n_dates)))
+        return windows
+
+    def window_table(self):
+        """每個視窗的起訖日期"""
+        rows = []
+        for i, (train_start, train_stop, test_start, test_stop) in enumerate(self.windows):
+            rows.append(dict(zip(WINDOW_COLUMNS, [
+                i, self.dates[train_start], self.dates[train_stop - 1],
+                self.dates[test_start], self.dates[test_stop - 1],
+            ])))
+        return pd.DataFrame(rows, columns=WINDOW_COLUMNS)
+
+    def run(self, strategies, n_simulations, max_workers=None, seed=None):
+        """在每個測試視窗上執行策略，回傳每個 (視窗, 策略) 一列的結果表
+
+        strategies 為 BettingStrategy 的 list，或接受訓練期間 RaceArrays、回傳策略 list 的函式
+        （平行執行時須為模組層級函式）。視窗以行程池平行執行，資料放在共享記憶體。
+        """
+        if not callable(strategies):
+            strategies = list(strategies)
+
+        # 全部視窗共用主種子：亂數由 (策略, 重複模擬, race_id) 決定，各視窗的測試賽事不重疊，
+        # 結果與平行度無關
+        seed = RandomStreams(seed).entropy
+        tasks = [(window, strategies, n_simulations, seed) for window in self.windows]
+
+        max_workers = max_workers or min(len(tasks), os.cpu_count() or 1)
+        with SharedRaceArrays(self.arrays) as shared:
+            initargs = (shared.spec, self.prefix_moments, self.race_dates)
+            if max_workers == 1:
+                outputs = _run_serial(initargs, tasks)
+            else:
+                with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                         initargs=initargs) as executor:
+                    outputs = list(executor.map(_run_window, tasks))
+
+        windows = self.window_table().to_dict("records")
+        rows = []
+        for window, results in zip(windows, outputs):
+            for strategy, profits, race_count in results:
+                name = type(strategy).__name__
+                rows.append({
+                    **window,
+                    "策略": STRATEGY_NAMES.get(name, name),
+                    "投注項目": strategy.betting_type.upper(),
+                    "平均損益": np.mean(profits),
+                    "損益標準差": np.std(profits),
+                    "最小損益": np.min(profits),
+                    "最大損益": np.max(profits),
+                    "平均賽事數": race_count,
+                    **strategy_params(strategy),
+                })
+
+        df = pd.DataFrame(rows)
+        param_columns = [col for col in df.columns if col not in RESULT_COLUMNS + WINDOW_COLUMNS]
+        return df[WINDOW_COLUMNS + RESULT_COLUMNS[:2] + param_columns + RESULT_COLUMNS[2:]]
+
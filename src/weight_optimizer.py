@@ -0,0 +1,183 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from betting_strategy import BettingType, CombinedStrategy
+from race_arrays import RaceArrays
+from vectorized_simulation import compute_payouts
+
+WEIGHT_COLUMNS = ["alpha", "beta", "gamma"]
+
+
+def pareto_front(results, mean="mean", std="std"):
+    """平均損益越高、標準差越低越好，回傳沒有被其他組合同時勝過的列（依標準差排序）"""
+    ordered = results.sort_values([std, mean], ascending=[True, False])
+    # 依標準差由小到大掃過，平均損益創新高的才在前緣上
+    best = np.maximum.accumulate(ordered[mean].to_numpy())
+    keep = np.r_[True, ordered[mean].to_numpy()[1:] > best[:-1]]
+    return ordered[keep].reset_index(drop=True)
+
+
+class CombinedWeightOptimizer:
+    """CombinedStrategy 的 alpha / beta / gamma 權重搜尋
+
+    馬匹勝率、騎師勝率、賠率與每匹馬的損益只在建立時攤成一次
+    (最多馬匹數, 賽事數) 的矩陣，之後每批權重以廣播一次算出全部賽事的評分。
+    CombinedStrategy 在最高分並列的馬之間均勻隨機選一，因此每場的損益期望值與變異數
+    可以直接由並列的馬算出，不必抽樣：平均損益為各場期望值的和，標準差為各場變異數
+    和的平方根，等於 Simulation.get_results() 的 mean / std 在重複次數趨近無限時的值。
+    """
+
+    # 每批評分矩陣的元素上限；小批次可以留在快取內，並重複使用同一塊緩衝區
+    max_batch_elements = 1 << 20
+
+    def __init__(self, races, betting_type=BettingType.WIN):
+        self.betting_type = betting_type
+        self.arrays = RaceArrays.from_races(races)
+        strategy = CombinedStrategy(betting_type=betting_type)
+        required_columns = [strategy.rate_column("horse"), strategy.rate_column("jockey"), strategy.odds_column()]
+        missing_columns = [col for col in required_columns if col not in self.arrays]
+        if missing_columns:
+            raise ValueError(f"缺少必要欄位：{missing_columns}")
+
+        # 與 CombinedStrategy 相同：NaN 視為 0（nan_to_num 會把無限值也換掉，不能用）
+        arrays = self.arrays
+        horse_rate, jockey_rate, odds = (np.asarray(arrays[col], dtype=np.float64) for col in required_columns)
+        horse_rate, jockey_rate, odds = (np.where(np.isnan(x), 0.0, x) for x in (horse_rate, jockey_rate, odds))
+        self.finite = bool(np.isfinite(horse_rate).all() and np.isfinite(jockey_rate).all() and np.isfinite(odds).all())
+
+        # 轉置成 (馬匹位置, 賽事)：每場取最大值變成 max_field 個連續列之間的逐元素比較
+        def pad(values, fill=0.0):
+            return np.ascontiguousarray(arrays.pad(values, fill).T)
+
+        self.horse_rate = pad(horse_rate)
+        self.jockey_rate = pad(jockey_rate)
+        self.odds = pad(odds)
+        # 空位加上 -inf，永遠不會是最高分
+        self.penalty = pad(np.zeros(arrays.n_rows), -np.inf)
+        self.payouts = pad(compute_payouts(arrays, betting_type))
+        self.payouts_sq = self.payouts ** 2
+
+    @property
+    def n_races(self):
+        return self.arrays.n_races
+
+    def evaluate(self, weights, races=None):
+        """計算每組權重的平均損益與標準差
+
+        weights 為 (n, 3) 的 alpha / beta / gamma；races 為只評估部分賽事時的賽事索引。
+        回傳欄位 alpha、beta、gamma、mean、std、n_races 的 DataFrame。
+        """
+        weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+        if weights.shape[1] != 3:
+            raise ValueError("weights 必須是 (n, 3) 的 alpha / beta / gamma")
+
+        matrices = (self.horse_rate, self.jockey_rate, self.odds, self.penalty, self.payouts, self.payouts_sq)
+        if races is not None:
+            matrices = tuple(np.ascontiguousarray(matrix[:, races]) for matrix in matrices)
+        horse_rate, jockey_rate, odds, penalty, payouts, payouts_sq = matrices
+        # 輸入與權重都是有限值時評分不會出現無限值，省下檢查
+        check_inf = not (self.finite and np.isfinite(weights).all())
+
+        n_weights = len(weights)
+        means = np.empty(n_weights)
+        variances = np.empty(n_weights)
+        batch = max(1, min(n_weights, self.max_batch_elements // max(horse_rate.size, 1)))
+        score = np.empty((batch,) + horse_rate.shape)
+        temp = np.empty_like(score)
+        ties = np.empty(score.shape, dtype=bool)
+        race_max = np.empty((batch, 1, horse_rate.shape[1]))
+
+        for start in range(0, n_weights, batch):
+            stop = min(start + batch, n_weights)
+            n = stop - start
+            s, t, tie, best = score[:n], temp[:n], ties[:n], race_max[:n]
+            alpha, beta, gamma = (weights[start:stop, i, None, None] for i in range(3))
+
+            # 與 CombinedStrategy 相同的運算順序 (alpha * h + beta * j) * gamma * odds，並列判斷才會一致
+            np.multiply(alpha, horse_rate, out=s)
+            np.multiply(beta, jockey_rate, out=t)
+            s += t
+            s *= gamma
+            s *= odds
+            if check_inf:
+                s[np.isinf(s)] = 0
+            s += penalty
+
+            np.max(s, axis=1, keepdims=True, out=best)
+            np.equal(s, best, out=tie)
+            counts = tie.sum(axis=1)
+            expected = np.einsum("kfr,fr->kr", tie, payouts) / counts
+            second_moment = np.einsum("kfr,fr->kr", tie, payouts_sq) / counts
+
+            means[start:stop] = expected.sum(axis=1)
+            variances[start:stop] = np.maximum(second_moment - expected ** 2, 0).sum(axis=1)
+
+        result = pd.DataFrame(weights, columns=WEIGHT_COLUMNS)
+        result["mean"] = means
+        result["std"] = np.sqrt(variances)
+        result["n_races"] = horse_rate.shape[1]
+        return result
+
+    def grid_search(self, alpha, beta, gamma):
+        """評估 alpha × beta × gamma 的全部組合"""
+        weights = np.array(list(itertools.product(alpha, beta, gamma)), dtype=np.float64)
+        return self.evaluate(weights)
+
+    @staticmethod
+    def sample_weights(n_samples, bounds=None, seed=None):
+        """在 bounds（{"alpha": (low, high), ...}，預設皆為 (0, 1)）內均勻抽樣權重"""
+        bounds = bounds or {}
+        rng = np.random.default_rng(seed)
+        low = np.array([bounds.get(name, (0.0, 1.0))[0] for name in WEIGHT_COLUMNS])
+        high = np.array([bounds.get(name, (0.0, 1.0))[1] for name in WEIGHT_COLUMNS])
+        return rng.uniform(low, high, size=(n_samples, 3))
+
+    def random_search(self, n_samples, bounds=None, seed=None):
+        """評估 n_samples 組隨機權重"""
+        return self.evaluate(self.sample_weights(n_samples, bounds, seed))
+
+    def successive_halving(self, n_samples, eta=3, min_races=100, bounds=None, seed=None):
+        """逐輪淘汰：先以少量賽事評估大量權重，每輪保留平均損益前 1/eta，賽事數乘以 eta
+
+        輪數以權重數與賽事數都能再除以 eta 為限，第一輪至少 min_races 場，
+        最後一輪以全部賽事評估。回傳每一輪的結果（含 round 欄位）。
+        """
+        if eta < 2:
+            raise ValueError("eta 必須至少為 2")
+        rng = np.random.default_rng(seed)
+        weights = self.sample_weights(n_samples, bounds, rng)
+        # 每輪取同一個隨機排列的前 n 場，賽事子集逐輪擴大
+        race_order = rng.permutation(self.n_races)
+
+        min_races = min(min_races, self.n_races)
+        n_rounds = 1 + int(min(np.log(max(n_samples, 1)), np.log(self.n_races / min_races)) / np.log(eta))
+
+        rounds = []
+        n_races = max(min_races, self.n_races // eta ** (n_rounds - 1))
+        for round_index in range(n_rounds):
+            is_last = round_index == n_rounds - 1 or len(weights) <= 1
+            races = None if is_last or n_races >= self.n_races else np.sort(race_order[:n_races])
+            result = self.evaluate(weights, races)
+            result["round"] = round_index
+            rounds.append(result)
+            if is_last:
+                break
+            n_keep = max(1, len(weights) // eta)
+            weights = weights[np.argsort(-result["mean"].to_numpy(), kind="stable")[:n_keep]]
+            n_races *= eta
+        return pd.concat(rounds, ignore_index=True)
+
+    def search(self, method="random", **kwargs):
+        """依 method（grid / random / halving）搜尋，回傳 (全部結果, 最終一輪的 Pareto 前緣)"""
+        if method == "grid":
+            results = self.grid_search(**kwargs)
+        elif method == "random":
+            results = self.random_search(**kwargs)
+        elif method == "halving":
+            results = self.successive_halving(**kwargs)
+            results = results[results["round"] == results["round"].max()]
+        else:
+            raise ValueError(f"不支援的搜尋方法: {method}")
+        return results, pareto_front(results)
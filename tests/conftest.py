@@ -0,0 +1,67 @@
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+
+RUNS_PATH = os.path.join(ROOT_DIR, "data", "run.csv")
+RACES_PATH = os.path.join(ROOT_DIR, "data", "races.csv")
+
+
+@pytest.fixture(scope="session")
+def processor():
+    """以附帶的資料執行 DataProcessor.prepare（與命令列相同的欄位與參數）"""
+    from cli import COLUMNS
+    from data_processor import DataProcessor
+
+    return DataProcessor().prepare(RUNS_PATH, COLUMNS, n_races=10, races_path=RACES_PATH)
+
+
+@pytest.fixture(scope="session")
+def race_arrays(processor):
+    """前 300 場賽事的 RaceArrays"""
+    from race_arrays import RaceArrays
+
+    data = processor.processed_data
+    race_ids = data["race_id"].drop_duplicates().sort_values().iloc[:300]
+    return RaceArrays.from_dataframe(data[data["race_id"].isin(race_ids)])
+
+
+def _strategy_params():
+    from betting_strategy import (
+        BettingType, CombinedStrategy, JockeyBasedStrategy, MaxHorseBasedStrategy, MaxHorseOddsBasedStrategy,
+        MaxJockeyBasedStrategy, MaxJockeyOddsBasedStrategy, MaxOddsBasedStrategy, MinOddsBasedStrategy,
+        OddsBasedStrategy, RandomStrategy,
+    )
+
+    factories = {
+        "RandomStrategy": RandomStrategy,
+        "OddsBasedStrategy": lambda betting_type: OddsBasedStrategy(2.0, 5.0, betting_type=betting_type),
+        "MinOddsBasedStrategy": MinOddsBasedStrategy,
+        "MaxOddsBasedStrategy": MaxOddsBasedStrategy,
+        "JockeyBasedStrategy": lambda betting_type: JockeyBasedStrategy(0.05, 1, betting_type=betting_type),
+        "MaxJockeyBasedStrategy": MaxJockeyBasedStrategy,
+        "MaxHorseBasedStrategy": MaxHorseBasedStrategy,
+        "MaxHorseOddsBasedStrategy":
+            lambda betting_type: MaxHorseOddsBasedStrategy(0.0, 1.0, 2.0, 20.0, betting_type=betting_type),
+        "MaxJockeyOddsBasedStrategy":
+            lambda betting_type: MaxJockeyOddsBasedStrategy(0.0, 1.0, 2.0, 20.0, betting_type=betting_type),
+        "CombinedStrategy": CombinedStrategy,
+    }
+    return [pytest.param((make, betting_type), id=f"{name}-{betting_type}")
+            for name, make in factories.items() for betting_type in (BettingType.WIN, BettingType.PLACE)]
+
+
+@pytest.fixture(params=_strategy_params())
+def strategy(request):
+    """每個內建策略（有參數的策略使用固定參數），WIN 與 PLACE 各一"""
+    make, betting_type = request.param
+    return make(betting_type=betting_type)
+
+
+def candidate_sets(strategy, arrays):
+    """strategy.candidates 每場的並列候選列集合"""
+    cand_rows, cand_offsets = strategy.candidates(arrays)
+    return [set(cand_rows[start:stop].tolist()) for start, stop in zip(cand_offsets[:-1], cand_offsets[1:])]
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from conftest import candidate_sets
+
+
+def test_kernel_matches_select_horse(strategy, race_arrays, monkeypatch):
+    """陣列核心的並列候選，與 select_horse 最後抽樣的那組馬相同"""
+    assert strategy.has_array_kernel
+    expected = candidate_sets(strategy, race_arrays)
+
+    # 記下 select_horse 抽樣時的候選，並固定取第一匹
+    sampled = []
+
+    def sample(frame, n=1, random_state=None):
+        sampled.append(set(frame.index.tolist()))
+        return frame.iloc[:n]
+
+    monkeypatch.setattr(pd.DataFrame, "sample", sample)
+    data = pd.DataFrame({name: np.asarray(values) for name, values in race_arrays.columns.items()})
+    for start, stop in zip(race_arrays.offsets[:-1], race_arrays.offsets[1:]):
+        strategy.select_horse(data.iloc[start:stop])
+    assert sampled == expected
+
+
+def test_select_indices_picks_a_candidate(strategy, race_arrays):
+    expected = candidate_sets(strategy, race_arrays)
+    rows = strategy.select_indices(race_arrays, rng=np.random.default_rng(0))
+    assert len(rows) == race_arrays.n_races
+    assert all(row in candidates for row, candidates in zip(rows.tolist(), expected))
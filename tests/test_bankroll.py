@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from bankroll import BankrollSimulation, FixedFraction, FlatStake, max_drawdown
+from betting_strategy import BettingType, CombinedStrategy, RandomStrategy
+from vectorized_simulation import VectorizedSimulation
+
+
+def _blocks(arrays, size=70):
+    starts = range(0, arrays.n_races, size)
+    return [arrays.take(np.arange(start, min(start + size, arrays.n_races))) for start in starts]
+
+
+@pytest.mark.parametrize("strategy", [RandomStrategy(), CombinedStrategy(betting_type=BettingType.PLACE)],
+                         ids=lambda s: type(s).__name__)
+def test_flat_stake_matches_vectorized_simulation(race_arrays, strategy):
+    expected = VectorizedSimulation(30, strategy, seed=5).simulate_replicates(race_arrays)
+
+    simulation = BankrollSimulation(30, strategy, staking=FlatStake(), ruin_level=-np.inf, seed=5)
+    simulation.run_simulation(race_arrays)
+    np.testing.assert_allclose(simulation.results, expected)
+    np.testing.assert_allclose(simulation.final_bankrolls, 100.0 + expected)
+
+    # 分區塊執行時資金、高點與回撤都延續
+    blocked = BankrollSimulation(30, strategy, staking=FlatStake(), ruin_level=-np.inf, seed=5)
+    blocked.run_simulation(_blocks(race_arrays))
+    np.testing.assert_allclose(blocked.final_bankrolls, simulation.final_bankrolls)
+    np.testing.assert_allclose(blocked.max_drawdowns, simulation.max_drawdowns)
+    assert blocked.race_counts == simulation.race_counts
+
+
+def test_paths_and_drawdown(race_arrays):
+    simulation = BankrollSimulation(8, RandomStrategy(), ruin_level=-np.inf, seed=2)
+    paths = simulation.simulate_paths(race_arrays)
+    assert paths.shape == (8, race_arrays.n_races)
+
+    simulation.run_simulation(race_arrays)
+    np.testing.assert_allclose(paths[:, -1], simulation.final_bankrolls)
+
+    # 與逐點掃過的回撤相同（起點為起始資金）
+    equity = np.hstack([np.full((8, 1), 100.0), paths])
+    peak = np.maximum.accumulate(equity, axis=1)
+    np.testing.assert_allclose(simulation.max_drawdowns, ((peak - equity) / peak).max(axis=1))
+    np.testing.assert_allclose(simulation.max_drawdown_amounts, (peak - equity).max(axis=1))
+
+
+def test_max_drawdown_continues_peak():
+    ratio, amount, peak = max_drawdown(np.array([[90.0, 120.0, 60.0, 80.0]]), initial_peak=[100.0])
+    np.testing.assert_allclose([ratio[0], amount[0], peak[0]], [0.5, 60.0, 120.0])
+
+
+def test_fixed_fraction_compounds(race_arrays):
+    simulation = BankrollSimulation(5, RandomStrategy(), staking=FixedFraction(0.1), seed=4)
+    paths = simulation.simulate_paths(race_arrays)
+
+    # 同一個種子選到同一組馬：單位損益由固定下注的資金曲線差分取得，再以目前資金的 10% 複利
+    flat = BankrollSimulation(5, RandomStrategy(), ruin_level=-np.inf, seed=4).simulate_paths(race_arrays)
+    returns = np.diff(flat, axis=1, prepend=100.0)
+    np.testing.assert_allclose(paths, 100.0 * np.cumprod(1 + 0.1 * returns, axis=1))
+
+
+def test_ruin_stops_betting(race_arrays):
+    simulation = BankrollSimulation(20, RandomStrategy(), initial_bankroll=3.0, ruin_level=0.0, seed=1)
+    paths = simulation.simulate_paths(race_arrays)
+    for path in paths:
+        broke = np.flatnonzero(path <= 0.0)
+        if len(broke):
+            assert (path[broke[0]:] == path[broke[0]]).all()
+    simulation.run_simulation(race_arrays)
+    assert np.mean(simulation.ruined) == simulation.get_bankroll_results()["risk_of_ruin"] > 0
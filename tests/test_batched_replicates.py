@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from betting_strategy import CombinedStrategy, RandomStrategy
+from vectorized_simulation import TopKSimulation, VectorizedSimulation
+
+
+@pytest.mark.parametrize("simulation_cls", [VectorizedSimulation, TopKSimulation])
+@pytest.mark.parametrize("strategy", [RandomStrategy(), CombinedStrategy()], ids=lambda s: type(s).__name__)
+def test_batch_size_and_replicate_subset(race_arrays, simulation_cls, strategy):
+    profits = simulation_cls(40, strategy, seed=3).simulate_replicates(race_arrays)
+    assert profits.shape == (40,)
+
+    # 批次大小不影響結果
+    small_batches = simulation_cls(40, strategy, seed=3)
+    small_batches.max_batch_elements = 7 * race_arrays.n_races
+    np.testing.assert_allclose(small_batches.simulate_replicates(race_arrays), profits)
+
+    # 只重跑部分重複模擬，回傳與 replicates 等長
+    subset = simulation_cls(40, strategy, seed=3).simulate_replicates(race_arrays, replicates=[5, 31])
+    np.testing.assert_allclose(subset, profits[[5, 31]])
+
+
+def test_replicates_differ(race_arrays):
+    profits = VectorizedSimulation(20, RandomStrategy(), seed=3).simulate_replicates(race_arrays)
+    assert len(np.unique(profits)) > 1
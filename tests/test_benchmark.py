@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import benchmark
+from conftest import RACES_PATH, RUNS_PATH
+from data_processor import DataProcessor
+
+
+def test_scale_dataset_shifts_ids_per_copy():
+    races, runs = pd.read_csv(RACES_PATH), pd.read_csv(RUNS_PATH)
+    scaled_races, scaled_runs = benchmark.scale_dataset(races, runs, 3)
+    assert len(scaled_races) == 3 * len(races) and len(scaled_runs) == 3 * len(runs)
+    for column in ("race_id", "horse_id", "jockey_id"):
+        assert scaled_runs[column].nunique() == 3 * runs[column].nunique()
+    assert scaled_races["race_id"].is_unique
+    assert benchmark.scale_dataset(races, runs, 1) == (races, runs)
+
+
+@pytest.mark.parametrize("engine", ["simulation", "vectorized"])
+def test_strategy_benchmark_is_reproducible(monkeypatch, processor, engine):
+    results = []
+    measure = benchmark._measure
+
+    def recording_measure(func, repeat=1, memory=True):
+        seconds, peak, simulation = measure(func, repeat, memory)
+        results.append(simulation.results)
+        return seconds, peak, simulation
+
+    monkeypatch.setattr(benchmark, "_measure", recording_measure)
+    data = processor.processed_data
+    runs = [benchmark.benchmark_strategies(data, engine, n_simulations=2, memory=False, seed=3, max_races=15)
+            for _ in range(2)]
+
+    for record in runs[0]["RandomStrategy"].values():
+        assert record["n_races"] == 15 and record["n_simulations"] == 2
+    half = len(results) // 2
+    # 同一個種子兩次量測的模擬結果相同（原始引擎也一樣）
+    np.testing.assert_allclose(results[:half], results[half:])
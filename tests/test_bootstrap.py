@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from betting_strategy import CombinedStrategy, RandomStrategy
+from bootstrap import Bootstrap, benjamini_hochberg, holm, race_profit_matrix
+from grid_runner import expand_grid
+
+
+@pytest.fixture(scope="module")
+def grid():
+    return expand_grid(CombinedStrategy, {"alpha": [0.55, 0.65, 0.75]})
+
+
+def test_grid_labels_are_unique_and_pair_correctly(race_arrays, grid):
+    bootstrap = Bootstrap.from_strategies(grid, race_arrays, n_resamples=200, seed=1)
+    assert len(set(bootstrap.labels)) == len(grid)
+
+    profits = race_profit_matrix(grid, race_arrays)
+    baseline = bootstrap.labels[3]
+    tests = bootstrap.paired_tests(baseline=baseline, correction="none")
+    assert (tests["策略 B"] == baseline).all()
+    for _, row in tests.iterrows():
+        i = bootstrap.labels.index(row["策略 A"])
+        assert row["差"] == pytest.approx(profits[i].sum() - profits[3].sum())
+
+
+def test_duplicate_labels_rejected(race_arrays):
+    with pytest.raises(ValueError):
+        Bootstrap.from_strategies([RandomStrategy(), RandomStrategy()], race_arrays)
+    with pytest.raises(ValueError):
+        Bootstrap(np.zeros((2, 5)), labels=["a", "a"])
+
+
+def test_identical_strategies_not_significant(race_arrays):
+    profits = race_profit_matrix([CombinedStrategy()], race_arrays)
+    bootstrap = Bootstrap(np.vstack([profits, profits]), labels=["a", "b"], n_resamples=500, seed=2)
+    row = bootstrap.paired_tests().iloc[0]
+    assert row["差"] == 0 and row["下界"] == row["上界"] == 0
+    assert row["p 值"] == 1.0
+
+
+def test_totals_match_resampled_indices_and_ignore_batches():
+    rng = np.random.default_rng(0)
+    profits = rng.normal(size=(3, 40))
+    bootstrap = Bootstrap(profits, n_resamples=50, seed=4, max_workers=1)
+    expected = profits[:, bootstrap.resample_indices(0, 50)].sum(axis=2).T
+    np.testing.assert_allclose(bootstrap.totals, expected)
+
+    batched = Bootstrap(profits, n_resamples=50, seed=4, max_workers=3)
+    batched.max_batch_elements = 7 * 40
+    np.testing.assert_allclose(batched.totals, expected)
+
+
+def test_corrections():
+    p_values = np.array([0.01, 0.04, 0.03, 0.2])
+    np.testing.assert_allclose(holm(p_values), [0.04, 0.09, 0.09, 0.2])
+    np.testing.assert_allclose(benjamini_hochberg(p_values), [0.04, 0.0533333, 0.0533333, 0.2], rtol=1e-5)
@@ -0,0 +1,69 @@
+import json
+import os
+
+import pytest
+
+from cli import DEFAULT_STRATEGIES, ROOT_DIR, build_parser, build_strategies, load_config, main
+
+
+def _config(argv):
+    return load_config(build_parser().parse_args(argv))
+
+
+def test_paths_resolved_against_their_source(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    defaults = _config([])
+    assert defaults["runs"] == os.path.join(ROOT_DIR, "data", "run.csv")
+    assert defaults["cache"] == os.path.join(ROOT_DIR, "cache")
+
+    config_dir = tmp_path / "configs"
+    config_dir.mkdir()
+    (config_dir / "run.json").write_text(json.dumps({"runs": "../data/my_runs.csv", "n_simulations": 5}))
+    config = _config(["--config", "configs/run.json", "--store", "out/results.sqlite"])
+    # 設定檔的路徑以設定檔所在目錄為準，命令列的路徑以目前目錄為準
+    assert config["runs"] == str(tmp_path / "data" / "my_runs.csv")
+    assert config["store"] == str(tmp_path / "out" / "results.sqlite")
+    assert config["races"] == defaults["races"]
+    assert config["n_simulations"] == 5
+
+    # 命令列覆寫設定檔
+    assert _config(["--config", "configs/run.json", "-n", "7"])["n_simulations"] == 7
+
+
+def test_disable_cache_and_store():
+    config = _config(["--no-cache", "--no-store"])
+    assert config["cache"] is None and config["store"] is None
+
+
+def test_unknown_config_keys_raise(tmp_path):
+    path = tmp_path / "bad.json"
+    path.write_text(json.dumps({"n_simulation": 5}))
+    with pytest.raises(ValueError):
+        _config(["--config", str(path)])
+    with pytest.raises(SystemExit):
+        main(["--config", str(path), "--list-strategies"])
+
+
+def test_build_strategies():
+    strategies = build_strategies(DEFAULT_STRATEGIES)
+    # JockeyBasedStrategy 的兩組參數各限定一種投注類型，其餘策略 WIN 與 PLACE 各一
+    assert len(strategies) == 2 * (len(DEFAULT_STRATEGIES) - 2) + 2
+    jockey = [s for s in strategies if type(s).__name__ == "JockeyBasedStrategy"]
+    assert [(s.betting_type, s.min_win_rate) for s in jockey] == [("win", 0.05), ("place", 0.17)]
+
+    selected = build_strategies(DEFAULT_STRATEGIES, ["CombinedStrategy"], ["place"])
+    assert [(type(s).__name__, s.betting_type, s.alpha) for s in selected] == [("CombinedStrategy", "place", 0.75)]
+
+    grid = [{"name": "CombinedStrategy", "params": {"alpha": [0.6, 0.7], "beta": [0.2]}}]
+    assert [s.alpha for s in build_strategies(grid, bet_types=["win"])] == [0.6, 0.7]
+    # 不在網格中的名稱以預設參數建立
+    assert len(build_strategies(grid, ["RandomStrategy"])) == 2
+
+    with pytest.raises(ValueError):
+        build_strategies([{"name": "UnknownStrategy"}])
+
+
+def test_list_strategies(capsys):
+    main(["--list-strategies", "--strategies", "OddsBasedStrategy", "--bet-types", "win"])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines == ['OddsBasedStrategy win {"min_odds": 2.0, "max_odds": 5.0}']
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import RACES_PATH, RUNS_PATH
+from entity_index import build_entity_indexes
+
+
+@pytest.fixture(scope="module")
+def indexes():
+    return build_entity_indexes(RUNS_PATH, RACES_PATH)
+
+
+def _reference(data, key):
+    """以 groupby / shift 算出的近況特徵，依原始列排列"""
+    ordered = data.assign(row=np.arange(len(data))).sort_values([key, "date", "row"], kind="stable")
+    groups = ordered.groupby(key)
+    reference = pd.DataFrame(index=ordered["row"])
+    for lag in (1, 2, 3):
+        reference[f"last{lag}"] = groups["result"].shift(lag).to_numpy()
+    reference["days"] = (ordered["date"] - groups["date"].shift(1)).dt.days.to_numpy()
+    reference["avg"] = groups["finish_time"].transform(lambda s: s.shift(1).expanding().mean()).to_numpy()
+    reference["avg5"] = groups["finish_time"].transform(lambda s: s.shift(1).rolling(5, min_periods=1).mean()).to_numpy()
+    return reference.sort_index()
+
+
+@pytest.mark.parametrize("key", ["horse_id", "jockey_id"])
+def test_entity_index_matches_groupby(indexes, key):
+    entity_indexes, data = indexes
+    index = entity_indexes[key]
+    reference = _reference(data, key)
+
+    features = index.form_features("x")
+    np.testing.assert_allclose(index.last("result", 3), reference[["last1", "last2", "last3"]].to_numpy())
+    np.testing.assert_allclose(features["x_last1_result"], reference["last1"])
+    np.testing.assert_allclose(features["x_days_since_last"], reference["days"])
+    np.testing.assert_allclose(features["x_avg_finish_time"], reference["avg"], rtol=1e-5)
+    np.testing.assert_allclose(index.prior_mean("finish_time", 5), reference["avg5"], rtol=1e-5)
+
+
+def test_runs_lookup(indexes):
+    entity_indexes, data = indexes
+    index = entity_indexes["horse_id"]
+    horse_id = data["horse_id"].iloc[500]
+    expected = data[data["horse_id"] == horse_id].sort_values("date", kind="stable")
+    np.testing.assert_array_equal(index.runs(horse_id)["race_id"], expected["race_id"].to_numpy())
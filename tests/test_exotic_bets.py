@@ -0,0 +1,104 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from betting_strategy import BettingType, CombinedStrategy, OddsBasedStrategy
+from exotic_bets import LEGS, ORDERED, ExoticSimulation, FinishIndex, dividend_column
+from race_arrays import RaceArrays
+
+STRATEGIES = [CombinedStrategy(), OddsBasedStrategy(2.0, 8.0)]
+
+
+@pytest.fixture(scope="module")
+def arrays(race_arrays):
+    """前 120 場，另加上隨機的組合投注派彩欄位（每場同一個值）"""
+    arrays = race_arrays.take(np.arange(120))
+    rng = np.random.default_rng(0)
+    columns = dict(arrays.columns)
+    for bet_type in LEGS:
+        columns[dividend_column(bet_type)] = np.repeat(rng.uniform(50, 5000, arrays.n_races), arrays.race_sizes)
+    return RaceArrays(columns, arrays.offsets, arrays.race_ids)
+
+
+def _brute_force(simulation, arrays, replicate):
+    """逐場排序候選馬、逐張彩票結算的 (損益, 命中張數, 下注張數)"""
+    eligible, score = simulation.betting_strategy.score_arrays(arrays)
+    score = np.zeros(arrays.n_rows) if score is None else np.asarray(score, dtype=np.float64)
+    valid = ~np.isnan(score) if eligible is None else np.asarray(eligible, dtype=bool) & ~np.isnan(score)
+    u = simulation._row_uniforms(arrays, [replicate])[0]
+    result = np.nan_to_num(np.asarray(arrays["result"], dtype=np.float64)).astype(int)
+    legs = LEGS[simulation.bet_type]
+    combine = itertools.permutations if simulation.bet_type in ORDERED else itertools.combinations
+
+    profit, hits, tickets = 0.0, 0, 0
+    for race, start in enumerate(arrays.starts):
+        rows = [row for row in range(start, arrays.offsets[race + 1]) if valid[row]]
+        if len(rows) < simulation.box_size:
+            continue
+        top = sorted(rows, key=lambda row: (-score[row], u[row]))[:simulation.box_size]
+        dividend = arrays[dividend_column(simulation.bet_type)][start]
+        for ticket in combine(top, legs):
+            positions = [result[row] for row in ticket]
+            if simulation.bet_type in ORDERED:
+                hit = positions == list(range(1, legs + 1))
+            else:
+                hit = all(1 <= position <= legs for position in positions)
+            profit += dividend / 10 - 1 if hit else -1.0
+            hits += hit
+            tickets += 1
+    return profit, hits, tickets
+
+
+@pytest.mark.parametrize("box_size", [None, 4])
+@pytest.mark.parametrize("bet_type", list(LEGS))
+@pytest.mark.parametrize("strategy", STRATEGIES, ids=lambda s: type(s).__name__)
+def test_matches_brute_force(arrays, strategy, bet_type, box_size):
+    simulation = ExoticSimulation(4, strategy, bet_type, box_size=box_size, seed=9)
+    profits = simulation.simulate_replicates(arrays)
+    hits, counts = simulation.simulate_hits(arrays)
+    for replicate in range(4):
+        expected = _brute_force(simulation, arrays, replicate)
+        np.testing.assert_allclose((profits[replicate], hits[replicate], counts[replicate]), expected)
+
+
+def test_ineligible_runners_never_boxed(arrays):
+    strategy = OddsBasedStrategy(2.0, 8.0)
+    simulation = ExoticSimulation(3, strategy, BettingType.TRIO, box_size=4, seed=1)
+    tickets = simulation.tickets(arrays, simulation._row_uniforms(arrays, [0, 1, 2]))
+    eligible, _ = strategy.score_arrays(arrays)
+    assert eligible[tickets[tickets >= 0]].all()
+
+    # 候選馬不足 box_size 匹的賽事整場不買
+    n_eligible = np.add.reduceat(np.asarray(eligible, dtype=int), arrays.starts)
+    placed = (tickets >= 0).all(axis=-1).any(axis=-1)
+    assert (placed == (n_eligible >= 4)[None, :]).all()
+    assert (n_eligible < 4).any()
+
+
+def test_replicate_subset_and_batches(arrays):
+    profits = ExoticSimulation(30, CombinedStrategy(), BettingType.QUINELLA, seed=2).simulate_replicates(arrays)
+    subset = ExoticSimulation(30, CombinedStrategy(), BettingType.QUINELLA, seed=2)
+    subset.max_batch_elements = 3 * arrays.n_rows
+    np.testing.assert_allclose(subset.simulate_replicates(arrays, replicates=[4, 17, 29]), profits[[4, 17, 29]])
+
+
+def test_run_simulation_accumulates_blocks(arrays):
+    whole = ExoticSimulation(12, CombinedStrategy(), BettingType.TIERCE, box_size=4, seed=6).run_simulation(arrays)
+    blocks = [arrays.take(np.arange(start, min(start + 50, arrays.n_races))) for start in (0, 50, 100)]
+    blocked = ExoticSimulation(12, CombinedStrategy(), BettingType.TIERCE, box_size=4, seed=6).run_simulation(blocks)
+
+    assert len(blocked.results) == len(blocked.hit_counts) == len(blocked.ticket_counts) == 12
+    np.testing.assert_allclose(blocked.results, whole.results)
+    assert blocked.hit_counts == whole.hit_counts
+    assert blocked.ticket_counts == whole.ticket_counts
+    assert blocked.race_counts == [arrays.n_races] * 12
+
+
+def test_finish_index_handles_dead_heat():
+    columns = {"race_id": np.array([1, 1, 1, 1]), "result": np.array([1.0, 1.0, 3.0, np.nan])}
+    arrays = RaceArrays(columns, np.array([0, 4]), np.array([1]))
+    finish = FinishIndex(arrays)
+    assert finish.hits(BettingType.QUINELLA, [[0, 1], [1, 2]]).tolist() == [True, False]
+    assert finish.hits(BettingType.TIERCE, [[0, 1, 2], [2, 1, 0]]).tolist() == [False, False]
+    assert finish.winning_tickets(BettingType.TRIO).tolist() == [[0, 1, 2]]
@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from cli import COLUMNS
+from conftest import RACES_PATH, RUNS_PATH
+from data_processor import DataProcessor
+from feature_cache import FeatureCache
+
+
+def test_round_trip_keeps_values_and_dtypes(tmp_path, processor):
+    cache = FeatureCache(tmp_path)
+    data = processor.processed_data.copy()
+    data["category"] = pd.Categorical(np.where(data["result"] == 1, "win", "lose"))
+    data["text"] = pd.Series(np.where(data["result"] == 2, None, "x"), dtype=object)
+
+    cache.save("k-1", data)
+    pd.testing.assert_frame_equal(cache.load("k-1"), data)
+    assert cache.load("missing-1") is None
+
+
+def test_key_depends_on_params_and_content(tmp_path):
+    source = tmp_path / "run.csv"
+    source.write_text("race_id,result\n1,1\n")
+    cache = FeatureCache(tmp_path / "cache")
+
+    key = cache.make_key(str(source), ["race_id"], {"n_races": 10})
+    assert cache.make_key(str(source), ["race_id"], {"n_races": 10}) == key
+    assert cache.make_key(str(source), ["race_id"], {"n_races": 5}) != key
+    source.write_text("race_id,result\n1,2\n")
+    changed = cache.make_key(str(source), ["race_id"], {"n_races": 10})
+    # 只有內容雜湊不同：寫入新項目時移除同一組參數的舊項目
+    assert changed != key and changed.split("-")[0] == key.split("-")[0]
+
+    frame = pd.DataFrame({"a": [1, 2]})
+    cache.save(key, frame).save(changed, frame)
+    assert cache.load(key) is None
+    pd.testing.assert_frame_equal(cache.load(changed), frame)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    frame = pd.DataFrame({"a": np.arange(10_000)})
+    cache = FeatureCache(tmp_path, max_bytes=200_000)
+    cache.save("a-1", frame)
+    cache.save("b-1", frame)
+    os.utime(os.path.join(tmp_path, "a-1.npz"), (1, 1))
+    cache.save("c-1", frame)
+    assert cache.load("a-1") is None
+    assert cache.load("b-1") is not None and cache.load("c-1") is not None
+
+
+def test_prepare_reads_from_cache(tmp_path, processor, monkeypatch):
+    cache = FeatureCache(tmp_path)
+    first = DataProcessor().prepare(RUNS_PATH, COLUMNS, n_races=10, cache=cache, races_path=RACES_PATH)
+    assert len(os.listdir(tmp_path)) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError("命中快取時不應重新讀取 CSV")
+
+    monkeypatch.setattr(DataProcessor, "load_race_data", fail)
+    second = DataProcessor().prepare(RUNS_PATH, COLUMNS, n_races=10, cache=cache, races_path=RACES_PATH)
+    pd.testing.assert_frame_equal(first.processed_data, processor.processed_data)
+    pd.testing.assert_frame_equal(second.processed_data, processor.processed_data)
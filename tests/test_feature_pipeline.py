@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+
+from cli import COLUMNS
+from conftest import RACES_PATH, RUNS_PATH
+from feature_pipeline import FeaturePipeline
+
+
+def test_default_pipeline_matches_prepare(processor):
+    pipeline = FeaturePipeline.default(COLUMNS, n_races=10)
+    pd.testing.assert_frame_equal(pipeline.collect(RUNS_PATH, RACES_PATH), processor.processed_data)
+
+    assert set(pipeline.rate_moments) == set(processor.rate_moments)
+    for column, moments in pipeline.rate_moments.items():
+        expected = processor.rate_moments[column]
+        assert np.isclose(moments.mean, expected.mean)
+        assert np.isclose(moments.std, expected.std)
+
+
+def test_default_pipeline_from_dataframe(processor):
+    pipeline = FeaturePipeline.default(COLUMNS, n_races=10)
+    pd.testing.assert_frame_equal(pipeline.collect(data=processor.data), processor.processed_data)
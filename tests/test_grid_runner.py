@@ -0,0 +1,40 @@
+import numpy as np
+
+from betting_strategy import BettingType, CombinedStrategy, OddsBasedStrategy, RandomStrategy
+from grid_runner import SharedRaceArrays, expand_grid, run_grid
+from vectorized_simulation import VectorizedSimulation
+
+
+def test_shared_arrays_round_trip(race_arrays):
+    with SharedRaceArrays(race_arrays) as shared:
+        attached, blocks = SharedRaceArrays.attach(shared.spec)
+        np.testing.assert_array_equal(attached.offsets, race_arrays.offsets)
+        np.testing.assert_array_equal(attached.race_ids, race_arrays.race_ids)
+        for name in shared.spec["columns"]:
+            np.testing.assert_array_equal(attached[name], race_arrays[name])
+        del attached
+        for block in blocks:
+            block.close()
+
+
+def test_expand_grid():
+    strategies = expand_grid(CombinedStrategy, {"alpha": [0.6, 0.7], "beta": [0.2]})
+    assert len(strategies) == 4
+    assert [(s.alpha, s.beta, s.betting_type) for s in strategies] == [
+        (0.6, 0.2, BettingType.WIN), (0.6, 0.2, BettingType.PLACE),
+        (0.7, 0.2, BettingType.WIN), (0.7, 0.2, BettingType.PLACE),
+    ]
+
+
+def test_run_grid_matches_single_process(race_arrays):
+    strategies = [RandomStrategy(), OddsBasedStrategy(2.0, 5.0, betting_type=BettingType.PLACE), CombinedStrategy()]
+    results = run_grid(strategies, race_arrays, 30, max_workers=2, seed=11)
+    reversed_results = run_grid(strategies[::-1], race_arrays, 30, max_workers=1, seed=11)[::-1].reset_index(drop=True)
+
+    for i, strategy in enumerate(strategies):
+        profits = VectorizedSimulation(30, strategy, seed=11).simulate_replicates(race_arrays)
+        assert np.isclose(results["平均損益"][i], profits.mean())
+        assert np.isclose(results["損益標準差"][i], profits.std())
+        assert results["平均賽事數"][i] == race_arrays.n_races
+    # 結果與策略順序、行程數無關
+    np.testing.assert_allclose(results["平均損益"], reversed_results["平均損益"])
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cli import COLUMNS
+from conftest import RACES_PATH, RUNS_PATH
+from data_processor import DataProcessor
+from feature_cache import FeatureCache
+
+
+def _prepared(data):
+    processor = DataProcessor()
+    processor.data = data.reset_index(drop=True)
+    return processor.filter_columns(COLUMNS).add_place_result().add_horse_win_rate(10).add_jockey_win_rate(10)
+
+
+@pytest.fixture(scope="module")
+def split(processor):
+    """依日期切成兩段，後段再切成兩個賽馬日區間"""
+    data = processor.data
+    dates = np.sort(data["date"].unique())
+    first, second = dates[len(dates) * 2 // 3], dates[len(dates) * 5 // 6]
+    return data[data["date"] < first], data[(data["date"] >= first) & (data["date"] < second)], data[data["date"] >= second]
+
+
+def test_append_data_equals_full_recompute(split):
+    early, middle, late = split
+    expected = _prepared(pd.concat([early, middle, late])).processed_data
+
+    incremental = _prepared(early).append_data(middle).append_data(late)
+    pd.testing.assert_frame_equal(incremental.processed_data, expected, check_exact=False, atol=1e-9)
+
+
+def test_append_rejects_earlier_dates(split):
+    early, middle, _ = split
+    with pytest.raises(ValueError):
+        _prepared(middle).append_data(early)
+
+
+def test_saved_state_continues_updates(tmp_path, split):
+    early, middle, _ = split
+    original = _prepared(early)
+    original.save_feature_state(tmp_path / "state.npz")
+
+    restored = DataProcessor().load_feature_state(tmp_path / "state.npz")
+    restored.processed_data = original.processed_data.copy()
+    pd.testing.assert_frame_equal(restored.append_data(middle).processed_data,
+                                  original.append_data(middle).processed_data)
+
+
+def test_cache_hit_restores_state(tmp_path, processor):
+    new_day = processor.data[COLUMNS].iloc[:200].assign(date=processor.data["date"].max() + pd.Timedelta(days=7))
+    results = []
+    for _ in range(2):
+        cached = DataProcessor().prepare(RUNS_PATH, COLUMNS, n_races=10, cache=FeatureCache(tmp_path),
+                                         races_path=RACES_PATH)
+        results.append(cached.append_data(new_day).processed_data)
+    pd.testing.assert_frame_equal(results[0], results[1])
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from betting_strategy import BettingType, CombinedStrategy, OddsBasedStrategy
+from live_replay import CARD_COLUMNS, LiveFeatures, OddsFileSource, OddsReplayService, write_odds_timeline
+from race_arrays import RaceArrays
+from random_streams import RandomStreams
+
+STRATEGIES = [
+    OddsBasedStrategy(1.0, 5.0),
+    OddsBasedStrategy(5.0, 50.0),
+    CombinedStrategy(alpha=0.65, betting_type=BettingType.PLACE),
+    CombinedStrategy(alpha=0.75, betting_type=BettingType.PLACE),
+]
+
+
+@pytest.fixture(scope="module")
+def replayed(processor, tmp_path_factory):
+    data = processor.data
+    race_ids = np.sort(data["race_id"].unique())[-30:]
+    races = data[data["race_id"].isin(race_ids)]
+    path = tmp_path_factory.mktemp("replay") / "odds.csv"
+    write_odds_timeline(races, path, n_updates=3)
+
+    service = OddsReplayService(races[CARD_COLUMNS], LiveFeatures.from_processor(processor), STRATEGIES, seed=3)
+    return service.run(OddsFileSource(path)), races
+
+
+def test_strategy_variants_kept_apart(replayed):
+    service, races = replayed
+    assert len(set(service.labels)) == len(STRATEGIES)
+    report = service.latency_report()
+    assert report["策略"].tolist() == service.labels
+    assert (report["次數"] == service.n_updates).all()
+
+    table = service.decision_table()
+    assert len(table) == races["race_id"].nunique() * len(STRATEGIES)
+    # 兩組賠率範圍不重疊，同一場不會選到同一匹馬（除非整場都沒有候選）
+    by_label = table.pivot(index="race_id", columns="策略", values="horse_no")
+    assert (by_label[service.labels[0]] != by_label[service.labels[1]]).any()
+
+
+def test_decisions_match_vectorized_replicate_zero(replayed):
+    """回放結束時的選擇等於在最終賠率上以 VectorizedSimulation 第 0 個重複模擬的選法"""
+    service, _ = replayed
+    states = [service.races[race_id] for race_id in sorted(service.races)]
+    columns = {name: np.concatenate([state.arrays[name] for state in states]) for name in states[0].arrays.columns}
+    offsets = np.concatenate(([0], np.cumsum([state.arrays.n_rows for state in states])))
+    arrays = RaceArrays(columns, offsets, np.array([state.race_id for state in states]))
+
+    streams = RandomStreams(service.seed)
+    for strategy, label in zip(STRATEGIES, service.labels):
+        rows = strategy.select_indices(arrays, rng=streams.for_strategy(strategy).replicate(0))
+        expected = dict(zip(arrays.race_ids.tolist(), arrays["horse_no"][rows].tolist()))
+        decided = {race_id: horse_no for (race_id, name), horse_no in service.decisions.items() if name == label}
+        assert decided == expected
+
+
+def test_duplicate_strategies_rejected(processor):
+    card = processor.data[CARD_COLUMNS].iloc[:20]
+    with pytest.raises(ValueError):
+        OddsReplayService(card, LiveFeatures.from_processor(processor), [OddsBasedStrategy(2.0), OddsBasedStrategy(2.0)])
@@ -0,0 +1,47 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from betting_strategy import RandomStrategy
+from profiling import StageProfiler, strategy_label
+from simulation import Simulation
+from vectorized_simulation import VectorizedSimulation
+
+
+@pytest.fixture(scope="module")
+def races(race_arrays):
+    data = pd.DataFrame({name: np.asarray(values) for name, values in race_arrays.columns.items()})
+    return data[data["race_id"].isin(race_arrays.race_ids[:20])]
+
+
+def test_timing_does_not_change_results(races):
+    strategy = RandomStrategy()
+    profiler = StageProfiler(trace=True, max_events=50)
+    timed = Simulation(3, strategy, seed=1, instrumentation=profiler).run_simulation(races.groupby("race_id"))
+    plain = Simulation(3, strategy, seed=1).run_simulation(races.groupby("race_id"))
+    assert timed.results == plain.results
+
+    summary = profiler.summary()[strategy_label(strategy)]
+    for stage in ("groupby", "select_horse", "get_result", "payout"):
+        assert summary[stage]["count"] == 3 * 20
+    assert summary["run_simulation"]["count"] == 1
+    assert summary["run_simulation"]["share"] is None
+    assert np.isclose(sum(record["share"] for stage, record in summary.items() if stage != "run_simulation"), 1.0)
+
+    # 超過 max_events 的呼叫只計數
+    assert len(profiler.events) == 50
+    assert profiler.dropped_events == sum(record["count"] for record in summary.values()) - 50
+    trace = profiler.chrome_trace()
+    assert sum(event["ph"] == "X" for event in trace["traceEvents"]) == 50
+    assert json.loads(profiler.to_json()) == json.loads(json.dumps(profiler.summary()))
+
+
+def test_vectorized_stages(race_arrays):
+    profiler = StageProfiler()
+    VectorizedSimulation(5, RandomStrategy(), seed=1, instrumentation=profiler).run_simulation(race_arrays)
+    stages = profiler.summary()[strategy_label(RandomStrategy())]
+    assert {"payout", "candidates", "sample", "run_simulation"} <= set(stages)
+    with pytest.raises(ValueError):
+        profiler.chrome_trace()
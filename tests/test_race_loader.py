@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from conftest import RACES_PATH, RUNS_PATH
+from data_processor import RACES_DTYPES, RUNS_DTYPES, DataProcessor
+
+
+def test_load_race_data_joins_dividends_per_horse():
+    data = DataProcessor().load_race_data(RACES_PATH, RUNS_PATH).data
+    runs = pd.read_csv(RUNS_PATH)
+    races = pd.read_csv(RACES_PATH)
+    expected = runs.merge(races, on="race_id")
+    assert len(data) == len(expected)
+    np.testing.assert_array_equal(data["race_id"], expected["race_id"])
+    np.testing.assert_array_equal(data["horse_no"], expected["horse_no"])
+
+    # 逐列對照：只有自己的組合有派彩
+    win = [row.win_dividend1 if row.horse_no == row.win_combination1 else np.nan
+           for row in expected.itertuples()]
+    np.testing.assert_allclose(data["win_dividend1"], win, rtol=1e-6)
+    for n in (1, 2, 3):
+        place = []
+        for row in expected.itertuples():
+            dividend = np.nan
+            if row.result == n:
+                for m in (1, 2, 3):
+                    if row.horse_no == getattr(row, f"place_combination{m}"):
+                        dividend = getattr(row, f"place_dividend{m}")
+            place.append(dividend)
+        np.testing.assert_allclose(data[f"place_dividend{n}"], place, rtol=1e-6)
+    assert not any(col.endswith("combination1") for col in data.columns)
+
+
+def test_load_race_data_uses_compact_dtypes():
+    data = DataProcessor().load_race_data(RACES_PATH, RUNS_PATH).data
+    for name, dtype in {**RUNS_DTYPES, **RACES_DTYPES}.items():
+        if name in data.columns and not name.startswith(("win_dividend", "place_dividend")):
+            if name == "race_class":
+                assert data[name].cat.categories.dtype == np.dtype(dtype)
+            else:
+                assert data[name].dtype == np.dtype(dtype), name
+    assert pd.api.types.is_datetime64_any_dtype(data["date"])
+    default = pd.read_csv(RUNS_PATH).merge(pd.read_csv(RACES_PATH), on="race_id")
+    assert data.memory_usage(deep=True).sum() < default.memory_usage(deep=True).sum()
@@ -0,0 +1,35 @@
+import numpy as np
+
+from betting_strategy import MinOddsBasedStrategy, RandomStrategy
+from conftest import RACES_PATH, RUNS_PATH
+from data_processor import DataProcessor
+from race_arrays import RaceArrays
+from race_store import RaceStore
+from vectorized_simulation import VectorizedSimulation
+
+
+def test_store_from_chunked_csv_matches_loaded_data(tmp_path):
+    store = RaceStore.from_csv(str(tmp_path), RACES_PATH, RUNS_PATH, chunksize=5_000)
+    data = DataProcessor().load_race_data(RACES_PATH, RUNS_PATH).data
+    expected = RaceArrays.from_dataframe(data)
+
+    arrays = RaceStore(str(tmp_path)).race_arrays()
+    np.testing.assert_array_equal(arrays.offsets, expected.offsets)
+    np.testing.assert_array_equal(arrays.race_ids, expected.race_ids)
+    for name in ("horse_id", "result", "win_odds", "win_dividend1", "place_dividend2", "date"):
+        np.testing.assert_array_equal(np.asarray(arrays[name]), np.asarray(expected[name]).astype(arrays[name].dtype))
+    assert store.n_races == expected.n_races
+
+
+def test_blocks_cover_all_races_and_simulate_the_same(tmp_path):
+    store = RaceStore.from_csv(str(tmp_path), RACES_PATH, RUNS_PATH)
+    blocks = list(store.iter_blocks(races_per_block=1_000))
+    assert sum(block.n_races for block in blocks) == store.n_races
+    np.testing.assert_array_equal(np.concatenate([block.race_ids for block in blocks]), store.race_ids)
+    assert all(isinstance(block["result"], np.memmap) for block in blocks)
+
+    whole = store.race_arrays()
+    for strategy in (RandomStrategy(), MinOddsBasedStrategy(betting_type="place")):
+        streamed = VectorizedSimulation(10, strategy, seed=2).run_simulation(store.iter_blocks(races_per_block=1_000))
+        expected = VectorizedSimulation(10, strategy, seed=2).simulate_replicates(whole)
+        np.testing.assert_allclose(streamed.results, expected)
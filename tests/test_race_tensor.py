@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from race_tensor import RaceTensor
+from vectorized_simulation import VectorizedSimulation
+
+
+@pytest.fixture(scope="module")
+def tensor(race_arrays):
+    return RaceTensor.from_arrays(race_arrays)
+
+
+def test_to_arrays_round_trip(race_arrays, tensor):
+    arrays = tensor.to_arrays()
+    np.testing.assert_array_equal(arrays.offsets, race_arrays.offsets)
+    np.testing.assert_array_equal(arrays.race_ids, race_arrays.race_ids)
+    for name in tensor.features:
+        np.testing.assert_array_equal(arrays[name], np.asarray(race_arrays[name], dtype=np.float32))
+
+    # 每場都是 values 的視圖
+    i = tensor.index_of(race_arrays.race_ids[7])
+    race = tensor.race(i)
+    assert race.base is not None and race.shape == (race_arrays.race_sizes[7], len(tensor.features))
+    with pytest.raises(KeyError):
+        tensor.index_of(-1)
+
+
+def test_save_load_memory_mapped(tmp_path, tensor):
+    tensor.save(tmp_path / "tensor")
+    loaded = RaceTensor.load(tmp_path / "tensor")
+    assert isinstance(loaded.values, np.memmap)
+    np.testing.assert_array_equal(loaded.values, tensor.values)
+    np.testing.assert_array_equal(loaded.mask, tensor.mask)
+    assert loaded.features == tensor.features
+    np.testing.assert_array_equal(loaded.race_ids, tensor.race_ids)
+
+
+def test_padded_simulation_matches_flat(tensor, strategy):
+    """iter_padded 的補齊區塊與 to_arrays 的一維欄位選到同一組馬"""
+    flat = VectorizedSimulation(15, strategy, seed=8).run_simulation(tensor.to_arrays())
+    padded = VectorizedSimulation(15, strategy, seed=8)
+    blocks = list(tensor.iter_padded(races_per_block=120))
+    assert len(blocks) == 3
+    padded.run_simulation(tensor)
+    np.testing.assert_allclose(padded.results, flat.results)
+
+    # 分成多個補齊區塊的結果也相同
+    blocked = VectorizedSimulation(15, strategy, seed=8)
+    profits = sum(blocked.simulate_replicates(block) for block in blocks)
+    np.testing.assert_allclose(profits, flat.results)
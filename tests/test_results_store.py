@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from betting_strategy import BettingType, CombinedStrategy, RandomStrategy
+from results_store import ResultsStore, dataset_hash
+from vectorized_simulation import VectorizedSimulation
+
+
+@pytest.fixture
+def store(tmp_path):
+    with ResultsStore(str(tmp_path / "results.sqlite")) as store:
+        yield store
+
+
+def test_add_runs_round_trip(store):
+    rng = np.random.default_rng(0)
+    profits = [rng.normal(size=50), rng.normal(size=50)]
+    strategies = [CombinedStrategy(alpha=0.65), CombinedStrategy(alpha=0.75)]
+    run_ids = store.add_runs([(strategy, values, 300, 42, "abc", "VectorizedSimulation", "grid")
+                              for strategy, values in zip(strategies, profits)])
+
+    stored = store.profits(run_ids)
+    for run_id, values in zip(run_ids, profits):
+        np.testing.assert_array_equal(stored[run_id], values)
+        np.testing.assert_array_equal(store.race_counts(run_id), np.full(50, 300))
+    np.testing.assert_array_equal(store.profit_matrix(run_ids), np.stack(profits))
+
+    # 策略參數可以直接當成查詢條件
+    runs = store.runs(alpha=0.75)
+    assert runs["run_id"].tolist() == [run_ids[1]]
+    assert runs["seed"].iloc[0] == "42" and runs["tag"].iloc[0] == "grid"
+    assert runs["mean"].iloc[0] == pytest.approx(profits[1].mean())
+
+
+def test_summary_merges_runs(store):
+    rng = np.random.default_rng(1)
+    first, second = rng.normal(size=40), rng.normal(size=25)
+    strategy = RandomStrategy(betting_type=BettingType.PLACE)
+    store.add_run(strategy, first, 100)
+    store.add_run(strategy, second, 200)
+    store.add_run(RandomStrategy(), rng.normal(size=10), 100)
+
+    summary = store.summary(betting_type=BettingType.PLACE)
+    merged = np.concatenate([first, second])
+    assert summary["n_runs"].tolist() == [2] and summary["n_replicates"].tolist() == [65]
+    np.testing.assert_allclose(summary[["mean", "std", "min", "max"]].to_numpy()[0],
+                               [merged.mean(), merged.std(), merged.min(), merged.max()])
+    assert summary["avg_races"].iloc[0] == pytest.approx((40 * 100 + 25 * 200) / 65)
+    assert len(store.result_table()) == 2
+
+
+def test_add_simulation_and_dataset_hash(store, race_arrays):
+    simulation = VectorizedSimulation(12, CombinedStrategy(), seed=5).run_simulation(race_arrays)
+    data_hash = dataset_hash(race_arrays)
+    run_id = store.add_simulation(simulation, data_hash=data_hash)
+
+    np.testing.assert_array_equal(store.profits(run_id)[run_id], simulation.results)
+    runs = store.runs(data_hash=data_hash)
+    assert runs["engine"].tolist() == ["VectorizedSimulation"]
+    assert runs["seed"].iloc[0] == str(simulation.seed)
+    assert dataset_hash(race_arrays.take(np.arange(10))) != data_hash
+
+
+def test_rejects_invalid_parameter_names(store):
+    with pytest.raises(ValueError):
+        store.runs(**{"alpha') OR 1=1 --": 0})
@@ -0,0 +1,36 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+from cli import COLUMNS
+from conftest import RACES_PATH, RUNS_PATH
+from data_processor import DataProcessor
+
+
+def test_stream_races_matches_full_processing(processor):
+    streaming = DataProcessor()
+    blocks, raw = [], []
+    for block in streaming.stream_races(RUNS_PATH, RACES_PATH, n_races=10, chunksize=7_000, columns=COLUMNS):
+        blocks.append(block)
+        # 還原成原始勝率：每個區塊以當下累計的統計量標準化
+        moments = {column: copy.copy(m) for column, m in streaming.rate_moments.items()}
+        raw.append(pd.DataFrame({column: m.denormalize(block[column]) for column, m in moments.items()}))
+
+    assert len(blocks) > 5
+    race_ids = [set(block["race_id"]) for block in blocks]
+    assert all(not (a & b) for i, a in enumerate(race_ids) for b in race_ids[i + 1:])
+
+    data = pd.concat(blocks, ignore_index=True)
+    expected = processor.processed_data
+    pd.testing.assert_frame_equal(data[COLUMNS], expected[COLUMNS], check_dtype=False)
+
+    # 滾動勝率跨區塊延續，與一次處理全部資料相同
+    full_raw = DataProcessor.raw_win_rates(processor.data, 10)
+    raw = pd.concat(raw, ignore_index=True)
+    for column, values in full_raw.items():
+        np.testing.assert_allclose(raw[column], values, atol=1e-9)
+
+    # 最後一塊使用全部資料的統計量，與 prepare 的標準化相同
+    last = blocks[-1]
+    np.testing.assert_allclose(last["horse_win_rate_top1"], expected["horse_win_rate_top1"].iloc[-len(last):], atol=1e-9)
@@ -0,0 +1,17 @@
+import numpy as np
+
+from conftest import candidate_sets
+
+
+def test_top_k_with_k_1_matches_candidates(strategy, race_arrays):
+    expected = candidate_sets(strategy, race_arrays)
+    ranked = strategy.ranked_candidates(race_arrays, 1)
+
+    tied = np.array([len(rows) > 1 for rows in expected])
+    np.testing.assert_array_equal(ranked.random_races, np.flatnonzero(tied))
+    for i in np.flatnonzero(~tied):
+        assert ranked.fixed_rows[i, 0] in expected[i]
+
+    rows = strategy.select_top_k(race_arrays, 1, rng=np.random.default_rng(0))
+    assert rows.shape == (race_arrays.n_races, 1)
+    assert all(row in candidates for row, candidates in zip(rows[:, 0].tolist(), expected))
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from betting_strategy import BettingType, MinOddsBasedStrategy
+from simulation import Simulation
+from vectorized_simulation import VectorizedSimulation, compute_payouts
+
+
+def _frame(arrays):
+    return pd.DataFrame({name: np.asarray(values) for name, values in arrays.columns.items()})
+
+
+@pytest.mark.parametrize("betting_type", [BettingType.WIN, BettingType.PLACE])
+def test_compute_payouts_matches_simulation_payout(race_arrays, betting_type):
+    simulation = Simulation(1, MinOddsBasedStrategy(betting_type=betting_type))
+    data = _frame(race_arrays)
+    expected = [simulation._payout(row, simulation.betting_strategy.get_result(row)) for _, row in data.iterrows()]
+    np.testing.assert_allclose(compute_payouts(race_arrays, betting_type), expected)
+
+
+@pytest.mark.parametrize("betting_type", [BettingType.WIN, BettingType.PLACE])
+def test_engines_agree_on_races_without_ties(race_arrays, betting_type):
+    """沒有並列候選時選法固定，兩個引擎的損益必須相同"""
+    strategy = MinOddsBasedStrategy(betting_type=betting_type)
+    _, cand_offsets = strategy.candidates(race_arrays)
+    arrays = race_arrays.take(np.flatnonzero(np.diff(cand_offsets) == 1))
+
+    expected = Simulation(2, strategy, seed=0).run_simulation(_frame(arrays).groupby("race_id")).results
+    profits = VectorizedSimulation(2, strategy, seed=0).simulate_replicates(arrays)
+    np.testing.assert_allclose(profits, expected)
+    assert arrays.n_races > 250
+
+
+class _SampleStrategy(MinOddsBasedStrategy):
+    """只覆寫 select_horse、每場隨機抽一匹的自訂策略（沒有陣列核心）"""
+
+    def select_horse(self, race_group, rng=None):
+        return race_group.sample(n=1, random_state=rng)
+
+
+def test_engines_agree_with_same_seed(race_arrays, strategy):
+    """同一個種子下，並列時兩個引擎也選到同一匹馬"""
+    arrays = race_arrays.take(np.arange(60))
+    expected = Simulation(3, strategy, seed=11).run_simulation(_frame(arrays).groupby("race_id")).results
+    np.testing.assert_allclose(VectorizedSimulation(3, strategy, seed=11).simulate_replicates(arrays), expected)
+
+
+def test_engines_agree_for_custom_strategy(race_arrays):
+    strategy = _SampleStrategy()
+    assert not strategy.has_array_kernel
+    arrays = race_arrays.take(np.arange(40))
+    expected = Simulation(2, strategy, seed=4).run_simulation(_frame(arrays).groupby("race_id")).results
+    np.testing.assert_allclose(VectorizedSimulation(2, strategy, seed=4).simulate_replicates(arrays), expected)
+
+
+def test_results_do_not_depend_on_blocks_or_replicate_order(race_arrays, strategy):
+    profits = VectorizedSimulation(10, strategy, seed=6).simulate_replicates(race_arrays)
+
+    blocks = [race_arrays.take(np.arange(start, min(start + 70, race_arrays.n_races)))
+              for start in range(0, race_arrays.n_races, 70)]
+    blocked = VectorizedSimulation(10, strategy, seed=6).run_simulation(blocks)
+    np.testing.assert_allclose(blocked.results, profits)
+
+    # 單獨重跑某個重複模擬、或以不同順序要求，結果都相同
+    rerun = VectorizedSimulation(10, strategy, seed=6).simulate_replicates(race_arrays, replicates=[9, 2])
+    np.testing.assert_allclose(rerun, profits[[9, 2]])
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from betting_strategy import BettingType, CombinedStrategy, MaxHorseBasedStrategy
+from walk_forward import PrefixMoments, WalkForwardBacktester
+
+STRATEGIES = [MaxHorseBasedStrategy(betting_type=BettingType.WIN), CombinedStrategy(betting_type=BettingType.PLACE)]
+
+
+@pytest.fixture(scope="module")
+def data(processor):
+    """前 120 個賽馬日的原始資料"""
+    dates = np.sort(processor.data["date"].unique())
+    return processor.data[processor.data["date"] < dates[120]]
+
+
+def test_windows_train_only_on_past():
+    windows = WalkForwardBacktester.make_windows(100, test_days=20, train_days=30, min_train_days=10, step_days=15)
+    assert windows[0] == (0, 10, 10, 30)
+    for train_start, train_stop, test_start, test_stop in windows:
+        assert train_start < train_stop == test_start < test_stop <= 100
+        assert train_stop - train_start <= 30
+    # 擴張視窗：訓練期間都從第一天開始
+    assert all(window[0] == 0 for window in WalkForwardBacktester.make_windows(100, test_days=20))
+
+
+def test_prefix_moments_match_numpy():
+    rng = np.random.default_rng(0)
+    date_codes = np.sort(rng.integers(0, 30, 500))
+    values = rng.normal(1e6, 1.0, 500)
+    moments = PrefixMoments(date_codes, values, 30)
+
+    for start, stop in [(0, 30), (5, 12), (20, 21)]:
+        selected = values[(date_codes >= start) & (date_codes < stop)]
+        mean, std = moments.stats(start, stop)
+        np.testing.assert_allclose([mean, std], [selected.mean(), selected.std(ddof=1)], rtol=1e-9)
+
+
+def test_future_data_does_not_change_earlier_windows(data):
+    """截掉後面的日期不影響前面視窗的結果：特徵與標準化都只用到測試開始前的資料"""
+    full = WalkForwardBacktester(data, test_days=20).run(STRATEGIES, 20, max_workers=1, seed=7)
+    cutoff = np.sort(data["date"].unique())[60]
+    truncated = WalkForwardBacktester(data[data["date"] < cutoff], test_days=20).run(STRATEGIES, 20, max_workers=1,
+                                                                                     seed=7)
+
+    assert len(truncated) < len(full)
+    pd.testing.assert_frame_equal(truncated, full.iloc[:len(truncated)].reset_index(drop=True))
+
+
+def test_parallel_matches_serial(data):
+    backtester = WalkForwardBacktester(data, test_days=30)
+    serial = backtester.run(STRATEGIES, 20, max_workers=1, seed=3)
+    parallel = backtester.run(STRATEGIES, 20, max_workers=2, seed=3)
+
+    pd.testing.assert_frame_equal(serial, parallel)
+    assert (serial["平均賽事數"] > 0).all()
+    assert list(serial["視窗"].unique()) == list(range(len(backtester.windows)))
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from betting_strategy import BettingType, CombinedStrategy
+from race_arrays import RaceArrays
+from vectorized_simulation import compute_payouts
+from weight_optimizer import CombinedWeightOptimizer, pareto_front
+
+WEIGHTS = np.array([[0.65, 0.25, 0.10], [0.75, 0.25, 0.10], [0.2, 0.8, 0.5], [0.0, 1.0, 1.0]])
+
+
+def _expected(arrays, weights, betting_type):
+    """由 CombinedStrategy 的並列候選直接算出每組權重的平均損益與標準差"""
+    payouts = compute_payouts(arrays, betting_type)
+    rows = []
+    for alpha, beta, gamma in weights:
+        strategy = CombinedStrategy(alpha, beta, gamma, betting_type=betting_type)
+        cand_rows, cand_offsets = strategy.candidates(arrays)
+        per_race = [payouts[cand_rows[a:b]] for a, b in zip(cand_offsets[:-1], cand_offsets[1:])]
+        rows.append((sum(p.mean() for p in per_race), np.sqrt(sum(p.var() for p in per_race))))
+    return np.array(rows)
+
+
+@pytest.mark.parametrize("betting_type", [BettingType.WIN, BettingType.PLACE])
+def test_evaluate_matches_combined_strategy(race_arrays, betting_type):
+    result = CombinedWeightOptimizer(race_arrays, betting_type).evaluate(WEIGHTS)
+    expected = _expected(race_arrays, WEIGHTS, betting_type)
+    np.testing.assert_allclose(result[["mean", "std"]].to_numpy(), expected, atol=1e-9)
+    assert (result["n_races"] == race_arrays.n_races).all()
+
+
+def test_infinite_inputs_follow_combined_strategy(race_arrays):
+    """無限值評分與 CombinedStrategy 相同視為 0，不能先被換成極大的有限值"""
+    columns = dict(race_arrays.columns)
+    odds = np.asarray(columns["win_odds"], dtype=np.float64).copy()
+    odds[race_arrays.starts[::3]] = np.inf
+    columns["win_odds"] = odds
+    arrays = RaceArrays(columns, race_arrays.offsets, race_arrays.race_ids)
+
+    optimizer = CombinedWeightOptimizer(arrays)
+    assert not optimizer.finite
+    expected = _expected(arrays, WEIGHTS[:3], BettingType.WIN)
+    np.testing.assert_allclose(optimizer.evaluate(WEIGHTS[:3])[["mean", "std"]].to_numpy(), expected, atol=1e-9)
+
+
+def test_pareto_front():
+    results = pd.DataFrame({"mean": [1.0, 2.0, 0.5, 3.0], "std": [1.0, 2.0, 3.0, 5.0]})
+    front = pareto_front(results)
+    assert front["mean"].tolist() == [1.0, 2.0, 3.0]
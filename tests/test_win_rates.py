@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from data_processor import DataProcessor
+
+
+def _reference(data, key, window):
+    """原本 groupby().apply 的算法：依日期排序、shift 一場後取滾動平均，沒有紀錄時為 0"""
+    ordered = data.assign(row=np.arange(len(data)), top1=data["result"] == 1,
+                          top3=data["result"].isin([1, 2, 3])).sort_values([key, "date", "row"], kind="stable")
+    groups = ordered.groupby(key)
+    rates = {}
+    for target in ("top1", "top3"):
+        shifted = groups[target].shift(1).astype(float)
+        rolling = shifted.groupby(ordered[key]).transform(lambda s: s.rolling(window, min_periods=1).mean())
+        rates[target] = rolling.fillna(0).to_numpy()[np.argsort(ordered["row"].to_numpy())]
+    return rates
+
+
+@pytest.mark.parametrize("key,prefix", [("horse_id", "horse"), ("jockey_id", "jockey")])
+def test_raw_win_rates_match_groupby(processor, key, prefix):
+    data = processor.data
+    rates = DataProcessor.raw_win_rates(data, [3, 10])
+    for window in (3, 10):
+        expected = _reference(data, key, window)
+        for target in ("top1", "top3"):
+            np.testing.assert_allclose(rates[f"{prefix}_win_rate_{target}_{window}"], expected[target])
+
+
+def test_prepare_normalizes_raw_rates(processor):
+    rates = DataProcessor.raw_win_rates(processor.data, 10)
+    for column, values in rates.items():
+        normalized = processor.processed_data[column].to_numpy()
+        # 與原本 pandas 的 std 相同，為樣本標準差
+        np.testing.assert_allclose(normalized, (values - values.mean()) / values.std(ddof=1), atol=1e-9)